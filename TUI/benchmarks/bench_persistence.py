@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark per-message persistence latency.
+
+Compares the old connect-per-call pattern against the shared ChatRepository
+and the WriteBehindQueue (time spent on the producer's hot path, plus the
+cost of the final flush).
+
+Usage: python benchmarks/bench_persistence.py [--messages N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import duckdb
+
+from database import ChatRepository, WriteBehindQueue
+
+
+def connect_per_call(db_file: str, n: int) -> list[float]:
+    """Replicates the original add_chat_message: open, insert, close."""
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        con = duckdb.connect(db_file)
+        try:
+            next_id = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chat_history").fetchone()[0]
+            con.execute(
+                "INSERT INTO chat_history (id, session_id, model, timestamp, role, content) VALUES (?, ?, ?, ?, ?, ?)",
+                (next_id, "bench", "bench-model", datetime.now(), "user", f"message {i}")
+            )
+        finally:
+            con.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def repository(repo: ChatRepository, n: int) -> list[float]:
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        repo.add_chat_message("bench", "bench-model", "user", f"message {i}")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def write_behind(repo: ChatRepository, n: int) -> tuple[list[float], float]:
+    async def run() -> tuple[list[float], float]:
+        queue = WriteBehindQueue(repo)
+        queue.start()
+        timings = []
+        for i in range(n):
+            start = time.perf_counter()
+            queue.add_chat_message("bench", "bench-model", "user", f"message {i}")
+            timings.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+        start = time.perf_counter()
+        await queue.close()
+        return timings, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def report(label: str, timings: list[float]) -> None:
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{label:<18} mean={statistics.mean(ms):7.3f} ms  p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Separate files: the legacy MAX(id)+1 writer does not advance the id sequence
+        legacy_db = os.path.join(tmp, "legacy.db")
+        repo = ChatRepository(legacy_db)
+        repo.initialize()
+        repo.close()
+        report("connect-per-call", connect_per_call(legacy_db, args.messages))
+
+        repo = ChatRepository(os.path.join(tmp, "bench.db"))
+        repo.initialize()
+        report("repository", repository(repo, args.messages))
+        timings, drain = write_behind(repo, args.messages)
+        report("write-behind", timings)
+        print(f"{'':<18} final flush={drain * 1000:.3f} ms")
+        repo.close()
+
+if __name__ == "__main__":
+    main()
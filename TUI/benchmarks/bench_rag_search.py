@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Benchmark retrieval over project chunks: ``ChatRepository.search_rag`` latency.
+
+Fills a temporary database with random unit vectors (``--chunks`` rows of
+``--dims`` floats, in files of 5 chunks) and times top-k searches. Without
+DuckDB's ``vss`` extension this is the brute-force ``array_cosine_distance``
+scan; with it, the HNSW index answers.
+
+Usage: python benchmarks/bench_rag_search.py [--chunks N ...] [--dims D] [--queries Q] [--k K]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database import ChatRepository
+from search_index import vector_literal
+
+ROOT = "/bench"
+MODEL = "bench-embed"
+CHUNKS_PER_FILE = 5
+
+
+def unit_vector(dims: int) -> list[float]:
+    v = [random.gauss(0, 1) for _ in range(dims)]
+    norm = sum(x * x for x in v) ** 0.5
+    return [x / norm for x in v]
+
+
+def fill(repo: ChatRepository, chunks: int, dims: int) -> None:
+    """Insert ``chunks`` rows with one bulk INSERT per file batch."""
+    table = f"rag_chunks_{dims}"
+    cur = repo.cursor()
+    for start in range(0, chunks, 1000):
+        rows = []
+        for i in range(start, min(start + 1000, chunks)):
+            path = f"src/file_{i // CHUNKS_PER_FILE}.py"
+            rows.append((ROOT, path, MODEL, i, i + 40, "x" * 200, vector_literal(unit_vector(dims))))
+        cur.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?::VARCHAR::FLOAT[{dims}])", rows
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[2_000, 10_000, 50_000])
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=6)
+    args = parser.parse_args()
+    random.seed(1)
+
+    for chunks in args.chunks:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = ChatRepository(os.path.join(tmp, "bench.db"))
+            repo.initialize()
+            indexed = repo.ensure_rag_table(args.dims)
+            fill(repo, chunks, args.dims)
+            queries = [vector_literal(unit_vector(args.dims)) for _ in range(args.queries)]
+            repo.search_rag(ROOT, MODEL, queries[0], args.dims, args.k)  # warm-up
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                repo.search_rag(ROOT, MODEL, query, args.dims, args.k)
+                timings.append((time.perf_counter() - start) * 1000)
+            repo.close()
+        ms = sorted(timings)
+        print(
+            f"{chunks:>8} chunks x {args.dims} dims ({'HNSW' if indexed else 'scan'}): "
+            f"p50={statistics.median(ms):7.2f} ms  max={ms[-1]:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark cold start: import time and time to first paint.
+
+Each run is a fresh interpreter. Import cost is measured with
+``python -X importtime``; time to first paint is measured by starting the
+app headless (Textual's pilot) and waiting for its ``Ready`` event, which
+fires once the first frame is displayed. The database is opened in a
+temporary directory and Ollama is pointed at an unused port, so the
+result does not depend on a running server.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--top N] [--budget-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def child() -> None:
+    """Run inside a fresh interpreter: import the app, start it headless, report timings."""
+    import asyncio
+
+    start = time.perf_counter()
+    sys.path.insert(0, SRC)
+    import app as app_module
+    import database
+    imported = time.perf_counter()
+
+    class BenchTUI(app_module.OllamaTUI):
+        CSS_PATH = os.path.join(SRC, "app.tcss")
+
+        def on_ready(self) -> None:
+            self.first_paint = time.perf_counter()
+            # Database work must not have delayed the first frame
+            self.db_open_at_paint = database.get_repository().is_open
+
+    async def run() -> dict:
+        tui = BenchTUI()
+        async with tui.run_test() as pilot:
+            while not hasattr(tui, "first_paint"):
+                await pilot.pause(0.005)
+            return {
+                "import_ms": (imported - start) * 1000,
+                "first_paint_ms": (tui.first_paint - start) * 1000,
+                "db_open_at_paint": tui.db_open_at_paint,
+            }
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def importtime(top: int) -> tuple[float, list[tuple[float, str]]]:
+    """Return the cumulative import time of ``app`` and the ``top`` slowest modules (self time)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=SRC, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(self_us) / 1000, name.strip()))
+        if name.strip() == "app":
+            total = int(cumulative_us) / 1000
+    modules.sort(reverse=True)
+    return total, modules[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh-process runs to take the median of")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if median time to first paint exceeds this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    total, slowest = importtime(args.top)
+    print(f"import app (cumulative, -X importtime): {total:.1f} ms")
+    print("slowest modules (self time):")
+    for ms, name in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    env = dict(os.environ, OLLAMA_HOST="http://127.0.0.1:9")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(args.runs):
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child"],
+                cwd=tmp, env=env, capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    imports = [r["import_ms"] for r in results]
+    paints = [r["first_paint_ms"] for r in results]
+    print(f"\n{args.runs} cold starts (median / max):")
+    print(f"  import:          {statistics.median(imports):8.1f} / {max(imports):8.1f} ms")
+    print(f"  first paint:     {statistics.median(paints):8.1f} / {max(paints):8.1f} ms")
+    print(f"  DB opened before first paint: {any(r['db_open_at_paint'] for r in results)}")
+
+    if args.budget_ms is not None and statistics.median(paints) > args.budget_ms:
+        print(f"\nFAIL: median first paint exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark BM25 search over chat history: ``search_index.search_text`` latency.
+
+Fills a temporary database with ``--docs`` messages of 30 terms each,
+drawn from a skewed vocabulary of 50,000 terms (``w0`` is in ~3% of the
+postings, ``w40000`` in a few hundred). One ``write_batch`` then sorts the
+postings (timed), and queries of rare and common terms are timed, before
+and after ``--append`` more messages land in the unsorted tail.
+
+Usage: python benchmarks/bench_text_search.py [--docs N] [--append N] [--repeat R]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database import ChatRepository
+from search_index import search_text
+
+QUERIES = ["w40000", "w5000 w30000", "w0", "w0 w40000", "w1 w2", "w5 w30000 w123", "w0 w1 w2"]
+
+
+def fill(repo: ChatRepository, first: int, count: int, table: str) -> None:
+    """``count`` messages with ids from ``first``, their postings written straight to ``table``."""
+    cur = repo.cursor()
+    last = first + count
+    cur.execute(
+        "INSERT INTO chat_history SELECT i, 's' || (i // 100), 'bench', now(), 'user', 'message ' || i "
+        "FROM range(?, ?) t(i)", (first, last)
+    )
+    cur.execute("INSERT INTO search_docs SELECT 'chat', i, 30 FROM range(?, ?) t(i)", (first, last))
+    # 30 draws per message; a term drawn twice is one posting with tf 2
+    cur.execute(
+        f"INSERT INTO {table} SELECT hash('w' || w), 'chat', i, count(*), 30 FROM "
+        "(SELECT i, floor(pow(random(), 3) * 50000)::INTEGER AS w FROM range(?, ?) t(i), range(30)) "
+        "GROUP BY i, w", (first, last)
+    )
+
+
+def one_message(repo: ChatRepository, message_id: int) -> float:
+    """Seconds for a ``write_batch`` of one message (which sorts the postings when due)."""
+    start = time.perf_counter()
+    repo.write_batch({"chat_history": [(message_id, "bench", "bench", datetime.now(), "user", "hello search")]})
+    return time.perf_counter() - start
+
+
+def time_queries(repo: ChatRepository, repeat: int) -> None:
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            search_text(repo, query)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"  {query!r:20} p50={statistics.median(timings):7.1f} ms  max={max(timings):7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--append", type=int, default=15_000, help="messages left in the unsorted tail")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = ChatRepository(os.path.join(tmp, "bench.db"))
+        repo.initialize()
+        start = time.perf_counter()
+        fill(repo, 1, args.docs, "search_postings_tail")
+        print(f"{args.docs} messages, {args.docs * 30} postings loaded in {time.perf_counter() - start:.1f} s")
+        print(f"first write (sorts the postings): {one_message(repo, args.docs + 1):.1f} s")
+        print("sorted:")
+        time_queries(repo, args.repeat)
+
+        fill(repo, args.docs + 2, args.append, "search_postings_tail")
+        print(f"with {args.append * 30} postings in the tail:")
+        time_queries(repo, args.repeat)
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Check ProviderPool against several local stub Ollama servers.
+
+Starts in-process stub servers on free ports (``/api/tags``, ``/api/chat``
+streamed and not, with an optional delay), plus one port nothing listens
+on, and checks that:
+
+- concurrent requests are spread over the hosts that have the model;
+- a host that cannot be reached is skipped;
+- a model on only one host goes to that host, and one on no host fails;
+- a stream that breaks part-way finishes on another host with the same
+  text, or after ``FAILOVER_MARKER`` when the other host's reply differs.
+
+Usage: python benchmarks/check_pool.py [--delay SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from providers import ProviderError, ProviderPool
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def reply_words(model: str, messages: list) -> list[str]:
+    """The stub's reply, the same on every host (as with a shared seed)."""
+    return f"{model} says hello to {len(json.dumps(messages))} chars of chat.".split(" ")
+
+
+def stub_handler(models: list[str], delay: float, break_after: Optional[int] = None, diverge: bool = False):
+    """A handler class serving ``models``; streams break after ``break_after`` words if set."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _json(self, obj: dict, code: int = 200) -> None:
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj: dict) -> None:
+            data = (json.dumps(obj) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_GET(self) -> None:
+            if self.path == "/api/tags":
+                return self._json({"models": [{"name": m, "model": m, "digest": m, "size": 1} for m in models]})
+            self._json({"error": "not found"}, 404)
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != "/api/chat":
+                return self._json({"error": "not found"}, 404)
+            model = body.get("model")
+            if model not in models:
+                return self._json({"error": f"model '{model}' not found"}, 404)
+            words = reply_words(model, body["messages"])
+            if diverge:
+                words = ["Something", "else"] + words
+            text = " ".join(words)
+            if body.get("stream") is False:
+                time.sleep(delay)
+                return self._json({"message": {"role": "assistant", "content": text}, "done": True})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [w + " " for w in words[:-1]] + words[-1:]
+            for i, piece in enumerate(pieces):
+                if break_after is not None and i == break_after:
+                    # A partial chunk, then the connection drops
+                    self.wfile.write(b"10\r\ncut")
+                    self.wfile.flush()
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self._chunk({"message": {"role": "assistant", "content": piece}, "done": False})
+                time.sleep(delay / len(pieces))
+            self._chunk({"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": len(pieces)})
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(handler) -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def dead_host() -> str:
+    """A URL whose port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class Checks:
+    def __init__(self) -> None:
+        self.failed = 0
+
+    def check(self, label: str, ok: bool, detail: str = "") -> None:
+        print(f"{'ok  ' if ok else 'FAIL'} {label}" + (f": {detail}" if detail else ""))
+        self.failed += not ok
+
+
+def served(pool: ProviderPool) -> dict[str, int]:
+    return {backend.host: backend.served for backend in pool.backends}
+
+
+async def stream_text(pool: ProviderPool, model: str) -> str:
+    return "".join([chunk.text async for chunk in pool.chat(model, MESSAGES, stream=True, options={"seed": 1})])
+
+
+async def check_routing(checks: Checks, delay: float) -> None:
+    _, a = serve(stub_handler(["stub"], delay))
+    _, b = serve(stub_handler(["stub"], delay))
+    _, c = serve(stub_handler(["other"], delay))
+    dead = dead_host()
+    pool = ProviderPool([a, b, c, dead])
+    try:
+        checks.check("pool is healthy with one host down", await pool.is_healthy(), pool.describe())
+        names = sorted(info.name for info in await pool.list_model_infos())
+        checks.check("models are the union of all hosts", names == ["other", "stub"], str(names))
+
+        start = time.monotonic()
+        await asyncio.gather(*(pool.chat("stub", MESSAGES) for _ in range(8)))
+        elapsed = time.monotonic() - start
+        counts = served(pool)
+        checks.check("requests spread over the hosts with the model", counts[a] == counts[b] == 4, str(counts))
+        checks.check("spread requests run in parallel", elapsed < delay * 4, f"8 requests in {elapsed:.2f}s")
+        checks.check("unreachable host is skipped", counts[dead] == 0 and pool.backends[3].healthy is False,
+                     pool.backends[3].describe())
+
+        texts = await asyncio.gather(*(stream_text(pool, "stub") for _ in range(4)))
+        expected = " ".join(reply_words("stub", MESSAGES))
+        checks.check("streams are spread and complete", set(texts) == {expected} and served(pool)[a] == 6,
+                     str(served(pool)))
+
+        result = await pool.chat("other", MESSAGES)
+        checks.check("model on one host goes to that host",
+                     result.text.startswith("other") and served(pool)[c] == 1, str(served(pool)))
+        try:
+            await pool.chat("missing", MESSAGES)
+            checks.check("model on no host fails", False, "no error")
+        except ProviderError as e:
+            checks.check("model on no host fails", "not found" in str(e), str(e)[:80])
+    finally:
+        await pool.aclose()
+
+
+async def check_failover(checks: Checks, delay: float) -> None:
+    _, breaking = serve(stub_handler(["stub"], delay, break_after=3))
+    _, good = serve(stub_handler(["stub"], delay))
+    _, different = serve(stub_handler(["stub"], delay, diverge=True))
+    expected = " ".join(reply_words("stub", MESSAGES))
+
+    pool = ProviderPool([breaking, good])
+    try:
+        # Busy on paper, so the breaking host is picked first
+        pool.backends[1].outstanding += 1
+        text = await stream_text(pool, "stub")
+        pool.backends[1].outstanding -= 1
+        checks.check("broken stream finishes on another host", text == expected and pool.failovers == 1,
+                     f"{pool.failovers} failover(s), {text!r}")
+        checks.check("broken stream's host is marked down", pool.backends[0].healthy is False,
+                     pool.backends[0].describe())
+    finally:
+        await pool.aclose()
+
+    pool = ProviderPool([breaking, different])
+    try:
+        pool.backends[1].outstanding += 1
+        text = await stream_text(pool, "stub")
+        pool.backends[1].outstanding -= 1
+        marker = ProviderPool.FAILOVER_MARKER.format(host=different)
+        delivered = " ".join(reply_words("stub", MESSAGES)[:3]) + " "
+        checks.check("diverging failover is marked", text == delivered + marker + "Something else " + expected,
+                     repr(text))
+    finally:
+        await pool.aclose()
+
+
+async def run(delay: float) -> int:
+    checks = Checks()
+    await check_routing(checks, delay)
+    await check_failover(checks, delay)
+    print(f"\n{checks.failed} check(s) failed" if checks.failed else "\nall checks passed")
+    return 1 if checks.failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.4, help="seconds each stub takes per reply")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.delay)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Command-line entry point.
+
+    python cai.py              start the TUI (same as run.py)
+    python cai.py batch ...    run a manifest headless (see ``python cai.py batch --help``)
+    python cai.py replay ...   re-run a recorded session and diff the outputs (``--help``)
+"""
+
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+
+def main(argv: list[str]) -> int:
+    if argv[:1] == ["batch"]:
+        from batch_cli import main as batch_main
+        return batch_main(argv[1:])
+    if argv[:1] == ["replay"]:
+        from replay import main as replay_main
+        return replay_main(argv[1:])
+    if argv[:1] not in ([], ["tui"]):
+        print(__doc__, file=sys.stderr)
+        return 2
+    from app import OllamaTUI
+    OllamaTUI().run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
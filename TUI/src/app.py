@@ -1,198 +1,657 @@
 import asyncio
-import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
-import ollama
-import httpx
-import json
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal
+from textual.css.query import NoMatches
 from textual.reactive import reactive
-from textual.widgets import Footer, Header
+from textual.widgets import Footer, Header, TabbedContent
 
+from artifacts import ArtifactRecord
+from batch_summarizer import BatchProgress, BatchSummarizer, default_concurrency, discover_files
+from context_builder import BuiltContext, ContextBuilder
 from database import (
-    add_chat_message,
-    add_file_summary,
-    get_chat_history,
+    WriteBehindQueue,
+    close_database,
+    get_chat_history_page,
+    get_chat_messages,
+    get_repository,
+    get_request_percentiles,
+    get_sessions,
     initialize_database,
 )
+from envelopes import EnvelopeRecorder
+from file_index import FileIndex
+from model_catalog import ModelCatalog
+from providers import GenerationStats, ProviderError, ProviderPool
+from rag_index import RAG_TOP_K, RagIndexer, RetrievedChunk
+from request_metrics import LatencySummary, RequestSpans
+from request_recording import chat_options, record_envelope, summarize_with_metrics
+from request_scheduler import Priority, RequestScheduler
+from search_index import EMBED_MODEL, EmbeddingIndexer, SearchHit, fuse, search_similar, search_text
+from summarizer import FileSummarizer
+from summary_cache import SummaryCache
+from widgets.batch_summarize_prompt import BatchSummarizePrompt
+from widgets.chat_log import ChatLog
 from widgets.chat_interface import ChatInterface
 from widgets.file_browser import FileBrowser
+from widgets.file_search import FileSearchProvider
+from widgets.metrics_screen import MetricsScreen
 from widgets.model_selection import ModelSelectionScreen
 from widgets.output_panel import OutputPanel
 from widgets.output_root_prompt import OutputRootPrompt
+from widgets.search_screen import SearchScreen
+from widgets.session_browser import SessionBrowser
+from widgets.session_tabs import SessionPane
 
 
 class OllamaTUI(App):
     """A Textual TUI for interacting with Ollama models."""
 
     CSS_PATH = "app.tcss"
+    COMMANDS = App.COMMANDS | {FileSearchProvider}
     BINDINGS = [
         ("ctrl+c", "quit", "Quit"),
         ("ctrl+u", "add_to_context", "Add to Context"),
         ("ctrl+s", "summarize_file", "Summarize File"),
+        ("ctrl+b", "summarize_directory", "Summarize Files"),
         ("ctrl+r", "clear_context", "Clear Context"),
         ("ctrl+o", "change_output_root", "Change Output Root"),
+        ("ctrl+t", "show_metrics", "Metrics"),
+        ("ctrl+g", "search", "Search"),
+        ("escape", "cancel_requests", "Cancel"),
+        ("ctrl+n", "new_session", "New Session"),
+        ("f2", "browse_sessions", "Sessions"),
+        ("f4", "close_session", "Close Session"),
+        ("ctrl+pagedown", "next_session", "Next Session"),
+        ("ctrl+pageup", "previous_session", "Previous Session"),
         ("f5", "refresh_explorer", "Refresh Explorer"),
     ]
 
+    HISTORY_PAGE_SIZE = 50
+    # Batch summaries are written to the output root this many at a time
+    ARTIFACT_BATCH_SIZE = 20
+
     model_name: reactive[Optional[str]] = reactive(None)
-    session_id: str = str(uuid.uuid4())
     is_loading: reactive[bool] = reactive(False)
+    batch: Optional[BatchSummarizer] = None
 
     def compose(self) -> ComposeResult:
         """Create the layout of the application."""
         yield Header()
         with Horizontal():
             yield FileBrowser("./", id="file-browser")
-            yield ChatInterface(id="chat-interface")
+            with TabbedContent(id="sessions"):
+                yield SessionPane("New chat")
             yield OutputPanel(id="output-panel")
         yield Footer()
 
     def on_mount(self) -> None:
-        """Initialize the application."""
-        initialize_database()
+        """Initialize the application.
+
+        Nothing here touches the database or the network; that starts once
+        the first frame is on screen (see ``start_background_init``).
+        """
+        self.persistence = WriteBehindQueue(get_repository(), on_error=self._on_persistence_error)
+        self.persistence.start()
+        self.summary_cache = SummaryCache(get_repository(), self.persistence)
+        self.envelopes = EnvelopeRecorder(self.persistence)
+        # OLLAMA_HOSTS lists several servers; requests go to the least busy one that has the model
+        self.provider = ProviderPool()
+        # Every chat and summary request waits here for a slot on its model (on any server)
+        self.scheduler = RequestScheduler(
+            per_model=default_concurrency() * len(self.provider.backends), on_change=self.show_queue_depth
+        )
+        self.summarizer = FileSummarizer(
+            self.provider, self.summary_cache, self.persistence, scheduler=self.scheduler
+        )
+        self.context_builder = ContextBuilder()
+        self.model_catalog = ModelCatalog(self.provider, get_repository(), self.provider.host)
+        self.file_index = FileIndex(Path(self.query_one("#file-browser", FileBrowser).root_path))
+        output_panel = self.query_one("#output-panel", OutputPanel)
+        output_panel.set_persistence(self.persistence)
+        self.artifact_writer = output_panel.writer
+        # Semantic search only with CAI_EMBED_MODEL set
+        self.embedder = (
+            EmbeddingIndexer(self.provider, get_repository(), self.persistence) if EMBED_MODEL else None
+        )
+        # Retrieval from the project files, also with CAI_EMBED_MODEL
+        self.rag = (
+            RagIndexer(self.provider, get_repository(), self.file_index.root)
+            if EMBED_MODEL and RAG_TOP_K > 0 else None
+        )
+        self.background_tasks: list[asyncio.Task] = []
         self.title = "Ollama TUI Chat Assistant"
+        self.call_after_refresh(self.start_background_init)
+
+    def start_background_init(self) -> None:
+        """Open the database and index the file tree in worker threads, and start model discovery."""
+        asyncio.create_task(self.initialize_database_in_background())
+        asyncio.create_task(self.build_file_index())
         self.show_model_selection()
 
+    async def initialize_database_in_background(self) -> None:
+        """Open DuckDB and create the schema off the UI thread."""
+        try:
+            await asyncio.to_thread(initialize_database)
+            await self.load_artifact_manifest()
+        except Exception as e:
+            self._on_persistence_error(e)
+            return
+        self.background_tasks.append(asyncio.create_task(self.index_search_backlog()))
+        if self.rag is not None:
+            self.background_tasks.append(asyncio.create_task(self.rag.run()))
+
+    async def index_search_backlog(self) -> None:
+        """Add rows written before the search index existed, a batch at a time, then start embedding."""
+        repo = get_repository()
+        try:
+            while await asyncio.to_thread(repo.index_backlog):
+                pass
+        except Exception as e:
+            self.log.error(f"Search indexing failed: {type(e).__name__}: {e}")
+        if self.embedder is not None:
+            await self.embedder.run()
+
+    async def load_artifact_manifest(self) -> None:
+        """Load the output root's recent artifacts and the last save of each title from the manifest."""
+        output_panel = self.query_one("#output-panel", OutputPanel)
+        store = output_panel.store
+        await self.persistence.flush()
+        repo = get_repository()
+        rows = await asyncio.to_thread(repo.get_latest_artifacts, str(store.root))
+        store.remember(ArtifactRecord.from_row(row) for row in rows)
+        recent = await asyncio.to_thread(repo.get_recent_artifacts, str(store.root), output_panel.RECENTS_LIMIT)
+        await output_panel.show_recents([ArtifactRecord.from_row(row) for row in recent])
+
+    async def build_file_index(self) -> None:
+        """Walk the file tree for file search (ctrl+p) off the UI thread."""
+        try:
+            await asyncio.to_thread(self.file_index.build)
+            await asyncio.to_thread(self._watch_indexed_directories)
+        except Exception as e:
+            self.log.error(f"File index failed: {type(e).__name__}: {e}")
+            return
+        if self.rag is not None:
+            self.rag.sync(self.file_index.files())
+            self.background_tasks.append(asyncio.create_task(self.report_rag_index()))
+
+    async def report_rag_index(self) -> None:
+        """Say when the files are indexed for retrieval (or why not)."""
+        await self.rag.wait_idle()
+        chat_interface = self.session.chat
+        if self.rag.last_error:
+            chat_interface.add_error_message(f"Indexing files for retrieval failed: {self.rag.last_error}")
+        elif self.rag.indexed:
+            chat_interface.add_info_message(f"Indexed {self.rag.indexed} changed file(s) for retrieval")
+
+    def _rag_changes(self, paths: set[Path]) -> Optional[list[str]]:
+        """Indexed files among (or under) ``paths`` to re-embed. Blocking.
+
+        ``None`` after a deletion: it may have been a whole directory, so
+        the indexer re-syncs instead.
+        """
+        if any(not path.exists() for path in paths):
+            return None
+        indexed = set(self.file_index.files())
+        changed = []
+        for path in paths:
+            try:
+                rel = path.resolve().relative_to(self.file_index.root).as_posix()
+            except ValueError:
+                continue
+            if path.is_dir():
+                changed.extend(p for p in indexed if p.startswith(rel + "/"))
+            elif rel in indexed:
+                changed.append(rel)
+        return changed
+
+    def _watch_indexed_directories(self, under: Optional[Path] = None) -> None:
+        """Keep the index current everywhere, not just in expanded directories. Blocking.
+
+        Only with inotify: polling the whole tree would cost more than the
+        index saves.
+        """
+        watcher = self.query_one("#file-browser", FileBrowser).watcher
+        if watcher.backend == "inotify":
+            watcher.watch_many(self.file_index.directories(under))
+
+    def _patch_file_index(self, paths: set[Path]) -> None:
+        """Apply created, deleted and renamed paths to the file index. Blocking."""
+        for path in paths:
+            if path.is_dir():
+                self.file_index.rescan(path)
+                self._watch_indexed_directories(path)
+            elif path.is_file():
+                self.file_index.add(path)
+            else:
+                self.file_index.discard(path)
+        self.file_index.refresh()
+
+    async def on_unmount(self) -> None:
+        """Close the HTTP pool, finish artifact saves, flush pending writes and release the database on exit."""
+        try:
+            for task in self.background_tasks:
+                task.cancel()
+            for pane in self.sessions:
+                pane.cancel()
+            await self.provider.aclose()
+            await asyncio.to_thread(self.artifact_writer.close)
+            await self.persistence.close()
+        finally:
+            close_database()
+
+    def _on_persistence_error(self, err: Exception) -> None:
+        """Report a failed background write; rows stay queued for the next flush."""
+        try:
+            chat_interface = self.session.chat
+        except (NoMatches, AttributeError):
+            # Shutting down: the chat log is gone, fall back to the devtools log
+            self.log.error(f"DB error (write-behind): {type(err).__name__}: {err}")
+            return
+        chat_interface.add_error_message(f"DB error (write-behind): {type(err).__name__}: {err}")
+
     def show_model_selection(self) -> None:
         """Show the model selection screen."""
         def set_model(model_name: str):
             if model_name and not model_name.startswith("Error:"):
                 self.model_name = model_name
                 self.sub_title = f"Model: {self.model_name}"
-                self.load_chat_history()
+                num_ctx = self.model_catalog.num_ctx_for(model_name)
+                if num_ctx:
+                    self.context_builder.set_context_length(model_name, num_ctx)
+                asyncio.create_task(self.load_chat_history())
             else:
                 self.exit(message=model_name or "No model selected")
 
-        self.push_screen(ModelSelectionScreen(), set_model)
+        self.push_screen(ModelSelectionScreen(self.model_catalog), set_model)
 
-    def load_chat_history(self) -> None:
-        """Load existing chat history for this session."""
-        chat_interface = self.query_one("#chat-interface", ChatInterface)
-        history = get_chat_history(self.session_id)
+    async def load_chat_history(self, pane: Optional[SessionPane] = None) -> None:
+        """Load the newest page of chat history for ``pane``'s session (default: the active tab)."""
+        pane = pane or self.session
+        chat_interface = pane.chat
+        history = await asyncio.to_thread(
+            get_chat_history_page, pane.session_id, None, self.HISTORY_PAGE_SIZE
+        )
         
         if not history:
             chat_interface.add_system_message("Welcome! Ask me anything.")
         else:
-            for role, content in history:
-                if role == "user":
-                    chat_interface.add_user_message(content)
-                else:
-                    chat_interface.add_assistant_message(content)
+            chat_interface.load_history(history, has_more=len(history) == self.HISTORY_PAGE_SIZE)
+            pane.chat_turns = [{"role": role, "content": content} for _, role, content in history]
+
+    async def on_chat_interface_older_history_requested(
+        self, event: ChatInterface.OlderHistoryRequested
+    ) -> None:
+        """Fetch the page before the oldest loaded message when the user scrolls up."""
+        chat_interface = event.chat_interface
+        session_id = SessionPane.of(chat_interface).session_id
+        try:
+            rows = await asyncio.to_thread(
+                get_chat_history_page, session_id, event.before_id, self.HISTORY_PAGE_SIZE
+            )
+        except Exception as db_err:
+            chat_interface.prepend_history([], has_more=False)
+            chat_interface.add_error_message(f"DB error (history): {type(db_err).__name__}: {db_err}")
+            return
+        chat_interface.prepend_history(rows, has_more=len(rows) == self.HISTORY_PAGE_SIZE)
 
-    def on_chat_interface_message_submitted(self, event: ChatInterface.MessageSubmitted) -> None:
-        """Handle user message submission from chat interface."""
-        asyncio.create_task(self.send_message(event.message))
+    async def on_chat_log_bodies_requested(self, event: ChatLog.BodiesRequested) -> None:
+        """Re-fetch message bodies the chat log evicted from its cache."""
+        chat_log = event.chat_log
+        try:
+            # The newest messages may still be in the write-behind buffer
+            await self.persistence.flush()
+            bodies = await asyncio.to_thread(get_chat_messages, event.message_ids)
+        except Exception as db_err:
+            bodies = {}
+            self._on_persistence_error(db_err)
+        for message_id in event.message_ids:
+            bodies.setdefault(message_id, "(message unavailable)")
+        chat_log.provide_bodies(bodies)
+
+    # --- Request scheduling ---
+    def show_queue_depth(self, scheduler: RequestScheduler) -> None:
+        """Show the scheduler's running and queued requests in every tab's status bar."""
+        text = f"Requests: {scheduler.describe()}" if scheduler.running or scheduler.queued else ""
+        if text and len(self.provider.backends) > 1:
+            text += f" · {self.provider.describe()}"
+        for pane in self.sessions:
+            pane.chat.set_queue_depth(text)
+
+    def action_cancel_requests(self) -> None:
+        """Cancel the active tab's reply and summaries (Escape); their HTTP streams are closed."""
+        pane = self.session
+        if pane is None or pane.cancel():
+            return
+        if self.batch is not None and self.batch.running:
+            pane.chat.add_info_message("Nothing to cancel in this session; Ctrl+B cancels the batch")
 
-    async def send_message(self, message: str) -> None:
-        """Send message to Ollama and display response."""
-        if not self.model_name:
-            chat_interface = self.query_one("#chat-interface", ChatInterface)
+    # --- Session tabs ---
+    @property
+    def session(self) -> SessionPane:
+        """The active session tab."""
+        return self.query_one("#sessions", TabbedContent).active_pane
+
+    @property
+    def session_id(self) -> str:
+        return self.session.session_id
+
+    @property
+    def sessions(self) -> list[SessionPane]:
+        return list(self.query(SessionPane))
+
+    def show_session_busy(self, pane: SessionPane, busy: bool) -> None:
+        """Mark a tab whose reply is generating, so it shows while another tab is active."""
+        try:
+            tab = self.query_one("#sessions", TabbedContent).get_tab(pane)
+        except NoMatches:
+            # The tab was closed
+            return
+        tab.label = f"● {pane.title}" if busy else pane.title
+
+    async def open_session(self, session_id: Optional[str] = None, title: str = "New chat") -> SessionPane:
+        """Switch to ``session_id``'s tab, opening it (and loading its history) if needed."""
+        tabs = self.query_one("#sessions", TabbedContent)
+        for pane in self.sessions:
+            if pane.session_id == session_id:
+                tabs.active = pane.id
+                return pane
+        pane = SessionPane(title, session_id)
+        pane.named = session_id is not None
+        await tabs.add_pane(pane)
+        self.show_queue_depth(self.scheduler)
+        tabs.active = pane.id
+        pane.chat.focus_input()
+        await self.load_chat_history(pane)
+        return pane
+
+    def action_new_session(self) -> None:
+        """Start a new chat session in its own tab (Ctrl+N)."""
+        asyncio.create_task(self.open_session())
+
+    async def action_close_session(self) -> None:
+        """Close the active tab, cancelling its reply (F4); the session stays in the history."""
+        pane = self.session
+        if pane is None:
+            return
+        if pane.cancel():
+            # Let its requests wind down while its chat interface still exists
+            await asyncio.gather(*pane.tasks, return_exceptions=True)
+        await self.query_one("#sessions", TabbedContent).remove_pane(pane.id)
+        if not self.sessions:
+            await self.open_session()
+
+    def action_next_session(self, step: int = 1) -> None:
+        """Switch to the next tab (Ctrl+PgDn), wrapping around."""
+        panes = self.sessions
+        index = panes.index(self.session)
+        self.query_one("#sessions", TabbedContent).active = panes[(index + step) % len(panes)].id
+
+    def action_previous_session(self) -> None:
+        """Switch to the previous tab (Ctrl+PgUp)."""
+        self.action_next_session(-1)
+
+    def action_browse_sessions(self) -> None:
+        """Pick a saved session to open in a tab (F2)."""
+        titles: dict[str, str] = {}
+
+        async def load() -> list[tuple]:
+            await self.persistence.flush()
+            rows = await asyncio.to_thread(get_sessions)
+            titles.update((row[0], SessionPane.title_for(row[5] or row[0][:8])) for row in rows)
+            return rows
+
+        def open_picked(session_id: Optional[str]) -> None:
+            if session_id:
+                asyncio.create_task(self.open_session(session_id, titles.get(session_id, session_id[:8])))
+
+        open_sessions = {pane.session_id for pane in self.sessions}
+        self.push_screen(SessionBrowser(load, open_sessions), open_picked)
+
+    def on_chat_interface_message_submitted(self, event: ChatInterface.MessageSubmitted) -> None:
+        """Start a reply in the tab the message was typed in; other tabs keep generating."""
+        pane = SessionPane.of(event.control)
+        if pane.busy:
+            pane.chat.add_info_message("Still replying to the previous message in this session")
+            return
+        pane.reply_task = pane.track(asyncio.create_task(self.send_message(event.message, pane)))
+
+    async def send_message(self, message: str, pane: Optional[SessionPane] = None) -> None:
+        """Send message to Ollama and display response in ``pane`` (default: the active tab)."""
+        pane = pane or self.session
+        chat_interface = pane.chat
+        model = self.model_name
+        if not model:
             chat_interface.add_error_message("No model selected")
             return
 
-        chat_interface = self.query_one("#chat-interface", ChatInterface)
         file_browser = self.query_one("#file-browser", FileBrowser)
-        # Early debug line to confirm handler execution
-        chat_interface.add_info_message("Debug: entered send_message handler")
+        spans = RequestSpans("chat", model, pane.session_id)
+        status = "error"
         
+        # Queue the user message; the write-behind queue persists it off the hot path
+        with spans.span("db"):
+            message_id = self.persistence.add_chat_message(pane.session_id, model, "user", message)
         # Display user message
-        chat_interface.add_user_message(message)
-        # Persist user message without blocking the event loop
-        try:
-            await asyncio.to_thread(add_chat_message, self.session_id, self.model_name, "user", message)
-        except Exception as db_err:
-            chat_interface.add_error_message(f"DB error (user message): {type(db_err).__name__}: {db_err}")
+        chat_interface.add_user_message(message, message_id)
+        if not pane.named:
+            pane.title = SessionPane.title_for(message)
+            pane.named = True
+        self.show_session_busy(pane, True)
         
         # Show loading indicator
         chat_interface.set_loading(True)
         # Let UI render the loading indicator
         await asyncio.sleep(0)
-        chat_interface.add_info_message(f"Contacting Ollama with model '{self.model_name}'...")
+        chat_interface.add_info_message(f"Contacting Ollama with model '{model}'...")
         
         try:
-            # Prepare prompt with context
-            full_prompt = self.prepare_prompt_with_context(message, file_browser.get_context_files())
-            
-            # First, ping Ollama HTTP API to verify connectivity
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as hc:
-                    tags_resp = await hc.get('http://127.0.0.1:11434/api/tags')
-                    if tags_resp.status_code != 200:
-                        chat_interface.add_error_message(
-                            f"Ollama /api/tags returned {tags_resp.status_code}: {tags_resp.text[:200]}"
-                        )
-            except Exception as ping_err:
-                chat_interface.add_error_message(f"Could not reach Ollama HTTP API: {type(ping_err).__name__}: {ping_err}")
-                # Continue anyway; the Python client might still work
-            # Try HTTP API generate with streaming first
-            full_text = ""
-            streamed_successfully = False
-            try:
-                async with httpx.AsyncClient(timeout=None) as hc:
-                    async with hc.stream(
-                        "POST",
-                        'http://127.0.0.1:11434/api/generate',
-                        json={"model": self.model_name, "prompt": full_prompt, "stream": True},
-                    ) as resp:
-                        if resp.status_code != 200:
-                            raise RuntimeError(f"HTTP {resp.status_code}: {await resp.aread()[:200]}")
-                        chat_interface.add_assistant_stream_start()
-                        async for line in resp.aiter_lines():
-                            if not line:
-                                continue
-                            try:
-                                data = json.loads(line)
-                            except json.JSONDecodeError:
-                                continue
-                            chunk = data.get("response") or ""
-                            if chunk:
-                                full_text += chunk
-                                chat_interface.append_assistant_stream_text(chunk)
-                            if data.get("done") is True:
-                                break
-                        chat_interface.end_assistant_stream()
-                        streamed_successfully = True
-            except Exception as stream_err:
-                chat_interface.add_info_message(f"Streaming failed: {type(stream_err).__name__}: {stream_err}; trying non-stream...")
-
-            if not streamed_successfully:
-                # Non-stream fallback via Python client
-                client = ollama.Client(host='http://127.0.0.1:11434')
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        client.generate,
-                        model=self.model_name,
-                        prompt=full_prompt,
-                    ),
-                    timeout=120,
+            # Prepare prompt with context, fitted to the model's context window
+            with spans.span("context"):
+                excerpts = await self.retrieve_excerpts(message, chat_interface)
+                built = await self.prepare_prompt_with_context(
+                    message, model, file_browser.get_context_files(), excerpts, pane.chat_turns
                 )
-                if hasattr(response, 'response'):
-                    full_text = response.response
-                elif isinstance(response, dict):
-                    full_text = response.get('response') or ""
-
-                if full_text:
-                    chat_interface.add_assistant_message(full_text)
-                else:
-                    chat_interface.add_error_message("No response received from Ollama (fallback path).")
+            messages = built.messages
+            file_browser.set_context_tokens(built.total_tokens, built.budget)
+            if built.reduced:
+                changes = ", ".join(f"{e.path.name} ({e.mode})" for e in built.reduced)
+                chat_interface.add_info_message(
+                    f"Context exceeds ~{built.budget:,} tokens; lowest-priority files reduced: {changes}"
+                )
+            retrieved = [e for e in built.entries if e.mode == "retrieved"]
+            if retrieved:
+                names = ", ".join(dict.fromkeys(e.path.name for e in retrieved))
+                chat_interface.add_info_message(f"Added {len(retrieved)} retrieved excerpt(s) from: {names}")
+            if built.history_dropped:
+                chat_interface.add_info_message(
+                    f"Oldest {built.history_dropped} turn(s) left out to fit the context window"
+                )
+            
+            # Health is cached by the provider; this only pings when nothing succeeded recently
+            if not await self.provider.is_healthy():
+                chat_interface.add_error_message(f"Could not reach Ollama HTTP API: {self.provider.last_error}")
+                # Continue anyway; the server may come back before the request
+            # One seed for both attempts; it is recorded so the reply can be replayed
+            options = chat_options(self.model_catalog, model)
+            if not self.scheduler.has_capacity(model):
+                chat_interface.set_status("Queued…")
+            full_text, final_raw, streamed_successfully = await self.scheduler.run(
+                model, lambda: self.generate_reply(chat_interface, model, messages, options, spans), Priority.CHAT
+            )
+            spans.add_generation(final_raw)
 
             # Save to database if any text was produced
+            reply_id = None
             if full_text:
+                with spans.span("db"):
+                    reply_id = self.persistence.add_chat_message(
+                        pane.session_id, model, "assistant", full_text
+                    )
+                pane.chat_turns.append({"role": "user", "content": message})
+                pane.chat_turns.append({"role": "assistant", "content": full_text})
                 try:
-                    await asyncio.to_thread(add_chat_message, self.session_id, self.model_name, "assistant", full_text)
-                except Exception as db_err:
-                    chat_interface.add_error_message(f"DB error (assistant message): {type(db_err).__name__}: {db_err}")
+                    record_envelope(
+                        self.envelopes, self.model_catalog,
+                        pane.session_id, model, messages, options, built, full_text, reply_id,
+                    )
+                except Exception as e:
+                    # The reply is already delivered and saved; it just cannot be replayed
+                    self.log.error(f"Recording the request failed: {type(e).__name__}: {e}")
+                # The reply becomes the Output panel's current artifact; Save links it to its message
+                self.query_one("#output-panel", OutputPanel).display_artifact(
+                    f"reply-{reply_id}", full_text, kind="reply", message_id=reply_id
+                )
+                status = "ok"
+            else:
+                status = "empty"
+            if streamed_successfully:
+                chat_interface.end_assistant_stream(reply_id)
+            elif full_text:
+                chat_interface.add_assistant_message(full_text, message_id=reply_id)
+            else:
+                chat_interface.add_error_message("No response received from Ollama (fallback path).")
+            if final_raw:
+                # A small prompt-eval count on later turns means the stable prefix was reused
+                chat_interface.add_info_message(f"Timing: {GenerationStats.from_raw(final_raw).describe()}")
             
         except asyncio.TimeoutError:
+            status = "timeout"
             chat_interface.add_error_message("Timed out waiting for Ollama response. Check the model and server logs.")
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
         except Exception as e:
             chat_interface.add_error_message(f"Error communicating with Ollama: {str(e)}")
         finally:
+            chat_interface.end_assistant_stream()
+            if status == "cancelled":
+                chat_interface.add_info_message("Reply cancelled")
             # Hide loading indicator
             chat_interface.set_loading(False)
+            self.show_session_busy(pane, False)
+            self.record_request(spans, status)
+
+    async def generate_reply(
+        self,
+        chat_interface: ChatInterface,
+        model: str,
+        messages: list[dict[str, str]],
+        options: dict,
+        spans: RequestSpans,
+    ) -> tuple[str, dict, bool]:
+        """Stream a reply into ``chat_interface``, falling back to a non-streamed request.
+
+        Returns ``(text, final chunk's raw fields, whether it streamed)``.
+        Cancelling it closes the HTTP stream, which stops Ollama generating.
+        """
+        chat_interface.update_loading_display(True)
+        full_text = ""
+        final_raw: dict = {}
+        try:
+            async for chunk in self.provider.chat(model, messages, stream=True, timer=spans, **options):
+                if chunk.done:
+                    final_raw = chunk.raw
+                if not chat_interface.is_streaming:
+                    chat_interface.add_assistant_stream_start()
+                if chunk.text:
+                    spans.mark("first_token")
+                    full_text += chunk.text
+                    chat_interface.append_assistant_stream_text(chunk.text)
+            return full_text, final_raw, True
+        except ProviderError as stream_err:
+            chat_interface.end_assistant_stream()
+            chat_interface.add_info_message(f"Streaming failed: {stream_err}; trying non-stream...")
+
+        # Non-stream fallback over the same pooled connection
+        result = await asyncio.wait_for(
+            self.provider.chat(model, messages, stream=False, **options),
+            timeout=120,
+        )
+        return result.text, result.raw, False
+
+    # --- Request metrics ---
+    def record_request(self, spans: RequestSpans, status: str = "ok", show: bool = True) -> None:
+        """Queue a finished request's stage timings and refresh the status-bar readout."""
+        spans.finish(status)
+        self.persistence.enqueue("request_metrics", spans.row())
+        if self.embedder is not None:
+            # The request may have written a message or summary to embed
+            self.embedder.poke()
+        if show:
+            asyncio.create_task(self.show_request_readout(spans))
+
+    async def load_latency_summaries(self, model: Optional[str] = None) -> list[LatencySummary]:
+        """p50/p95 per model and request kind, including requests still queued for writing."""
+        await self.persistence.flush()
+        rows = await asyncio.to_thread(get_request_percentiles, model)
+        return [LatencySummary.from_row(row) for row in rows]
+
+    async def show_request_readout(self, spans: RequestSpans) -> None:
+        """Show the last request's timings next to its model's p50/p95 in the status bar."""
+        readout = f"{spans.model} {spans.kind}: {spans.describe()}"
+        try:
+            summaries = await self.load_latency_summaries(spans.model)
+        except Exception as e:
+            self.log.error(f"Request metrics unavailable: {type(e).__name__}: {e}")
+            summaries = []
+        for summary in summaries:
+            if summary.kind == spans.kind:
+                readout += f" │ {summary.describe()}"
+        # The readout goes to the session that made the request, if its tab is still open
+        for pane in self.sessions:
+            if pane.session_id == spans.session_id:
+                pane.chat.set_metrics(readout)
+
+    def action_search(self) -> None:
+        """Search messages and summaries of all sessions (Ctrl+G)."""
+        self.push_screen(SearchScreen(self.run_search, self.embedder is not None), self.show_search_hit)
+
+    async def run_search(self, query: str, semantic: bool = False) -> list[SearchHit]:
+        """BM25 matches for ``query``, fused with embedding similarity when ``semantic``."""
+        repo = get_repository()
+        hits = await asyncio.to_thread(search_text, repo, query)
+        if semantic and self.embedder is not None:
+            vector = await self.embedder.embed_query(query)
+            similar = await asyncio.to_thread(search_similar, repo, self.embedder.model, vector)
+            hits = fuse(hits, similar)
+        return hits
+
+    def show_search_hit(self, hit: Optional[SearchHit]) -> None:
+        if hit is None:
+            return
+        chat_interface = self.session.chat
+        if hit.source == "chat":
+            when = f"{hit.timestamp:%Y-%m-%d %H:%M}" if hit.timestamp else "unknown time"
+            source = f"{hit.role} message, session {hit.where[:8]}, {when}"
+        else:
+            source = f"summary of {hit.where} by {hit.model}"
+        chat_interface.add_search_result(source, hit.content)
+
+    def action_show_metrics(self) -> None:
+        """Show p50/p95 request timings per model (Ctrl+T)."""
+        self.push_screen(MetricsScreen(self.load_latency_summaries))
+
+    async def summarize_with_metrics(
+        self,
+        file_path: Path,
+        model: str,
+        session_id: str,
+        on_event: Optional[Callable[[str], None]] = None,
+        show: bool = True,
+        priority: Priority = Priority.SUMMARY,
+    ) -> tuple[str, bool]:
+        """``summarizer.summarize`` with its stage timings recorded (cache hits make no request).
+
+        The timings are charged to ``session_id``, the session that asked for the summary.
+        """
+        return await summarize_with_metrics(
+            self.summarizer, file_path, model, session_id,
+            lambda spans, status: self.record_request(spans, status, show=show),
+            on_event=on_event, priority=priority,
+        )
 
     # --- Output root change flow ---
     def on_output_panel_change_root_requested(self, event: OutputPanel.ChangeRootRequested) -> None:
@@ -204,10 +663,11 @@ class OllamaTUI(App):
                 new_root = Path(path_str).expanduser().resolve()
                 panel = self.query_one("#output-panel", OutputPanel)
                 panel.set_output_root(new_root)
-                ci = self.query_one("#chat-interface", ChatInterface)
+                asyncio.create_task(self.load_artifact_manifest())
+                ci = self.session.chat
                 ci.add_info_message(f"Output root set to: {new_root}")
             except Exception as e:
-                ci = self.query_one("#chat-interface", ChatInterface)
+                ci = self.session.chat
                 ci.add_error_message(f"Failed to set output root: {e}")
 
         self.push_screen(OutputRootPrompt(), set_root)
@@ -221,29 +681,78 @@ class OllamaTUI(App):
                 new_root = Path(path_str).expanduser().resolve()
                 panel = self.query_one("#output-panel", OutputPanel)
                 panel.set_output_root(new_root)
-                ci = self.query_one("#chat-interface", ChatInterface)
+                asyncio.create_task(self.load_artifact_manifest())
+                ci = self.session.chat
                 ci.add_info_message(f"Output root set to: {new_root}")
             except Exception as e:
-                ci = self.query_one("#chat-interface", ChatInterface)
+                ci = self.session.chat
                 ci.add_error_message(f"Failed to set output root: {e}")
 
         self.push_screen(OutputRootPrompt(), set_root)
 
-    def prepare_prompt_with_context(self, message: str, context_files: list[Path]) -> str:
-        """Prepare prompt with file context if any."""
-        if not context_files:
-            return message
-        
-        context_parts = []
-        for file_path in context_files:
-            try:
-                content = file_path.read_text(encoding='utf-8')
-                context_parts.append(f"-- FILE: {file_path} --\n{content}\n")
-            except Exception as e:
-                context_parts.append(f"-- FILE: {file_path} (Error reading: {e}) --\n")
-        
-        context_str = "\n".join(context_parts)
-        return f"{context_str}\n-- USER PROMPT --\n{message}"
+    async def retrieve_excerpts(self, message: str, chat_interface: ChatInterface) -> list[RetrievedChunk]:
+        """Project chunks closest to ``message``; none when retrieval is off or fails."""
+        if self.rag is None:
+            return []
+        try:
+            return await self.rag.retrieve(message)
+        except Exception as e:
+            chat_interface.add_info_message(f"Retrieval skipped: {type(e).__name__}: {e}")
+            return []
+
+    async def prepare_prompt_with_context(
+        self,
+        message: str,
+        model: str,
+        context_files: list[Path],
+        excerpts: list[RetrievedChunk] = (),
+        history: Optional[list[dict[str, str]]] = None,
+    ) -> BuiltContext:
+        """Prepare /api/chat messages (system + context, history, excerpts + message) within ``model``'s token budget."""
+        return await asyncio.to_thread(
+            self.context_builder.build_messages,
+            message, context_files, model, list(self.session.chat_turns if history is None else history),
+            lambda path: self.summarizer.cached_summary(path, model),
+            excerpts=[(chunk.path, chunk.label, chunk.text) for chunk in excerpts],
+        )
+
+    async def refresh_context_tokens(self) -> None:
+        """Recompute the context token total shown in the file browser."""
+        file_browser = self.query_one("#file-browser", FileBrowser)
+        files = file_browser.get_context_files()
+        if not files:
+            return
+        tokens = await asyncio.to_thread(self.context_builder.measure, files)
+        file_browser.set_context_tokens(tokens, self.context_builder.budget_for(self.model_name))
+
+    def on_file_browser_file_added_to_context(self, event: FileBrowser.FileAddedToContext) -> None:
+        asyncio.create_task(self.refresh_context_tokens())
+
+    def on_file_browser_file_removed_from_context(self, event: FileBrowser.FileRemovedFromContext) -> None:
+        asyncio.create_task(self.refresh_context_tokens())
+
+    async def on_file_browser_files_changed(self, event: FileBrowser.FilesChanged) -> None:
+        """Drop cached contents of changed context files and patch the file index."""
+        batch = event.batch
+        file_browser = self.query_one("#file-browser", FileBrowser)
+        chat_interface = self.session.chat
+        changed = [p for p in file_browser.get_context_files() if batch.overflow or p in batch.paths]
+        for path in changed:
+            self.context_builder.invalidate(path)
+            if not path.is_file() and file_browser.remove_from_context(path):
+                chat_interface.add_info_message(f"Removed from context (file deleted): {path.name}")
+        if changed:
+            asyncio.create_task(self.refresh_context_tokens())
+        if batch.overflow:
+            asyncio.create_task(self.build_file_index())
+        elif self.file_index.ready:
+            await asyncio.to_thread(self._patch_file_index, batch.paths)
+            if self.rag is not None:
+                changed = await asyncio.to_thread(self._rag_changes, batch.paths)
+                if changed is None:
+                    self.rag.sync(self.file_index.files())
+                elif changed:
+                    self.rag.enqueue(changed)
 
     def on_file_browser_file_selected(self, event: FileBrowser.FileSelected) -> None:
         """Handle file selection in file browser."""
@@ -251,11 +760,20 @@ class OllamaTUI(App):
         # Store the selected file for context operations
         self.selected_file = event.path
 
+    def open_indexed_file(self, rel_path: str) -> None:
+        """Select a file picked in file search and add it to context."""
+        file_browser = self.query_one("#file-browser", FileBrowser)
+        # Same path form as the tree produces, so context entries never duplicate
+        path = self.file_index.root / rel_path
+        file_browser.select_file(path)
+        self.selected_file = path
+        self.action_add_to_context()
+
     def action_add_to_context(self) -> None:
         """Add selected file to context."""
         if hasattr(self, 'selected_file') and self.selected_file:
             file_browser = self.query_one("#file-browser", FileBrowser)
-            chat_interface = self.query_one("#chat-interface", ChatInterface)
+            chat_interface = self.session.chat
             
             if file_browser.add_to_context(self.selected_file):
                 chat_interface.add_info_message(f"Added to context: {self.selected_file.name}")
@@ -263,7 +781,7 @@ class OllamaTUI(App):
     def action_clear_context(self) -> None:
         """Clear all files from context."""
         file_browser = self.query_one("#file-browser", FileBrowser)
-        chat_interface = self.query_one("#chat-interface", ChatInterface)
+        chat_interface = self.session.chat
         
         file_browser.clear_context()
         chat_interface.add_info_message("Context cleared")
@@ -272,86 +790,177 @@ class OllamaTUI(App):
         """Refresh the file explorer tree (F5)."""
         fb = self.query_one("#file-browser", FileBrowser)
         fb.refresh_tree()
+        asyncio.create_task(self.build_file_index())
 
     def action_summarize_file(self) -> None:
         """Summarize the selected file."""
         if hasattr(self, 'selected_file') and self.selected_file and self.model_name:
-            asyncio.create_task(self.summarize_file(self.selected_file))
+            pane = self.session
+            pane.track(asyncio.create_task(self.summarize_file(self.selected_file, pane)))
 
-    async def summarize_file(self, file_path: Path) -> None:
-        """Generate and store a summary of the file."""
-        chat_interface = self.query_one("#chat-interface", ChatInterface)
-        output_panel = self.query_one("#output-panel", OutputPanel)
+    async def summarize_file(self, file_path: Path, pane: SessionPane) -> None:
+        """Generate and store a summary of the file, reporting in ``pane``."""
+        chat_interface = pane.chat
         
         try:
-            content = file_path.read_text(encoding='utf-8')
-            
             # Show loading
             chat_interface.set_loading(True)
             await asyncio.sleep(0)
             chat_interface.add_info_message(f"Summarizing '{file_path.name}' with model '{self.model_name}'...")
             
-            # Generate summary
-            prompt = f"Please provide a concise summary of this file:\n\n-- FILE: {file_path} --\n{content}"
-            
-            response = None
-            # Try HTTP API first
-            try:
-                async with httpx.AsyncClient(timeout=180.0) as hc:
-                    gen_resp = await hc.post(
-                        'http://127.0.0.1:11434/api/generate',
-                        json={"model": self.model_name, "prompt": prompt, "stream": False},
-                    )
-                    if gen_resp.status_code == 200:
-                        response = gen_resp.json()
-                    else:
-                        chat_interface.add_info_message(
-                            f"HTTP generate for summary failed with {gen_resp.status_code}; falling back to Python client."
-                        )
-            except Exception as http_err:
-                chat_interface.add_info_message(f"HTTP generate summary error: {http_err}; falling back to client.")
-
-            if response is None:
-                client = ollama.Client(host='http://127.0.0.1:11434')
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        client.generate,
-                        model=self.model_name,
-                        prompt=prompt,
-                    ),
-                    timeout=180,
+            summary, cached = await self.summarize_with_metrics(
+                file_path, self.model_name, pane.session_id, on_event=chat_interface.add_info_message
+            )
+            if cached:
+                chat_interface.add_info_message(
+                    f"Summary cache hit for '{file_path.name}' ({self.summary_cache.stats()})"
                 )
-            
-            # Extract summary from dict or Pydantic object
-            if hasattr(response, 'response'):
-                summary = response.response
-            elif isinstance(response, dict):
-                summary = response.get('response')
-            else:
-                summary = None
-            if not summary:
-                chat_interface.add_error_message("No summary received from Ollama.")
-                return
-            
-            # Save summary to database
-            add_file_summary(str(file_path), self.model_name, summary)
-            
-            # Display summary in chat and Output panel
-            chat_interface.add_file_summary(file_path.name, summary)
-            output_panel.display_artifact(f"{file_path.name}", summary)
-
-            # Auto-save artifact to disk per spec answers
-            saved = output_panel.save_current_artifact()
-            if saved:
-                chat_interface.add_info_message(f"Saved summary to: {saved}")
+            await self._show_file_summary(file_path, summary, chat_interface)
             
         except asyncio.TimeoutError:
             chat_interface.add_error_message("Timed out waiting for summary from Ollama.")
+        except asyncio.CancelledError:
+            chat_interface.add_info_message(f"Summary of '{file_path.name}' cancelled")
+            raise
         except Exception as e:
             chat_interface.add_error_message(f"Error summarizing file: {str(e)}")
         finally:
             chat_interface.set_loading(False)
 
+    async def _show_file_summary(
+        self, file_path: Path, summary: str, chat_interface: Optional[ChatInterface] = None
+    ) -> None:
+        """Display and auto-save a summary (fresh or cached); the save runs off the UI thread."""
+        chat_interface = chat_interface or self.session.chat
+        output_panel = self.query_one("#output-panel", OutputPanel)
+
+        # Display summary in chat and Output panel
+        chat_interface.add_file_summary(file_path.name, summary)
+        output_panel.display_artifact(f"{file_path.name}", summary)
+
+        # Auto-save artifact to disk per spec answers
+        try:
+            saved = await output_panel.save_current_artifact()
+        except Exception as e:
+            chat_interface.add_error_message(f"Failed to save summary: {e}")
+            return
+        if saved and saved.new:
+            chat_interface.add_info_message(f"Saved summary to: {saved.path}")
+        elif saved:
+            chat_interface.add_info_message(f"Summary unchanged, already saved as: {saved.path}")
+
+    def on_output_panel_saved(self, event: OutputPanel.Saved) -> None:
+        """Report a save from the Output panel's Save button."""
+        chat_interface = self.session.chat
+        record = event.record
+        if record.new:
+            chat_interface.add_info_message(f"Saved {record.kind} to: {record.path}")
+        else:
+            chat_interface.add_info_message(f"{record.kind.capitalize()} unchanged, already saved as: {record.path}")
+
+    def on_output_panel_save_failed(self, event: OutputPanel.SaveFailed) -> None:
+        chat_interface = self.session.chat
+        chat_interface.add_error_message(f"Failed to save artifact: {event.error}")
+
+
+    # --- Batch summarization ---
+    def action_summarize_directory(self) -> None:
+        """Summarize files matching a glob under the explorer root (Ctrl+B); cancels a running batch."""
+        pane = self.session
+        chat_interface = pane.chat
+        if self.batch is not None and self.batch.running:
+            self.batch.cancel()
+            chat_interface.add_info_message("Cancelling batch summarization...")
+            return
+        if not self.model_name:
+            chat_interface.add_error_message("No model selected")
+            return
+
+        def start_batch(answer: tuple[str, int] | None) -> None:
+            if answer:
+                pattern, concurrency = answer
+                asyncio.create_task(self.summarize_directory(pattern, concurrency, pane))
+
+        self.push_screen(BatchSummarizePrompt(default_concurrency() * len(self.provider.backends)), start_batch)
+
+    async def summarize_directory(self, pattern: str, concurrency: int, pane: SessionPane) -> None:
+        """Summarize every file matching ``pattern`` with at most ``concurrency`` requests in flight.
+
+        Progress and errors go to ``pane``, the tab the batch was started from.
+        """
+        chat_interface = pane.chat
+        output_panel = self.query_one("#output-panel", OutputPanel)
+        root = Path(self.query_one("#file-browser", FileBrowser).root_path).resolve()
+        model = self.model_name
+
+        try:
+            files = await asyncio.to_thread(discover_files, root, pattern)
+        except Exception as e:
+            chat_interface.add_error_message(f"Invalid pattern '{pattern}': {e}")
+            return
+        if not files:
+            chat_interface.add_info_message(f"No files match '{pattern}' under {root}")
+            return
+        chat_interface.add_info_message(
+            f"Summarizing {len(files)} files matching '{pattern}' with {concurrency} parallel "
+            f"requests (Ctrl+B to cancel)..."
+        )
+
+        # Fresh summaries are written to the output root in groups, off the UI thread
+        store, writer = output_panel.store, output_panel.writer
+        pending_artifacts: list[tuple[str, str]] = []
+        writes: list[asyncio.Task] = []
+
+        async def write_artifacts(items: list[tuple[str, str]]) -> None:
+            try:
+                records = await writer.save_many(store, items)
+            except Exception as e:
+                chat_interface.add_error_message(f"Failed to save batch artifacts: {e}")
+                return
+            for record in records:
+                if record.new:
+                    output_panel.add_recent(record.path)
+
+        def flush_artifacts() -> None:
+            if pending_artifacts:
+                items = pending_artifacts[:]
+                pending_artifacts.clear()
+                writes.append(asyncio.create_task(write_artifacts(items)))
+
+        def on_result(path: Path, summary: str, cached: bool) -> None:
+            # Cached files were saved by the run that generated them
+            if not cached:
+                pending_artifacts.append((str(path.relative_to(root)), summary))
+                if len(pending_artifacts) >= self.ARTIFACT_BATCH_SIZE:
+                    flush_artifacts()
+
+        def on_error(path: Path, err: Exception) -> None:
+            reason = "timed out" if isinstance(err, asyncio.TimeoutError) else str(err)
+            chat_interface.add_error_message(f"Failed to summarize {path.relative_to(root)}: {reason}")
+
+        def on_progress(progress: BatchProgress) -> None:
+            chat_interface.set_status(f"Batch: {progress.describe()}")
+
+        self.batch = BatchSummarizer(
+            # The status bar shows batch progress, so per-file readouts are skipped
+            lambda path: self.summarize_with_metrics(
+                path, model, pane.session_id, show=False, priority=Priority.BATCH
+            ),
+            concurrency=concurrency,
+            on_result=on_result,
+            on_error=on_error,
+            on_progress=on_progress,
+        )
+        try:
+            progress = await self.batch.run(files)
+        finally:
+            flush_artifacts()
+            await asyncio.gather(*writes)
+            chat_interface.set_status("")
+        outcome = "cancelled" if progress.cancelled else "finished"
+        chat_interface.add_info_message(
+            f"Batch {outcome}: {progress.describe()}. Summary cache: {self.summary_cache.stats()}"
+        )
 
 
 if __name__ == "__main__":
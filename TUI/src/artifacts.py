@@ -0,0 +1,260 @@
+"""Writing generated artifacts (summaries, replies) under an output root.
+
+UI-free. ``ArtifactStore`` is blocking; ``ArtifactWriter`` runs its saves
+on a thread pool of its own, so the TUI and the headless batch runner can
+await a save of any size without stalling their event loop.
+
+Contents are stored once per output root, by SHA-256, under
+``<root>/.blobs``. Each save gets a human-friendly name,
+``<slug>.<kind>.<ts>.md``, which is a relative symlink to the blob (a hard
+link or a copy where symlinks are not available). Every name is also a
+manifest row in DuckDB, linked to the ``chat_history`` message it came
+from (if any). Saving the same content under the same title
+again returns the existing name and touches nothing on disk.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from types import ModuleType
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    from database import WriteBehindQueue
+
+BLOB_DIR = ".blobs"
+
+# "zstd" compresses blobs (needs the zstandard package, or Python 3.14+); names then exist only as manifest rows
+DEFAULT_COMPRESSION = os.environ.get("CAI_ARTIFACT_COMPRESSION", "")
+
+
+def default_output_root() -> Path:
+    """``./out`` under the current directory (created on first write)."""
+    return Path.cwd() / "out"
+
+
+def artifact_filename(title: str, ts: str, kind: str = "summary") -> str:
+    """``<slug>.<kind>.<ts>.md``; a relative path in ``title`` is flattened into the slug."""
+    slug = "_".join(Path(title).with_suffix("").parts).replace(" ", "_")
+    return f"{slug}.{kind}.{ts}.md"
+
+
+def _zstd_module() -> Optional[ModuleType]:
+    """A module with ``compress``/``decompress`` for zstd, if one is installed."""
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write ``data`` to a temporary file next to ``path`` and rename it into place."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class ArtifactRecord:
+    """One saved artifact: a name under the output root and the blob it points to."""
+    root: Path
+    name: str
+    title: str
+    kind: str
+    hash: str
+    size: int
+    compression: str = ""
+    created_at: datetime = field(default_factory=datetime.now)
+    # The chat_history row this artifact was generated as, if any
+    message_id: Optional[int] = None
+    # False when an earlier save of the same title and content was returned instead
+    new: bool = True
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "ArtifactRecord":
+        """From a manifest row, as returned by ``get_latest_artifacts``/``get_recent_artifacts``."""
+        created_at, root, name, title, kind, digest, size, compression, message_id = row
+        return cls(
+            Path(root), name, title, kind, digest, size, compression or "", created_at, message_id, new=False
+        )
+
+    @property
+    def path(self) -> Path:
+        return self.root / self.name
+
+    def row(self) -> tuple:
+        """The record for the ``artifacts`` manifest (see ``_WRITE_SQL``)."""
+        return (
+            self.created_at, str(self.root), self.name, self.title, self.kind,
+            self.hash, self.size, self.compression, self.message_id,
+        )
+
+
+class ArtifactStore:
+    """Content-addressed artifact storage for one output root.
+
+    Blobs are written only when their hash is new; names only when the
+    content of a title changed since its last save. ``remember`` seeds the
+    last save per title (e.g. from the manifest of earlier runs), so
+    unchanged re-saves cost no disk I/O across sessions too. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        persistence: Optional[WriteBehindQueue] = None,
+        compression: str = DEFAULT_COMPRESSION,
+    ):
+        self.root = root
+        self.persistence = persistence
+        self._zstd = _zstd_module() if compression == "zstd" else None
+        self.compression = "zstd" if self._zstd is not None else ""
+        self._blobs: set[str] = set()
+        self._latest: dict[tuple[str, str], ArtifactRecord] = {}
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str, compression: Optional[str] = None) -> Path:
+        compression = self.compression if compression is None else compression
+        suffix = ".md.zst" if compression == "zstd" else ".md"
+        return self.root / BLOB_DIR / digest[:2] / f"{digest}{suffix}"
+
+    def remember(self, records: Iterable[ArtifactRecord]) -> None:
+        """Treat ``records`` (oldest first) as the latest saves of their titles."""
+        with self._lock:
+            for record in records:
+                self._latest[(record.title, record.kind)] = record
+                if record.compression == self.compression:
+                    self._blobs.add(record.hash)
+
+    def _store_blob(self, digest: str, data: bytes) -> None:
+        with self._lock:
+            if digest in self._blobs:
+                return
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, self._zstd.compress(data) if self._zstd is not None else data)
+        with self._lock:
+            self._blobs.add(digest)
+
+    def _link(self, blob: Path, name: Path) -> None:
+        """Point ``name`` at ``blob``, replacing whatever had that name."""
+        tmp = name.with_name(f".{name.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.symlink(os.path.relpath(blob, name.parent), tmp)
+        except OSError:
+            # No symlink support (e.g. Windows without developer mode)
+            try:
+                os.link(blob, tmp)
+            except OSError:
+                shutil.copyfile(blob, tmp)
+        os.replace(tmp, name)
+
+    def save(
+        self,
+        title: str,
+        markdown: str,
+        kind: str = "summary",
+        ts: Optional[str] = None,
+        message_id: Optional[int] = None,
+    ) -> ArtifactRecord:
+        """Store ``markdown`` and name it after ``title``; blocking."""
+        data = markdown.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            previous = self._latest.get((title, kind))
+        if (
+            previous is not None
+            and previous.hash == digest
+            and previous.compression == self.compression
+            # A name the user deleted is written again
+            and (self.compression or os.path.lexists(previous.path))
+        ):
+            if message_id is None or message_id == previous.message_id:
+                return replace(previous, new=False)
+            # Same file for another message: only the manifest learns the link
+            record = replace(previous, message_id=message_id, created_at=datetime.now(), new=False)
+            self._record(record)
+            return record
+
+        self._store_blob(digest, data)
+        ts = ts or datetime.now().strftime("%Y%m%d-%H%M%S")
+        record = ArtifactRecord(
+            self.root, artifact_filename(title, ts, kind), title, kind, digest, len(data), self.compression,
+            message_id=message_id,
+        )
+        if not self.compression:
+            self._link(self.blob_path(digest), record.path)
+        self._record(record)
+        return record
+
+    def _record(self, record: ArtifactRecord) -> None:
+        with self._lock:
+            self._latest[(record.title, record.kind)] = record
+        if self.persistence is not None:
+            self.persistence.enqueue("artifacts", record.row())
+
+    def save_many(
+        self, items: list[tuple[str, str]], kind: str = "summary", message_id: Optional[int] = None
+    ) -> list[ArtifactRecord]:
+        """Save ``(title, markdown)`` pairs under one timestamp."""
+        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return [self.save(title, markdown, kind, ts, message_id) for title, markdown in items]
+
+    def read(self, record: ArtifactRecord) -> str:
+        """The content behind ``record`` (decompressed if needed)."""
+        data = self.blob_path(record.hash, record.compression).read_bytes()
+        if record.compression == "zstd":
+            zstd = self._zstd or _zstd_module()
+            if zstd is None:
+                raise RuntimeError("Reading a zstd artifact needs the zstandard package")
+            data = zstd.decompress(data)
+        return data.decode("utf-8")
+
+
+
+class ArtifactWriter:
+    """Awaitable saves on a dedicated thread pool.
+
+    Large writes neither block the event loop nor occupy the default
+    executor that database reads and file loads share. One worker keeps
+    saves in submission order, so the last save of a title is also the
+    last one in the manifest.
+    """
+
+    def __init__(self, workers: int = 1):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="artifact-writer")
+
+    async def save_many(
+        self,
+        store: ArtifactStore,
+        items: list[tuple[str, str]],
+        kind: str = "summary",
+        message_id: Optional[int] = None,
+    ) -> list[ArtifactRecord]:
+        """``store.save_many`` on the writer's pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, store.save_many, items, kind, message_id)
+
+    def close(self, wait: bool = True) -> None:
+        """Stop accepting saves; with ``wait``, finish the queued ones first."""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,409 @@
+"""Headless batch mode: run a manifest of prompts and summaries without the TUI.
+
+Jobs go through the same pieces the TUI uses: ``ContextBuilder`` for
+prompts, the Ollama provider for generation, ``FileSummarizer`` (and its
+content-hash cache) for summaries and the write-behind queue for DuckDB.
+Each finished job is written to stdout (or ``--results``) as one JSON
+line; the last line holds throughput stats.
+
+Manifest: JSON Lines (or one JSON array) of jobs, paths relative to ``--root``::
+
+    {"id": "explain-app", "prompt": "Explain the start-up path", "files": ["src/app.py"]}
+    {"summarize": "src/**/*.py"}
+    {"summarize": ["README.md", "docs/design.md"], "model": "llama3.2:1b"}
+
+Usage: python cai.py batch MANIFEST --model NAME [--concurrency N] [--output-root DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import signal
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, TextIO
+
+import artifacts
+from artifacts import ArtifactRecord, ArtifactStore, ArtifactWriter
+from batch_summarizer import BatchProgress, BatchSummarizer, default_concurrency, discover_files
+from context_builder import ContextBuilder
+from database import DB_FILE, ChatRepository, WriteBehindQueue
+from envelopes import EnvelopeRecorder
+from model_catalog import ModelCatalog
+from providers import DEFAULT_OLLAMA_HOSTS, GenerationStats, Provider, ProviderError, ProviderPool
+from request_metrics import RequestSpans
+from request_recording import chat_options, record_envelope, run_measured
+from summarizer import FileSummarizer
+from summary_cache import SummaryCache
+
+
+class ManifestError(ValueError):
+    """The manifest could not be parsed into jobs."""
+
+
+@dataclass
+class BatchJob:
+    """One unit of work: a chat prompt (with context files) or one file to summarize."""
+    id: str
+    kind: str  # "chat" or "summary"
+    model: str
+    prompt: str = ""
+    files: list[Path] = field(default_factory=list)
+    # Filled in while running
+    started_at: float = 0.0
+    artifact: Optional[Path] = None
+    message_id: Optional[int] = None
+    stats: Optional[GenerationStats] = None
+
+
+def _entries(text: str) -> list[tuple[int, Any]]:
+    """Parse a JSON array or JSON Lines into ``(line, entry)`` pairs."""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        try:
+            return [(i + 1, entry) for i, entry in enumerate(json.loads(text))]
+        except json.JSONDecodeError as e:
+            raise ManifestError(f"Invalid JSON: {e}") from e
+    entries = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            entries.append((lineno, json.loads(line)))
+        except json.JSONDecodeError as e:
+            raise ManifestError(f"Line {lineno}: invalid JSON: {e}") from e
+    return entries
+
+
+def load_manifest(text: str, root: Path, default_model: Optional[str]) -> list[BatchJob]:
+    """Turn manifest entries into jobs; a ``summarize`` entry yields one job per file. Blocking."""
+    root = root.resolve()
+    jobs: list[BatchJob] = []
+    seen: set[str] = set()
+    for lineno, entry in _entries(text):
+        if not isinstance(entry, dict):
+            raise ManifestError(f"Entry {lineno}: expected an object")
+        model = entry.get("model") or default_model
+        if not model:
+            raise ManifestError(f"Entry {lineno}: no model (set \"model\" or pass --model)")
+        if "prompt" in entry:
+            job_id = str(entry.get("id") or f"job-{lineno}")
+            names = entry.get("files", [])
+            if not _is_path_list(names):
+                raise ManifestError(f"Entry {lineno} ({job_id}): \"files\" must be a list of paths")
+            files = [(root / f).resolve() for f in names]
+            missing = [str(f) for f in files if not f.is_file()]
+            if missing:
+                raise ManifestError(f"Entry {lineno}: context files not found: {', '.join(missing)}")
+            new = [BatchJob(job_id, "chat", model, prompt=str(entry["prompt"]), files=files)]
+        elif "summarize" in entry:
+            spec = entry["summarize"]
+            if isinstance(spec, str):
+                paths = discover_files(root, spec)
+            elif not _is_path_list(spec):
+                raise ManifestError(f"Entry {lineno}: \"summarize\" must be a glob or a list of paths")
+            else:
+                paths = [(root / f).resolve() for f in spec]
+                missing = [str(f) for f in paths if not f.is_file()]
+                if missing:
+                    raise ManifestError(f"Entry {lineno}: files to summarize not found: {', '.join(missing)}")
+            prefix = f"{entry['id']}:" if entry.get("id") else ""
+            new = [
+                BatchJob(f"{prefix}{_relative(path, root)}", "summary", model, files=[path])
+                for path in paths
+            ]
+        else:
+            raise ManifestError(f"Entry {lineno}: expected \"prompt\" or \"summarize\"")
+        for job in new:
+            if job.id in seen:
+                raise ManifestError(f"Entry {lineno}: duplicate job id {job.id!r}")
+            seen.add(job.id)
+        jobs.extend(new)
+    return jobs
+
+
+def _is_path_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _relative(path: Path, root: Path) -> str:
+    try:
+        return str(path.relative_to(root))
+    except ValueError:
+        return str(path)
+
+
+@dataclass
+class BatchStats:
+    """Throughput of a finished run."""
+    progress: BatchProgress
+    latencies: list[float] = field(default_factory=list)
+    prompt_tokens: int = 0
+    eval_tokens: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        elapsed = self.progress.elapsed
+        p50 = p95 = None
+        if len(self.latencies) >= 2:
+            cuts = statistics.quantiles(self.latencies, n=20, method="inclusive")
+            p50, p95 = round(cuts[9], 3), round(cuts[18], 3)
+        elif self.latencies:
+            p50 = p95 = self.latencies[0]
+        return {
+            "type": "stats",
+            "jobs": self.progress.total,
+            "done": self.progress.done,
+            "cached": self.progress.cached,
+            "failed": self.progress.failed,
+            "cancelled": self.progress.cancelled,
+            "elapsed_s": round(elapsed, 3),
+            "jobs_per_s": round(self.progress.done / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency_p50_s": p50,
+            "latency_p95_s": p95,
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+            # Aggregate generation throughput across all concurrent requests
+            "eval_tokens_per_s": round(self.eval_tokens / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+class HeadlessRunner:
+    """Runs batch jobs with bounded concurrency and reports each one through ``emit``."""
+
+    def __init__(
+        self,
+        provider: Provider,
+        repo: ChatRepository,
+        output_root: Path,
+        root: Path,
+        emit: Callable[[dict[str, Any]], None],
+        concurrency: Optional[int] = None,
+        timeout: float = 180,
+        write_cached: bool = False,
+    ):
+        self.provider = provider
+        self.repo = repo
+        self.output_root = output_root
+        self.root = root.resolve()
+        self.emit = emit
+        self.concurrency = concurrency or default_concurrency()
+        self.timeout = timeout
+        self.write_cached = write_cached
+        self.session_id = f"batch-{uuid.uuid4()}"
+        self.persistence = WriteBehindQueue(repo)
+        self.summary_cache = SummaryCache(repo, self.persistence)
+        self.envelopes = EnvelopeRecorder(self.persistence)
+        self.artifacts = ArtifactStore(output_root, self.persistence)
+        self.writer = ArtifactWriter()
+        self.summarizer = FileSummarizer(provider, self.summary_cache, self.persistence, timeout=timeout)
+        self.context_builder = ContextBuilder()
+        self.catalog = ModelCatalog(provider, repo, provider.host)
+        self.batch: Optional[BatchSummarizer[BatchJob]] = None
+
+    async def _prepare_models(self, models: set[str]) -> None:
+        """Size each model's prompt budget from its metadata (fresh if reachable, else cached)."""
+        await asyncio.to_thread(self.catalog.cached)
+        try:
+            await self.catalog.refresh(timeout=min(self.timeout, 30))
+        except Exception:
+            # Offline or slow: the list from the last run (if any) still sizes the prompts
+            pass
+        for model in models:
+            num_ctx = self.catalog.num_ctx_for(model)
+            if num_ctx:
+                self.context_builder.set_context_length(model, num_ctx)
+
+    async def _write_artifact(self, job: BatchJob, title: str, text: str, kind: str) -> None:
+        (record,) = await self.writer.save_many(self.artifacts, [(title, text)], kind, job.message_id)
+        job.artifact = record.path
+
+    async def run_job(self, job: BatchJob) -> tuple[str, bool]:
+        """Run one job and queue its stage timings for ``request_metrics`` (cache hits make no request)."""
+        job.started_at = time.monotonic()
+        spans = RequestSpans(job.kind, job.model, self.session_id)
+        return await run_measured(spans, lambda: self._run_job(job, spans), self._record_request)
+
+    def _record_request(self, spans: RequestSpans, status: str) -> None:
+        spans.finish(status)
+        self.persistence.enqueue("request_metrics", spans.row())
+
+    async def _run_job(self, job: BatchJob, spans: RequestSpans) -> tuple[str, bool]:
+        if job.kind == "summary":
+            (path,) = job.files
+            summary, cached = await self.summarizer.summarize(path, job.model, spans=spans)
+            if not cached or self.write_cached:
+                await self._write_artifact(job, _relative(path, self.root), summary, "summary")
+            return summary, cached
+
+        with spans.span("context"):
+            built = await asyncio.to_thread(
+                self.context_builder.build_messages,
+                job.prompt, job.files, job.model, [],
+                lambda path: self.summarizer.cached_summary(path, job.model),
+            )
+        with spans.span("db"):
+            self.persistence.add_chat_message(self.session_id, job.model, "user", job.prompt)
+        options = chat_options(self.catalog, job.model)
+        result = await asyncio.wait_for(
+            self.provider.chat(job.model, built.messages, stream=False, timer=spans, **options),
+            timeout=self.timeout,
+        )
+        spans.add_generation(result.raw)
+        if not result.text:
+            raise ProviderError("No response received from Ollama.")
+        with spans.span("db"):
+            job.message_id = self.persistence.add_chat_message(
+                self.session_id, job.model, "assistant", result.text
+            )
+            try:
+                record_envelope(
+                    self.envelopes, self.catalog,
+                    self.session_id, job.model, built.messages, options, built, result.text, job.message_id,
+                )
+            except Exception as e:
+                # The reply is saved; a missing envelope only means it cannot be replayed
+                print(f"cai batch: could not record the request of job {job.id}: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+        job.stats = GenerationStats.from_raw(result.raw)
+        await self._write_artifact(job, job.id, result.text, "reply")
+        return result.text, False
+
+    def _record(self, job: BatchJob, status: str, **extra: Any) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "type": "result",
+            "id": job.id,
+            "kind": job.kind,
+            "model": job.model,
+            "status": status,
+            "files": [_relative(f, self.root) for f in job.files],
+            "seconds": round(time.monotonic() - job.started_at, 3),
+            "artifact": str(job.artifact) if job.artifact else None,
+        }
+        if job.message_id is not None:
+            record["message_id"] = job.message_id
+        if job.stats is not None:
+            record["prompt_tokens"] = job.stats.prompt_tokens
+            record["eval_tokens"] = job.stats.eval_tokens
+            record["eval_tokens_per_s"] = round(job.stats.eval_rate, 1)
+        record.update(extra)
+        return record
+
+    async def run(self, jobs: list[BatchJob]) -> BatchStats:
+        self.persistence.start()
+        await asyncio.to_thread(self.repo.connect)
+        rows = await asyncio.to_thread(self.repo.get_latest_artifacts, str(self.output_root))
+        self.artifacts.remember(ArtifactRecord.from_row(row) for row in rows)
+        await self._prepare_models({job.model for job in jobs})
+        stats = BatchStats(BatchProgress(total=len(jobs)))
+
+        def on_result(job: BatchJob, text: str, cached: bool) -> None:
+            record = self._record(job, "cached" if cached else "ok")
+            stats.latencies.append(record["seconds"])
+            if job.stats is not None:
+                stats.prompt_tokens += job.stats.prompt_tokens
+                stats.eval_tokens += job.stats.eval_tokens
+            self.emit(record)
+
+        def on_error(job: BatchJob, err: Exception) -> None:
+            reason = "timed out" if isinstance(err, asyncio.TimeoutError) else f"{type(err).__name__}: {err}"
+            self.emit(self._record(job, "error", error=reason))
+
+        self.batch = BatchSummarizer(
+            self.run_job, concurrency=self.concurrency, on_result=on_result, on_error=on_error
+        )
+        try:
+            stats.progress = await self.batch.run(jobs)
+        finally:
+            # Saves of cancelled jobs may still be running; their manifest rows go out with the last flush
+            await asyncio.to_thread(self.writer.close)
+            await self.persistence.close()
+        return stats
+
+    def cancel(self) -> None:
+        if self.batch is not None:
+            self.batch.cancel()
+
+
+async def run_batch(args: argparse.Namespace, out: TextIO) -> int:
+    root = Path(args.root).expanduser().resolve()
+    try:
+        text = await asyncio.to_thread(Path(args.manifest).read_text, encoding="utf-8")
+        jobs = await asyncio.to_thread(load_manifest, text, root, args.model)
+    except (OSError, ManifestError) as e:
+        print(f"cai batch: {e}", file=sys.stderr)
+        return 2
+    if not jobs:
+        print("cai batch: the manifest has no jobs", file=sys.stderr)
+        return 2
+
+    def emit(record: dict[str, Any]) -> None:
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    provider = ProviderPool(args.host, max_connections=max(16, args.concurrency or 0))
+    repo = ChatRepository(args.db)
+    runner = HeadlessRunner(
+        provider, repo, Path(args.output_root).expanduser().resolve(), root, emit,
+        concurrency=args.concurrency or default_concurrency() * len(provider.backends),
+        timeout=args.timeout, write_cached=args.write_cached,
+    )
+    print(
+        f"cai batch: {len(jobs)} jobs, {runner.concurrency} in flight, session {runner.session_id}",
+        file=sys.stderr,
+    )
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, runner.cancel)
+        loop.add_signal_handler(signal.SIGTERM, runner.cancel)
+    except (NotImplementedError, RuntimeError):
+        # Windows: Ctrl+C raises KeyboardInterrupt instead
+        pass
+    try:
+        stats = await runner.run(jobs)
+    finally:
+        await provider.aclose()
+        await asyncio.to_thread(repo.close)
+    emit(stats.as_dict())
+    outcome = "cancelled" if stats.progress.cancelled else "finished"
+    print(f"cai batch {outcome}: {stats.progress.describe('jobs')}", file=sys.stderr)
+    if stats.progress.cancelled:
+        return 130
+    return 1 if stats.progress.failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cai batch", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("manifest", help="JSON Lines (or JSON array) of jobs")
+    parser.add_argument("--model", help="model for jobs that do not name one")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="requests in flight (default: OLLAMA_NUM_PARALLEL, else 2, per host)")
+    parser.add_argument("--root", default=".", help="directory manifest paths are relative to (default: .)")
+    parser.add_argument("--output-root", default=str(artifacts.default_output_root()),
+                        help="where artifacts are written (default: ./out)")
+    parser.add_argument("--results", help="append JSONL results here instead of stdout")
+    parser.add_argument("--db", default=DB_FILE, help=f"DuckDB file (default: {DB_FILE})")
+    parser.add_argument("--host", default=DEFAULT_OLLAMA_HOSTS,
+                        help="Ollama URL, or several separated by commas (default: OLLAMA_HOSTS, else OLLAMA_HOST)")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds per request (default: 180)")
+    parser.add_argument("--write-cached", action="store_true",
+                        help="also write artifacts for summaries answered from the cache")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as out:
+            return asyncio.run(run_batch(args, out))
+    return asyncio.run(run_batch(args, sys.stdout))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
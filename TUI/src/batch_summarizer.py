@@ -0,0 +1,136 @@
+"""Bounded-concurrency scheduler for summarizing many files (or running any batch of jobs)."""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Generic, Iterable, Optional, TypeVar
+
+from file_index import SKIP_DIRS
+
+
+def default_concurrency() -> int:
+    """Match Ollama's OLLAMA_NUM_PARALLEL when set, else a conservative 2."""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "")))
+    except ValueError:
+        return 2
+
+
+def discover_files(root: Path, pattern: str) -> list[Path]:
+    """Return files under ``root`` matching a glob ``pattern``, sorted.
+
+    Hidden files and well-known cache/VCS directories are skipped. Blocking;
+    call through ``asyncio.to_thread``.
+    """
+    root = root.resolve()
+    files = []
+    for path in root.glob(pattern):
+        rel_parts = path.relative_to(root).parts
+        if any(part in SKIP_DIRS or part.startswith(".") for part in rel_parts):
+            continue
+        if path.is_file():
+            files.append(path)
+    files.sort()
+    return files
+
+
+@dataclass
+class BatchProgress:
+    """Counters for a running or finished batch."""
+    total: int
+    done: int = 0
+    cached: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def describe(self, unit: str = "files") -> str:
+        rate = self.done / self.elapsed if self.elapsed > 0 else 0.0
+        return (
+            f"{self.done}/{self.total} {unit} ({self.cached} cached, {self.failed} failed) "
+            f"in {self.elapsed:.1f}s, {rate:.2f} {unit}/s"
+        )
+
+
+# A file path, or any other unit of work (e.g. a headless batch job)
+Item = TypeVar("Item")
+
+# summarize(item) -> (summary, from_cache)
+SummarizeFn = Callable[[Item], Awaitable[tuple[str, bool]]]
+
+
+class BatchSummarizer(Generic[Item]):
+    """Runs ``summarize`` over many files with at most ``concurrency`` in flight.
+
+    Files already in the summary cache come back immediately, so re-running
+    an interrupted batch resumes where it stopped. ``cancel()`` cancels the
+    in-flight requests (closing their HTTP streams) and drops the rest.
+    """
+
+    def __init__(
+        self,
+        summarize: SummarizeFn,
+        concurrency: Optional[int] = None,
+        on_result: Optional[Callable[[Item, str, bool], None]] = None,
+        on_error: Optional[Callable[[Item, Exception], None]] = None,
+        on_progress: Optional[Callable[[BatchProgress], None]] = None,
+    ):
+        self.summarize = summarize
+        self.concurrency = concurrency or default_concurrency()
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.progress: Optional[BatchProgress] = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not w.done() for w in self._workers)
+
+    async def run(self, paths: Iterable[Item]) -> BatchProgress:
+        queue: asyncio.Queue[Item] = asyncio.Queue()
+        for path in paths:
+            queue.put_nowait(path)
+        self.progress = BatchProgress(total=queue.qsize())
+        self._workers = [
+            asyncio.create_task(self._worker(queue)) for _ in range(min(self.concurrency, queue.qsize()))
+        ]
+        results = await asyncio.gather(*self._workers, return_exceptions=True)
+        if any(isinstance(r, asyncio.CancelledError) for r in results):
+            self.progress.cancelled = True
+        self._workers = []
+        return self.progress
+
+    def cancel(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+
+    async def _worker(self, queue: asyncio.Queue[Item]) -> None:
+        progress = self.progress
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                summary, cached = await self.summarize(path)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                progress.failed += 1
+                if self.on_error:
+                    self.on_error(path, e)
+            else:
+                progress.cached += int(cached)
+                if self.on_result:
+                    self.on_result(path, summary, cached)
+            progress.done += 1
+            if self.on_progress:
+                self.on_progress(progress)
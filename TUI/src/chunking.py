@@ -0,0 +1,127 @@
+"""Split large files into token-budgeted chunks on line or syntax boundaries."""
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# A segment whose checksum is divisible by this always starts a new chunk (once
+# the current chunk is reasonably full), so an edit only shifts chunk boundaries
+# up to the next anchor instead of through the rest of the file.
+_ANCHOR_MODULUS = 4
+
+_MARKDOWN_SUFFIXES = {".md", ".markdown", ".rst", ".txt"}
+
+
+@dataclass
+class Chunk:
+    index: int
+    start_line: int  # 1-based, inclusive
+    end_line: int    # 1-based, inclusive
+    text: str
+
+    @property
+    def label(self) -> str:
+        return f"lines {self.start_line}-{self.end_line}"
+
+
+def _starts_segment(line: str, prev: Optional[str], markdown: bool, level: int) -> bool:
+    if prev is None:
+        return True
+    if markdown and level == 0:
+        return line.startswith("#") or (not prev.strip() and bool(line.strip()))
+    if level == 0:
+        # Top-level code: an unindented line right after a blank line
+        return bool(line.strip()) and not line[0].isspace() and not prev.strip()
+    # Nested blocks (methods, paragraphs): any non-blank line right after a blank line
+    return bool(line.strip()) and not prev.strip()
+
+
+def _segments(start: int, lines: list[str], markdown: bool, level: int) -> list[tuple[int, list[str]]]:
+    """Group lines into ``(start_index, lines)`` blocks at syntax boundaries."""
+    segments: list[tuple[int, list[str]]] = []
+    prev = None
+    for i, line in enumerate(lines):
+        if not segments or _starts_segment(line, prev, markdown, level):
+            segments.append((start + i, [line]))
+        else:
+            segments[-1][1].append(line)
+        prev = line
+    return segments
+
+
+def _blocks(start: int, lines: list[str], max_tokens: int, markdown: bool, level: int = 0) -> list[tuple[int, list[str]]]:
+    """Segment at the coarsest boundary level that keeps blocks within budget."""
+    if level > 1:
+        return _split_oversized(start, lines, max_tokens)
+    blocks: list[tuple[int, list[str]]] = []
+    for seg_start, seg_lines in _segments(start, lines, markdown, level):
+        if estimate_tokens("".join(seg_lines)) > max_tokens:
+            blocks.extend(_blocks(seg_start, seg_lines, max_tokens, markdown, level + 1))
+        else:
+            blocks.append((seg_start, seg_lines))
+    return blocks
+
+
+def _split_oversized(start: int, lines: list[str], max_tokens: int) -> list[tuple[int, list[str]]]:
+    """Break a block larger than the budget on line boundaries (and long lines by characters)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces: list[tuple[int, list[str]]] = []
+    current: list[str] = []
+    current_start = start
+    size = 0
+    for offset, line in enumerate(lines):
+        parts = [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or [line]
+        for part in parts:
+            if current and size + len(part) > max_chars:
+                pieces.append((current_start, current))
+                current, size, current_start = [], 0, start + offset
+            current.append(part)
+            size += len(part)
+    if current:
+        pieces.append((current_start, current))
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int, path: Optional[Path] = None) -> list[Chunk]:
+    """Split ``text`` into chunks of at most ``max_tokens`` (estimated).
+
+    Boundaries fall between top-level blocks (or Markdown sections) where
+    possible, then between blank-line separated blocks, then between lines;
+    only single lines longer than the budget are cut mid-line.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+    markdown = path is not None and path.suffix.lower() in _MARKDOWN_SUFFIXES
+
+    blocks = _blocks(0, lines, max_tokens, markdown)
+
+    chunks: list[Chunk] = []
+    current: list[str] = []
+    current_start = 0
+    current_tokens = 0
+
+    def emit() -> None:
+        body = "".join(current)
+        end = current_start + body.count("\n") + (0 if body.endswith("\n") else 1)
+        chunks.append(Chunk(len(chunks), current_start + 1, end, body))
+
+    for start, block_lines in blocks:
+        block = "".join(block_lines)
+        tokens = estimate_tokens(block)
+        anchor = zlib.crc32(block.encode("utf-8")) % _ANCHOR_MODULUS == 0
+        full = current_tokens + tokens > max_tokens
+        if current and (full or (anchor and current_tokens >= max_tokens // 4)):
+            emit()
+            current, current_tokens = [], 0
+        if not current:
+            current_start = start
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        emit()
+    return chunks
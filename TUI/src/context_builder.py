@@ -0,0 +1,266 @@
+"""Token-budgeted, cached assembly of file context for prompts."""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Ollama's default context window when a model does not say otherwise
+DEFAULT_NUM_CTX = 4096
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Files the user shared for context follow, "
+    "each introduced by a '-- FILE: <path> --' line."
+)
+
+# Starts every file section of a context block
+FILE_MARKER = "-- FILE: "
+
+_TRUNCATION_MARKER = "\n[... truncated to fit the context window ...]"
+
+# Pluggable token counter: text -> token count
+Tokenizer = Callable[[str], int]
+
+
+@dataclass
+class _CachedFile:
+    size: int
+    mtime_ns: int
+    text: str
+    tokens: int
+
+
+@dataclass
+class ContextEntry:
+    """How one context file ended up in the prompt."""
+    path: Path
+    mode: str  # "full", "summary", "trimmed", "dropped", "error" or "retrieved"
+    tokens: int
+
+
+@dataclass
+class BuiltContext:
+    prompt: str
+    total_tokens: int
+    budget: int
+    entries: list[ContextEntry] = field(default_factory=list)
+    # Chat-mode messages (system + history + user); None for flat prompts
+    messages: Optional[list[dict[str, str]]] = None
+    history_dropped: int = 0
+
+    @property
+    def reduced(self) -> list[ContextEntry]:
+        return [e for e in self.entries if e.mode not in ("full", "error", "retrieved")]
+
+
+class ContextBuilder:
+    """Assembles context files into a prompt that fits the model's window.
+
+    File contents are cached by ``(size, mtime_ns)`` so unchanged files are
+    only stat'ed, never re-read, across turns. When the files do not fit,
+    the lowest-priority ones (earliest added) are replaced by their cached
+    summary, then trimmed, then dropped, until the prompt fits.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Tokenizer = estimate_tokens,
+        default_num_ctx: int = DEFAULT_NUM_CTX,
+        response_reserve: int = 1024,
+    ):
+        self.tokenizer = tokenizer
+        self.default_num_ctx = default_num_ctx
+        self.response_reserve = response_reserve
+        self._context_lengths: dict[str, int] = {}
+        self._files: dict[Path, _CachedFile] = {}
+        self._lock = threading.Lock()
+
+    # --- Budget ---
+    def set_context_length(self, model: str, num_ctx: int) -> None:
+        self._context_lengths[model] = num_ctx
+
+    def num_ctx_for(self, model: Optional[str]) -> int:
+        return self._context_lengths.get(model or "", self.default_num_ctx)
+
+    def budget_for(self, model: Optional[str]) -> int:
+        """Prompt tokens available once room for the response is reserved."""
+        num_ctx = self.num_ctx_for(model)
+        return max(num_ctx - min(self.response_reserve, num_ctx // 2), 0)
+
+    # --- File cache ---
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Forget cached content for ``path`` (or everything)."""
+        with self._lock:
+            if path is None:
+                self._files.clear()
+            else:
+                self._files.pop(path, None)
+
+    def _load(self, path: Path) -> _CachedFile:
+        st = os.stat(path)
+        with self._lock:
+            cached = self._files.get(path)
+        if cached is not None and cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+            return cached
+        text = path.read_text(encoding="utf-8")
+        cached = _CachedFile(st.st_size, st.st_mtime_ns, text, self.tokenizer(text))
+        with self._lock:
+            self._files[path] = cached
+        return cached
+
+    def measure(self, files: list[Path]) -> int:
+        """Total tokens of the files' full contents (blocking)."""
+        total = 0
+        for path in files:
+            try:
+                total += self._load(path).tokens
+            except Exception:
+                continue
+        return total
+
+    # --- Assembly ---
+    @staticmethod
+    def _section(path: Path, text: str, note: str = "") -> str:
+        suffix = f" ({note})" if note else ""
+        return f"{FILE_MARKER}{path}{suffix} --\n{text}\n"
+
+    def _fit_files(
+        self,
+        files: list[Path],
+        budget: int,
+        summary_lookup: Optional[Callable[[Path], Optional[str]]],
+    ) -> tuple[str, int, list[ContextEntry]]:
+        """Fit ``files`` (lowest priority first) into ``budget`` tokens.
+
+        Returns the context block, its token count and per-file entries.
+        Sections are emitted sorted by path so the block stays byte-identical
+        across turns while the files are unchanged.
+        """
+        sections: dict[Path, str] = {}
+        entries: dict[Path, ContextEntry] = {}
+        for path in files:
+            try:
+                cached = self._load(path)
+            except Exception as e:
+                sections[path] = f"{FILE_MARKER}{path} (Error reading: {e}) --\n"
+                entries[path] = ContextEntry(path, "error", self.tokenizer(sections[path]))
+                continue
+            sections[path] = self._section(path, cached.text)
+            entries[path] = ContextEntry(path, "full", cached.tokens)
+
+        def total() -> int:
+            return sum(e.tokens for e in entries.values())
+
+        # Shrink lowest-priority files first: summary, then trim, then drop
+        for path in files:
+            if total() <= budget:
+                break
+            entry = entries[path]
+            if entry.mode != "full":
+                continue
+            over = total() - budget
+            summary = summary_lookup(path) if summary_lookup else None
+            if summary:
+                summary_tokens = self.tokenizer(summary)
+                if summary_tokens < entry.tokens:
+                    sections[path] = self._section(path, summary, "summary")
+                    entries[path] = ContextEntry(path, "summary", summary_tokens)
+                    continue
+            overhead = self.tokenizer(self._section(path, _TRUNCATION_MARKER, "truncated"))
+            keep = entry.tokens - over - overhead
+            if keep > 64:
+                text = self._load(path).text[: keep * CHARS_PER_TOKEN]
+                sections[path] = self._section(path, text + _TRUNCATION_MARKER, "truncated")
+                entries[path] = ContextEntry(path, "trimmed", self.tokenizer(sections[path]))
+            else:
+                sections[path] = ""
+                entries[path] = ContextEntry(path, "dropped", 0)
+
+        ordered = sorted(files, key=str)
+        block = "\n".join(s for s in (sections[p] for p in ordered) if s)
+        return block, total(), [entries[p] for p in files]
+
+    def build(
+        self,
+        message: str,
+        files: list[Path],
+        model: Optional[str],
+        summary_lookup: Optional[Callable[[Path], Optional[str]]] = None,
+    ) -> BuiltContext:
+        """Build a flat /api/generate prompt for ``message`` with ``files`` (lowest priority first). Blocking."""
+        budget = self.budget_for(model)
+        if not files:
+            return BuiltContext(message, self.tokenizer(message), budget)
+        fixed = self.tokenizer(f"\n-- USER PROMPT --\n{message}")
+        block, tokens, entries = self._fit_files(files, budget - fixed, summary_lookup)
+        prompt = f"{block}\n-- USER PROMPT --\n{message}"
+        return BuiltContext(prompt, fixed + tokens, budget, entries)
+
+    def build_messages(
+        self,
+        message: str,
+        files: list[Path],
+        model: Optional[str],
+        history: list[dict[str, str]],
+        summary_lookup: Optional[Callable[[Path], Optional[str]]] = None,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        excerpts: Sequence[tuple[Path, str, str]] = (),
+    ) -> BuiltContext:
+        """Build /api/chat messages with a stable prefix. Blocking.
+
+        Layout: one system message (system prompt plus context files in
+        path order), then prior turns, then ``message``. Keeping the prefix
+        identical between turns lets Ollama reuse its prompt cache. Context
+        files take precedence over history; the oldest turns are dropped
+        first when the budget runs out.
+
+        ``excerpts`` are retrieved ``(path, label, text)`` passages, best
+        first. They change every turn, so they go into the user message
+        rather than the cached prefix; they rank after context files and
+        before history, and passages of files already included in full
+        are skipped.
+        """
+        budget = self.budget_for(model)
+        fixed = self.tokenizer(system_prompt) + self.tokenizer(message)
+        block, file_tokens, entries = ("", 0, [])
+        if files:
+            block, file_tokens, entries = self._fit_files(files, budget - fixed, summary_lookup)
+        system = f"{system_prompt}\n\n{block}" if block else system_prompt
+
+        remaining = budget - fixed - file_tokens
+        whole = {e.path for e in entries if e.mode == "full"}
+        passages: list[str] = []
+        for path, label, text in excerpts:
+            if path in whole:
+                continue
+            section = self._section(path, text, label)
+            tokens = self.tokenizer(section)
+            if tokens > remaining:
+                continue
+            passages.append(section)
+            entries.append(ContextEntry(path, "retrieved", tokens))
+            remaining -= tokens
+        if passages:
+            message = "Relevant excerpts from the project:\n\n" + "\n".join(passages) + f"\n{message}"
+        kept: list[dict[str, str]] = []
+        for turn in reversed(history):
+            tokens = self.tokenizer(turn["content"])
+            if tokens > remaining:
+                break
+            kept.append(turn)
+            remaining -= tokens
+        kept.reverse()
+
+        messages = [{"role": "system", "content": system}, *kept, {"role": "user", "content": message}]
+        return BuiltContext(
+            prompt=message,
+            total_tokens=budget - remaining,
+            budget=budget,
+            entries=entries,
+            messages=messages,
+            history_dropped=len(history) - len(kept),
+        )
@@ -1,83 +1,1105 @@
-import duckdb
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
 import os
+import threading
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Hashable, Optional
+
+from search_index import SOURCES, term_counts
+
+if TYPE_CHECKING:
+    import duckdb
 
 # Define the path for the database file
 DB_FILE = "chat_history.db"
 
+
+_ID_SEQUENCES = {
+    "chat_history": "chat_history_id_seq",
+    "file_summaries": "file_summaries_id_seq",
+    "request_metrics": "request_metrics_id_seq",
+    "request_envelopes": "request_envelopes_id_seq",
+    "artifacts": "artifacts_id_seq",
+}
+
+# Batched write statement per table (used by write_batch / WriteBehindQueue)
+_WRITE_SQL = {
+    # Chat ids are reserved up front (reserve_ids) so callers know them before the flush
+    "chat_history": (
+        "INSERT INTO chat_history (id, session_id, model, timestamp, role, content) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    ),
+    "file_summaries": (
+        "INSERT INTO file_summaries (id, file_path, model, timestamp, summary) "
+        "VALUES (nextval('file_summaries_id_seq'), ?, ?, ?, ?) "
+        "ON CONFLICT(file_path, model) DO UPDATE SET timestamp=excluded.timestamp, summary=excluded.summary"
+    ),
+    "summary_cache": (
+        "INSERT INTO summary_cache (content_hash, model, prompt_hash, timestamp, summary) "
+        "VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(content_hash, model, prompt_hash) DO UPDATE SET timestamp=excluded.timestamp, summary=excluded.summary"
+    ),
+    "file_fingerprints": (
+        "INSERT INTO file_fingerprints (file_path, size, mtime_ns, content_hash) "
+        "VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(file_path) DO UPDATE SET size=excluded.size, mtime_ns=excluded.mtime_ns, content_hash=excluded.content_hash"
+    ),
+    "models": (
+        "INSERT INTO models (host, name, digest, size, context_length, parameter_size, "
+        "quantization, family, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(host, name) DO UPDATE SET digest=excluded.digest, size=excluded.size, "
+        "context_length=excluded.context_length, parameter_size=excluded.parameter_size, "
+        "quantization=excluded.quantization, family=excluded.family, updated_at=excluded.updated_at"
+    ),
+    "request_metrics": (
+        "INSERT INTO request_metrics (id, timestamp, session_id, model, kind, status, context_ms, "
+        "connect_ms, ttft_ms, total_ms, db_ms, calls, prompt_tokens, prompt_eval_ms, eval_tokens, "
+        "eval_ms, load_ms, tokens_per_s) "
+        "VALUES (nextval('request_metrics_id_seq'), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    # Content-addressed: a hash is written once, whoever references it
+    "blobs": (
+        "INSERT INTO blobs (hash, size, content) VALUES (?, ?, ?) ON CONFLICT(hash) DO NOTHING"
+    ),
+    "request_envelopes": (
+        "INSERT INTO request_envelopes (id, timestamp, session_id, message_id, endpoint, model, "
+        "model_digest, options, seed, messages, context_files, output_hash, replay_of) "
+        "VALUES (nextval('request_envelopes_id_seq'), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "artifacts": (
+        "INSERT INTO artifacts (id, created_at, root, name, title, kind, hash, size, compression, message_id) "
+        "VALUES (nextval('artifacts_id_seq'), ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    # Vectors of search_docs documents (see search_index.EmbeddingIndexer)
+    "search_embeddings": (
+        "INSERT INTO search_embeddings (source, doc_id, model, embedding) VALUES (?, ?, ?, ?::VARCHAR::FLOAT[]) "
+        "ON CONFLICT(source, doc_id, model) DO UPDATE SET embedding=excluded.embedding"
+    ),
+}
+
+# BM25 parameters (the defaults of DuckDB's FTS extension)
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+# search_postings_tail is merged into the sorted search_postings once it holds more
+# than this many rows and more than 1/_POSTINGS_TAIL_RATIO as many as the sorted table
+_POSTINGS_TAIL_ROWS = 200_000
+_POSTINGS_TAIL_RATIO = 64
+
+
+class ChatRepository:
+    """Long-lived owner of the app's DuckDB connection.
+
+    The repository opens the database once and hands out one cursor per
+    thread (DuckDB cursors are cheap duplicate connections sharing the same
+    database instance), so calls made through ``asyncio.to_thread`` never
+    re-open the file or re-read the catalog. The schema is created when the
+    connection is first opened, so whichever caller gets there first
+    (normally the app's start-up worker) sets it up and the rest wait.
+    """
+
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        self._con: Optional[duckdb.DuckDBPyConnection] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cursors: list[duckdb.DuckDBPyConnection] = []
+        # dims -> whether rag_chunks_<dims> has a vector index
+        self._rag_tables: dict[int, bool] = {}
+
+    def connect(self) -> duckdb.DuckDBPyConnection:
+        """Open the underlying connection if it is not open yet."""
+        with self._lock:
+            if self._con is None:
+                # Imported on first use to keep it off the start-up path
+                import duckdb
+
+                con = duckdb.connect(self.db_file)
+                self._create_schema(con)
+                self._con = con
+            return self._con
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """Return the cursor owned by the calling thread."""
+        cur = getattr(self._local, "cursor", None)
+        if cur is not None and getattr(self._local, "owner", None) is self._con:
+            return cur
+        con = self.connect()
+        with self._lock:
+            cur = con.cursor()
+            self._cursors.append(cur)
+        self._local.cursor = cur
+        self._local.owner = con
+        return cur
+
+    def close(self) -> None:
+        """Close all cursors and the underlying connection."""
+        with self._lock:
+            for cur in self._cursors:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+            self._cursors.clear()
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+        self._local = threading.local()
+
+    @property
+    def is_open(self) -> bool:
+        return self._con is not None
+
+    def initialize(self) -> None:
+        """Open the database, creating tables if they don't exist."""
+        self.connect()
+
+    @staticmethod
+    def _create_schema(cur: duckdb.DuckDBPyConnection) -> None:
+        # Create chat_history table
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY,
+            session_id VARCHAR,
+            model VARCHAR,
+            timestamp TIMESTAMP,
+            role VARCHAR,
+            content VARCHAR
+        );
+        """)
+        # Create file_summaries table
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS file_summaries (
+            id INTEGER PRIMARY KEY,
+            file_path VARCHAR,
+            model VARCHAR,
+            timestamp TIMESTAMP,
+            summary VARCHAR,
+            UNIQUE(file_path, model)
+        );
+        """)
+        # Summaries keyed by what was summarized, independent of the file's path
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            content_hash VARCHAR,
+            model VARCHAR,
+            prompt_hash VARCHAR,
+            timestamp TIMESTAMP,
+            summary VARCHAR,
+            PRIMARY KEY (content_hash, model, prompt_hash)
+        );
+        """)
+        # Last known (size, mtime) per path so unchanged files are not re-hashed
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS file_fingerprints (
+            file_path VARCHAR PRIMARY KEY,
+            size BIGINT,
+            mtime_ns BIGINT,
+            content_hash VARCHAR
+        );
+        """)
+        # Model list and /api/show metadata from the last discovery, per server
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS models (
+            host VARCHAR,
+            name VARCHAR,
+            digest VARCHAR,
+            size BIGINT,
+            context_length INTEGER,
+            parameter_size VARCHAR,
+            quantization VARCHAR,
+            family VARCHAR,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (host, name)
+        );
+        """)
+        # Stage timings per model request (client-side spans plus Ollama's own counters)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS request_metrics (
+            id INTEGER PRIMARY KEY,
+            timestamp TIMESTAMP,
+            session_id VARCHAR,
+            model VARCHAR,
+            kind VARCHAR,
+            status VARCHAR,
+            context_ms DOUBLE,
+            connect_ms DOUBLE,
+            ttft_ms DOUBLE,
+            total_ms DOUBLE,
+            db_ms DOUBLE,
+            calls INTEGER,
+            prompt_tokens INTEGER,
+            prompt_eval_ms DOUBLE,
+            eval_tokens INTEGER,
+            eval_ms DOUBLE,
+            load_ms DOUBLE,
+            tokens_per_s DOUBLE
+        );
+        """)
+        # Text stored once by SHA-256 (prompt segments, outputs)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash VARCHAR PRIMARY KEY,
+            size BIGINT,
+            content VARCHAR
+        );
+        """)
+        # Exact request per generation; messages are JSON lists of blob hashes per message
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS request_envelopes (
+            id INTEGER PRIMARY KEY,
+            timestamp TIMESTAMP,
+            session_id VARCHAR,
+            message_id INTEGER,
+            endpoint VARCHAR,
+            model VARCHAR,
+            model_digest VARCHAR,
+            options VARCHAR,
+            seed BIGINT,
+            messages VARCHAR,
+            context_files VARCHAR,
+            output_hash VARCHAR,
+            replay_of INTEGER
+        );
+        """)
+        # Human-friendly artifact names under an output root -> content hash (see artifacts.ArtifactStore)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS artifacts (
+            id INTEGER PRIMARY KEY,
+            created_at TIMESTAMP,
+            root VARCHAR,
+            name VARCHAR,
+            title VARCHAR,
+            kind VARCHAR,
+            hash VARCHAR,
+            size BIGINT,
+            compression VARCHAR,
+            message_id INTEGER
+        );
+        """)
+        # Manifests written before artifacts were linked to chat messages
+        cur.execute("ALTER TABLE artifacts ADD COLUMN IF NOT EXISTS message_id INTEGER")
+        # Inverted index over chat_history and file_summaries (see search_index)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS search_docs (
+            source VARCHAR,
+            doc_id INTEGER,
+            length INTEGER,
+            PRIMARY KEY (source, doc_id)
+        );
+        """)
+        # Terms are stored as hash(term). search_postings is sorted by term_hash, so a
+        # query reads only the row groups whose min/max covers its terms; new postings
+        # go to search_postings_tail until _sort_postings merges them in
+        tables = {name for (name,) in cur.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+        if "search_postings" in tables and "search_postings_tail" not in tables:
+            # Postings from before the split are unsorted: the first write sorts them
+            cur.execute("ALTER TABLE search_postings RENAME TO search_postings_tail")
+        for table in ("search_postings", "search_postings_tail"):
+            cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                term_hash UBIGINT,
+                source VARCHAR,
+                doc_id INTEGER,
+                tf INTEGER,
+                doc_length INTEGER
+            );
+            """)
+        cur.execute(
+            "CREATE OR REPLACE VIEW search_postings_all AS "
+            "SELECT * FROM search_postings UNION ALL SELECT * FROM search_postings_tail"
+        )
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS search_embeddings (
+            source VARCHAR,
+            doc_id INTEGER,
+            model VARCHAR,
+            embedding FLOAT[],
+            PRIMARY KEY (source, doc_id, model)
+        );
+        """)
+        # Files chunked and embedded for retrieval (see rag_index); chunks live in rag_chunks_<dims>
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS rag_files (
+            root VARCHAR,
+            path VARCHAR,
+            model VARCHAR,
+            size BIGINT,
+            mtime_ns BIGINT,
+            dims INTEGER,
+            chunks INTEGER,
+            indexed_at TIMESTAMP,
+            PRIMARY KEY (root, path, model)
+        );
+        """)
+        # Ids come from sequences; existing databases start after their current MAX(id)
+        for table, sequence in _ID_SEQUENCES.items():
+            exists = cur.execute(
+                "SELECT 1 FROM duckdb_sequences() WHERE sequence_name = ?", (sequence,)
+            ).fetchone()
+            if not exists:
+                start = cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+                cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence} START {start}")
+        # Keyset access path for paging a session's history
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS chat_history_session_idx ON chat_history (session_id, id)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS request_envelopes_session_idx ON request_envelopes (session_id, id)"
+        )
+        # Recent artifacts of an output root (the Output panel's list)
+        cur.execute("CREATE INDEX IF NOT EXISTS artifacts_root_idx ON artifacts (root, id)")
+
+    def reserve_ids(self, table: str, count: int) -> list[int]:
+        """Draw ``count`` ids from ``table``'s sequence for rows written later."""
+        rows = self.cursor().execute(
+            f"SELECT nextval('{_ID_SEQUENCES[table]}') FROM range(?)", (count,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_chat_message(self, session_id: str, model: str, role: str, content: str) -> int:
+        """Add a new chat message to the database and return its id."""
+        message_id = self.reserve_ids("chat_history", 1)[0]
+        self.write_batch(
+            {"chat_history": [(message_id, session_id, model, datetime.now(), role, content)]}
+        )
+        return message_id
+
+    def write_batch(self, rows_by_table: dict[str, list[tuple]]) -> None:
+        """Write buffered rows for several tables in a single transaction.
+
+        Each table's rows must match the parameters of its statement in
+        ``_WRITE_SQL``.
+        """
+        rows_by_table = {table: rows for table, rows in rows_by_table.items() if rows}
+        if not rows_by_table:
+            return
+        cur = self.cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            for table, rows in rows_by_table.items():
+                cur.executemany(_WRITE_SQL[table], rows)
+            self._index_written(cur, rows_by_table)
+            self._sort_postings(cur)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def _index_written(self, cur: duckdb.DuckDBPyConnection, rows_by_table: dict[str, list[tuple]]) -> None:
+        """Add just-written messages and summaries to the search index (same transaction)."""
+        docs = [("chat", row[0], row[5]) for row in rows_by_table.get("chat_history", ())]
+        summaries = rows_by_table.get("file_summaries")
+        if summaries:
+            # An upsert keeps the summary's id: its old postings and vectors are replaced
+            written = cur.execute(
+                "SELECT f.id, f.summary FROM file_summaries f JOIN (SELECT UNNEST(?::VARCHAR[]) AS file_path, "
+                "UNNEST(?::VARCHAR[]) AS model) k USING (file_path, model)",
+                ([row[0] for row in summaries], [row[1] for row in summaries])
+            ).fetchall()
+            ids = [id_ for id_, _ in written]
+            for table in ("search_postings", "search_postings_tail", "search_embeddings"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE source = 'summary' AND doc_id IN (SELECT UNNEST(?::INTEGER[]))",
+                    (ids,)
+                )
+            docs += [("summary", id_, summary) for id_, summary in written]
+        self._index_documents(cur, docs)
+
+    @staticmethod
+    def _index_documents(cur: duckdb.DuckDBPyConnection, docs: list[tuple[str, int, str]]) -> None:
+        """Insert postings and lengths for ``(source, doc_id, text)`` documents."""
+        if not docs:
+            return
+        postings: list[str] = []
+        lengths: dict[tuple[str, int], int] = {}
+        for source, doc_id, text in docs:
+            counts, length = term_counts(text or "")
+            lengths[(source, doc_id)] = length
+            postings.extend(f"{term}\t{source}\t{doc_id}\t{tf}\t{length}" for term, tf in counts.items())
+        # Rows travel as one tab-separated string (terms are \w+ only): binding Python lists
+        # element by element costs seconds per batch, splitting in DuckDB milliseconds
+        cur.execute(
+            "INSERT OR REPLACE INTO search_docs SELECT f[1], f[2]::INTEGER, f[3]::INTEGER "
+            "FROM (SELECT string_split(UNNEST(string_split(?, chr(10))), chr(9)) AS f)",
+            ("\n".join(f"{source}\t{doc_id}\t{length}" for (source, doc_id), length in lengths.items()),)
+        )
+        if postings:
+            cur.execute(
+                "INSERT INTO search_postings_tail SELECT hash(f[1]), f[2], f[3]::INTEGER, f[4]::INTEGER, f[5]::INTEGER "
+                "FROM (SELECT string_split(UNNEST(string_split(?, chr(10))), chr(9)) AS f)",
+                ("\n".join(postings),)
+            )
+
+    @staticmethod
+    def _sort_postings(cur: duckdb.DuckDBPyConnection) -> None:
+        """Rewrite all postings into ``search_postings``, sorted by term, once the tail is big (same transaction).
+
+        The tail is scanned in full by every query, so it is kept to a
+        fraction of the sorted table; rewriting 30M postings takes ~25 s.
+        """
+        (tail,) = cur.execute("SELECT count(*) FROM search_postings_tail").fetchone()
+        if tail <= _POSTINGS_TAIL_ROWS:
+            return
+        (body,) = cur.execute("SELECT count(*) FROM search_postings").fetchone()
+        if tail * _POSTINGS_TAIL_RATIO <= body:
+            return
+        cur.execute("CREATE OR REPLACE TABLE search_postings AS SELECT * FROM search_postings_all ORDER BY term_hash")
+        cur.execute("DELETE FROM search_postings_tail")
+
+    def index_backlog(self, limit: int = 5000) -> int:
+        """Index up to ``limit`` rows written before the search index existed; returns how many."""
+        cur = self.cursor()
+        docs = cur.execute(
+            "(SELECT 'chat', id, content FROM chat_history c WHERE NOT EXISTS "
+            "(SELECT 1 FROM search_docs d WHERE d.source = 'chat' AND d.doc_id = c.id) LIMIT ?) "
+            "UNION ALL (SELECT 'summary', id, summary FROM file_summaries f WHERE NOT EXISTS "
+            "(SELECT 1 FROM search_docs d WHERE d.source = 'summary' AND d.doc_id = f.id) LIMIT ?)",
+            (limit, limit)
+        ).fetchall()
+        if not docs:
+            return 0
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            self._index_documents(cur, docs)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        return len(docs)
+
+    def get_chat_history(self, session_id: str):
+        """Retrieve chat history for a given session."""
+        return self.cursor().execute(
+            "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY id ASC",
+            (session_id,)
+        ).fetchall()
+
+    def get_chat_history_page(self, session_id: str, before_id: Optional[int] = None, limit: int = 50):
+        """Retrieve up to ``limit`` messages older than ``before_id`` (newest page if None).
+
+        Rows are ``(id, role, content)`` ordered oldest first. Pass the first
+        row's id as ``before_id`` to fetch the previous page.
+        """
+        if before_id is None:
+            rows = self.cursor().execute(
+                "SELECT id, role, content FROM chat_history WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        else:
+            rows = self.cursor().execute(
+                "SELECT id, role, content FROM chat_history WHERE session_id = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, before_id, limit)
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def get_sessions(self, limit: int = 200):
+        """Chat sessions, most recently active first.
+
+        Rows are ``(session_id, messages, started, last_active, model,
+        first user message)``; ``model`` is the one used last and the first
+        message is cut to 200 characters.
+        """
+        return self.cursor().execute(
+            "SELECT session_id, count(*), min(timestamp), max(timestamp), arg_max(model, id), "
+            "left(arg_min(content, id) FILTER (WHERE role = 'user'), 200) "
+            "FROM chat_history GROUP BY session_id ORDER BY max(timestamp) DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def get_chat_messages(self, message_ids: list[int]) -> dict[int, str]:
+        """Retrieve message bodies by id (ids that don't exist are left out)."""
+        if not message_ids:
+            return {}
+        rows = self.cursor().execute(
+            "SELECT id, content FROM chat_history WHERE id IN (SELECT UNNEST(?::INTEGER[]))",
+            (list(message_ids),)
+        ).fetchall()
+        return dict(rows)
+
+    def add_file_summary(self, file_path: str, model: str, summary: str):
+        """Add or update a file summary in the database."""
+        self.write_batch({"file_summaries": [(file_path, model, datetime.now(), summary)]})
+
+    def get_file_summary(self, file_path: str, model: str):
+        """Retrieve a file summary from the database."""
+        result = self.cursor().execute(
+            "SELECT summary FROM file_summaries WHERE file_path = ? AND model = ?",
+            (file_path, model)
+        ).fetchone()
+        return result[0] if result else None
+
+    def get_cached_summary(self, content_hash: str, model: str, prompt_hash: str):
+        """Retrieve a summary by content hash, model and prompt template hash."""
+        result = self.cursor().execute(
+            "SELECT summary FROM summary_cache WHERE content_hash = ? AND model = ? AND prompt_hash = ?",
+            (content_hash, model, prompt_hash)
+        ).fetchone()
+        return result[0] if result else None
+
+    def get_models(self, host: str):
+        """Retrieve cached models for a server as
+        ``(name, digest, size, context_length, parameter_size, quantization, family)`` rows."""
+        return self.cursor().execute(
+            "SELECT name, digest, size, context_length, parameter_size, quantization, family "
+            "FROM models WHERE host = ? ORDER BY name",
+            (host,)
+        ).fetchall()
+
+    def replace_models(self, host: str, rows: list[tuple]) -> None:
+        """Make ``rows`` (as returned by ``get_models``) the cached model list for ``host``."""
+        now = datetime.now()
+        cur = self.cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            cur.execute("DELETE FROM models WHERE host = ?", (host,))
+            if rows:
+                cur.executemany(_WRITE_SQL["models"], [(host, *row, now) for row in rows])
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def get_request_percentiles(self, model: Optional[str] = None, since: Optional[datetime] = None):
+        """p50/p95 of each request stage per (model, kind), slowest median first.
+
+        Rows are ``(model, kind, requests, errors, total, ttft, connect,
+        context, db, tokens_per_s)`` where each stage is a ``[p50, p95]``
+        list in milliseconds (None when no request recorded it). For
+        tokens/s the pair is ``[p50, p5]``: the slow tail is the low end.
+        Failed requests count as errors but stay out of the percentiles.
+        """
+        ok = "FILTER (WHERE status = 'ok')"
+        stages = ", ".join(
+            f"quantile_cont({column}, [0.5, 0.95]) {ok}"
+            for column in ("total_ms", "ttft_ms", "connect_ms", "context_ms", "db_ms")
+        )
+        return self.cursor().execute(
+            f"SELECT model, kind, count(*), count(*) FILTER (WHERE status <> 'ok'), {stages}, "
+            f"quantile_cont(tokens_per_s, [0.5, 0.05]) {ok} "
+            "FROM request_metrics WHERE (? IS NULL OR model = ?) AND (? IS NULL OR timestamp >= ?) "
+            "GROUP BY model, kind ORDER BY 5 DESC NULLS LAST, model, kind",
+            (model, model, since, since)
+        ).fetchall()
+
+    def get_envelopes(self, session_id: str):
+        """Request envelopes of a session in request order (see ``envelopes.load_envelopes``)."""
+        return self.cursor().execute(
+            "SELECT id, timestamp, session_id, message_id, endpoint, model, model_digest, options, "
+            "seed, messages, context_files, output_hash, replay_of FROM request_envelopes "
+            "WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+
+    def get_envelope_sessions(self, limit: int = 20, include_replays: bool = True):
+        """``(session_id, requests, models, first, last)`` for the most recently active sessions."""
+        return self.cursor().execute(
+            "SELECT session_id, count(*), string_agg(DISTINCT model, ', '), min(timestamp), max(timestamp) "
+            "FROM request_envelopes WHERE ? OR replay_of IS NULL "
+            "GROUP BY session_id ORDER BY max(timestamp) DESC LIMIT ?",
+            (include_replays, limit)
+        ).fetchall()
+
+    def get_blobs(self, hashes: list[str]) -> dict[str, str]:
+        """Blob contents by hash (unknown hashes are left out)."""
+        if not hashes:
+            return {}
+        rows = self.cursor().execute(
+            "SELECT hash, content FROM blobs WHERE hash IN (SELECT UNNEST(?::VARCHAR[]))",
+            (list(hashes),)
+        ).fetchall()
+        return dict(rows)
+
+    def get_latest_artifacts(self, root: str):
+        """The last save of each (title, kind) under ``root``, oldest first.
+
+        Rows are ``(created_at, root, name, title, kind, hash, size, compression, message_id)``.
+        """
+        return self.cursor().execute(
+            "SELECT created_at, root, name, title, kind, hash, size, compression, message_id FROM artifacts "
+            "WHERE root = ? QUALIFY row_number() OVER (PARTITION BY title, kind ORDER BY id DESC) = 1 "
+            "ORDER BY id",
+            (root,)
+        ).fetchall()
+
+    def get_recent_artifacts(self, root: str, limit: int = 50):
+        """The ``limit`` most recently saved names under ``root``, newest first.
+
+        Rows are as in ``get_latest_artifacts``; a name linked to several
+        messages appears once, with its latest link.
+        """
+        return self.cursor().execute(
+            "SELECT created_at, root, name, title, kind, hash, size, compression, message_id FROM artifacts "
+            "WHERE root = ? QUALIFY row_number() OVER (PARTITION BY name ORDER BY id DESC) = 1 "
+            "ORDER BY id DESC LIMIT ?",
+            (root, limit)
+        ).fetchall()
+
+    def search_text(self, terms: list[str], sources: list[str], limit: int = 50):
+        """BM25 over the postings of ``terms``: documents matching more terms first, then by score.
+
+        A document matching ``level`` of the query's terms holds one of its
+        ``len(terms) - level + 1`` rarest terms. Levels are tried from every
+        term down, scoring only the documents that hold those rarer terms,
+        until ``limit`` documents match; so a common term's postings are
+        filtered, not grouped. Past the last level, documents matching one
+        term rank by that single posting, a top-k without any grouping.
+
+        Rows are ``(source, doc_id, score, session_id or file_path, model, timestamp, content, role)``.
+        """
+        cur = self.cursor()
+        # Filtering on source costs more than the rest of a scan; only pay for it when a source is left out
+        every_source = set(SOURCES) <= set(sources)
+        where_source = "" if every_source else " AND list_contains(?::VARCHAR[], source)"
+        source_params = [] if every_source else [sources]
+        n, avgdl = cur.execute(
+            "SELECT count(*), avg(length) FROM search_docs" + where_source.replace(" AND", " WHERE", 1), source_params
+        ).fetchone()
+        placeholders = ", ".join("hash(?)" for _ in terms)
+        df = dict(cur.execute(
+            f"SELECT term_hash, count(*) FROM search_postings_all WHERE term_hash IN ({placeholders}){where_source} "
+            "GROUP BY term_hash",
+            [*terms, *source_params],
+        ).fetchall())
+        if not df:
+            return []
+        hashes = sorted(df, key=df.get)
+        # One posting's score, each term's idf passed in; hashes are cast so the sorted table is pruned
+        weight = (
+            "CASE term_hash " + " ".join("WHEN ?::UBIGINT THEN ?" for _ in hashes) + f" END * tf * {_BM25_K1 + 1} "
+            f"/ (tf + {_BM25_K1} * (1 - {_BM25_B} + {_BM25_B} * doc_length / ?))"
+        )
+        weight_params = [
+            *(x for h in hashes for x in (h, math.log(1 + (n - df[h] + 0.5) / (df[h] + 0.5)))), avgdl
+        ]
+
+        def postings(of: list[int]) -> tuple[str, list]:
+            return (
+                f"term_hash IN ({', '.join('?::UBIGINT' for _ in of)}){where_source}",
+                [*of, *source_params],
+            )
+
+        every, every_params = postings(hashes)
+        ranked = []
+        for level in range(len(hashes), 1, -1):
+            rarer, rarer_params = postings(hashes[:len(hashes) - level + 1])
+            ranked = cur.execute(
+                f"SELECT source, doc_id, count(*) AS matched, sum({weight}) AS score FROM search_postings_all "
+                f"WHERE {every} AND doc_id IN (SELECT doc_id FROM search_postings_all WHERE {rarer}) "
+                "GROUP BY source, doc_id HAVING count(*) >= ? ORDER BY matched DESC, score DESC LIMIT ?",
+                [*weight_params, *every_params, *rarer_params, level, limit],
+            ).fetchall()
+            if len(ranked) >= limit:
+                break
+        else:
+            # Every document matching two terms or more is in ``ranked``; their postings may lead the top-k
+            seen = {(source, doc_id) for source, doc_id, _, _ in ranked}
+            singles = cur.execute(
+                f"SELECT source, doc_id, 1, {weight} AS score FROM search_postings_all WHERE {every} "
+                "ORDER BY score DESC LIMIT ?",
+                [*weight_params, *every_params, limit + len(ranked) * len(hashes)],
+            ).fetchall()
+            ranked += [row for row in singles if (row[0], row[1]) not in seen][:limit - len(ranked)]
+        if not ranked:
+            return []
+        return self._with_content(cur, [(source, doc_id, score) for source, doc_id, _, score in ranked])
+
+    def search_similar(self, model: str, vector: str, sources: list[str], limit: int = 50):
+        """Documents by cosine similarity of their ``model`` embedding to ``vector`` (rows as ``search_text``).
+
+        ``vector`` is list text (see ``search_index.vector_literal``).
+        """
+        cur = self.cursor()
+        ranked = cur.execute(
+            "SELECT source, doc_id, list_cosine_similarity(embedding, ?::VARCHAR::FLOAT[]) AS score "
+            "FROM search_embeddings WHERE model = ? AND list_contains(?::VARCHAR[], source) "
+            "ORDER BY score DESC LIMIT ?",
+            (vector, model, sources, limit)
+        ).fetchall()
+        return self._with_content(cur, ranked)
+
+    @staticmethod
+    def _with_content(cur: duckdb.DuckDBPyConnection, ranked: list[tuple[str, int, float]]) -> list[tuple]:
+        """``(source, doc_id, score)`` hits, in order, extended to ``search_text`` rows.
+
+        The ids are inlined as literals: DuckDB checks a constant IN list
+        inside the table scan (~5 ms over 1M messages), where a join to the
+        hits hashes every message (~40 ms).
+        """
+        tables = {
+            "chat": "SELECT id, session_id, model, timestamp, content, role FROM chat_history",
+            "summary": "SELECT id, file_path, model, timestamp, summary, NULL FROM file_summaries",
+        }
+        found: dict[tuple[str, int], tuple] = {}
+        for source, select in tables.items():
+            ids = ", ".join(str(int(doc_id)) for hit_source, doc_id, _ in ranked if hit_source == source)
+            if ids:
+                for doc_id, *row in cur.execute(f"{select} WHERE id IN ({ids})").fetchall():
+                    found[source, doc_id] = tuple(row)
+        return [
+            (source, doc_id, score, *found.get((source, doc_id), (None,) * 5)) for source, doc_id, score in ranked
+        ]
+
+    def get_unembedded(self, model: str, limit: int = 32):
+        """``(source, doc_id, content)`` of indexed documents without a ``model`` vector, newest first."""
+        return self.cursor().execute(
+            "SELECT d.source, d.doc_id, coalesce(c.content, f.summary, '') FROM search_docs d "
+            "LEFT JOIN chat_history c ON d.source = 'chat' AND c.id = d.doc_id "
+            "LEFT JOIN file_summaries f ON d.source = 'summary' AND f.id = d.doc_id "
+            "WHERE NOT EXISTS (SELECT 1 FROM search_embeddings e "
+            "WHERE e.source = d.source AND e.doc_id = d.doc_id AND e.model = ?) "
+            "ORDER BY d.doc_id DESC LIMIT ?",
+            (model, limit)
+        ).fetchall()
+
+    # --- Retrieval chunks (rag_index) ---
+    def ensure_rag_table(self, dims: int) -> bool:
+        """Create ``rag_chunks_<dims>`` (a ``FLOAT[dims]`` column) if needed; returns whether it has an HNSW index.
+
+        The index needs DuckDB's ``vss`` extension (``INSTALL vss`` once);
+        without it, retrieval scans the vectors.
+        """
+        known = self._rag_tables.get(dims)
+        if known is not None:
+            return known
+        cur = self.cursor()
+        table = f"rag_chunks_{int(dims)}"
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            root VARCHAR,
+            path VARCHAR,
+            model VARCHAR,
+            start_line INTEGER,
+            end_line INTEGER,
+            text VARCHAR,
+            embedding FLOAT[{int(dims)}]
+        );
+        """)
+        try:
+            cur.execute("LOAD vss")
+            cur.execute("SET hnsw_enable_experimental_persistence = true")
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_hnsw ON {table} USING HNSW (embedding) WITH (metric = 'cosine')"
+            )
+            indexed = True
+        except Exception:
+            indexed = False
+        self._rag_tables[dims] = indexed
+        return indexed
+
+    def get_rag_files(self, root: str, model: str) -> dict[str, tuple[int, int]]:
+        """``path -> (size, mtime_ns)`` of the files indexed under ``root`` with ``model``."""
+        rows = self.cursor().execute(
+            "SELECT path, size, mtime_ns FROM rag_files WHERE root = ? AND model = ?", (root, model)
+        ).fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def replace_rag_file(
+        self, root: str, path: str, model: str, size: int, mtime_ns: int, dims: int, chunks: list[tuple]
+    ) -> None:
+        """Make ``chunks`` ``(start_line, end_line, text, vector literal)`` the indexed content of ``path``.
+
+        A file without chunks (binary, empty) is recorded with ``dims`` 0 so
+        it is not read again until it changes.
+        """
+        if chunks:
+            self.ensure_rag_table(dims)
+        cur = self.cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            self._delete_rag_chunks(cur, root, model, [path])
+            if chunks:
+                cur.executemany(
+                    f"INSERT INTO rag_chunks_{int(dims)} VALUES (?, ?, ?, ?, ?, ?, ?::VARCHAR::FLOAT[{int(dims)}])",
+                    [(root, path, model, *chunk) for chunk in chunks]
+                )
+            cur.execute(
+                "INSERT OR REPLACE INTO rag_files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (root, path, model, size, mtime_ns, dims if chunks else 0, len(chunks), datetime.now())
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def delete_rag_files(self, root: str, model: str, paths: list[str]) -> None:
+        """Forget deleted files (their chunks and their ``rag_files`` rows)."""
+        if not paths:
+            return
+        cur = self.cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            self._delete_rag_chunks(cur, root, model, paths)
+            cur.execute(
+                "DELETE FROM rag_files WHERE root = ? AND model = ? AND path IN (SELECT UNNEST(?::VARCHAR[]))",
+                (root, model, paths)
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _delete_rag_chunks(cur: duckdb.DuckDBPyConnection, root: str, model: str, paths: list[str]) -> None:
+        dims = cur.execute(
+            "SELECT DISTINCT dims FROM rag_files WHERE root = ? AND model = ? AND dims > 0 "
+            "AND path IN (SELECT UNNEST(?::VARCHAR[]))",
+            (root, model, paths)
+        ).fetchall()
+        for (dim,) in dims:
+            cur.execute(
+                f"DELETE FROM rag_chunks_{int(dim)} WHERE root = ? AND model = ? "
+                "AND path IN (SELECT UNNEST(?::VARCHAR[]))",
+                (root, model, paths)
+            )
+
+    def search_rag(self, root: str, model: str, vector: str, dims: int, limit: int = 8):
+        """``(path, start_line, end_line, text, similarity)`` of the chunks nearest to ``vector`` (list text)."""
+        if dims not in self._rag_tables:
+            exists = self.cursor().execute(
+                "SELECT 1 FROM duckdb_tables() WHERE table_name = ?", (f"rag_chunks_{int(dims)}",)
+            ).fetchone()
+            if not exists:
+                return []
+            self.ensure_rag_table(dims)
+        table = f"rag_chunks_{int(dims)}"
+        # ORDER BY distance LIMIT k is the shape the HNSW index answers
+        return self.cursor().execute(
+            f"SELECT path, start_line, end_line, text, "
+            f"1 - array_cosine_distance(embedding, ?::VARCHAR::FLOAT[{int(dims)}]) AS similarity "
+            f"FROM {table} WHERE root = ? AND model = ? "
+            f"ORDER BY array_cosine_distance(embedding, ?::VARCHAR::FLOAT[{int(dims)}]) LIMIT ?",
+            (vector, root, model, vector, limit)
+        ).fetchall()
+
+    def get_file_fingerprint(self, file_path: str):
+        """Retrieve ``(size, mtime_ns, content_hash)`` recorded for a path, if any."""
+        return self.cursor().execute(
+            "SELECT size, mtime_ns, content_hash FROM file_fingerprints WHERE file_path = ?",
+            (file_path,)
+        ).fetchone()
+
+
+class WriteBehindQueue:
+    """Buffers inserts and upserts and writes them in batches.
+
+    Producers call ``add_chat_message``/``add_file_summary`` (or ``enqueue``
+    for any table in ``_WRITE_SQL``) without awaiting anything; a background
+    task writes everything buffered in one transaction per
+    ``flush_interval`` (or sooner once ``max_batch`` rows are pending).
+    ``close()`` drains the buffer, so nothing is lost on exit.
+    """
+
+    def __init__(
+        self,
+        repo: ChatRepository,
+        flush_interval: float = 0.5,
+        max_batch: int = 500,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        id_block: int = 64,
+    ):
+        self.repo = repo
+        self.id_block = id_block
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_error = on_error
+        # table -> {key: row}; upserts pass their conflict key, inserts get a unique one
+        self._pending: dict[str, dict[Hashable, tuple]] = {}
+        self._pending_lock = threading.Lock()
+        self._counter = itertools.count()
+        self._chat_ids: list[int] = []
+        self._chat_ids_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self._pending.values())
+
+    def enqueue(self, table: str, row: tuple, key: Optional[Hashable] = None) -> None:
+        """Queue a row for ``table``; rows sharing a ``key`` collapse to the latest.
+
+        Safe to call from worker threads as well as the event loop.
+        """
+        if table not in _WRITE_SQL:
+            raise KeyError(f"No write statement for table {table!r}")
+        with self._pending_lock:
+            if key is None:
+                key = next(self._counter)
+            self._pending.setdefault(table, {})[key] = row
+        self._maybe_wake()
+
+    def add_chat_message(self, session_id: str, model: str, role: str, content: str) -> int:
+        """Queue a chat message and return the id it will be stored under.
+
+        Ids are reserved from the sequence ``id_block`` at a time, so this
+        touches the database once per block, not per message. The timestamp
+        is taken now, not at flush time.
+        """
+        with self._chat_ids_lock:
+            if not self._chat_ids:
+                self._chat_ids = self.repo.reserve_ids("chat_history", self.id_block)
+            message_id = self._chat_ids.pop(0)
+        self.enqueue("chat_history", (message_id, session_id, model, datetime.now(), role, content))
+        return message_id
+
+    def add_file_summary(self, file_path: str, model: str, summary: str) -> None:
+        """Queue a summary upsert; later writes for the same key replace earlier ones."""
+        self.enqueue(
+            "file_summaries", (file_path, model, datetime.now(), summary), key=(file_path, model)
+        )
+
+    def _maybe_wake(self) -> None:
+        if self._wakeup is None or self.pending < self.max_batch:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take(self) -> dict[str, dict[Hashable, tuple]]:
+        with self._pending_lock:
+            taken, self._pending = self._pending, {}
+        return taken
+
+    def _requeue(self, taken: dict[str, dict[Hashable, tuple]]) -> None:
+        with self._pending_lock:
+            for table, rows in taken.items():
+                merged = dict(rows)
+                merged.update(self._pending.get(table, {}))
+                self._pending[table] = merged
+
+    def _write(self, taken: dict[str, dict[Hashable, tuple]]) -> None:
+        self.repo.write_batch({table: list(rows.values()) for table, rows in taken.items()})
+
+    async def flush(self) -> None:
+        """Write everything buffered so far in one transaction."""
+        if self._flush_lock is None:
+            self.flush_sync()
+            return
+        async with self._flush_lock:
+            taken = self._take()
+            if not taken:
+                return
+            try:
+                await asyncio.to_thread(self._write, taken)
+            except Exception:
+                self._requeue(taken)
+                raise
+
+    def flush_sync(self) -> None:
+        """Blocking flush for callers outside the event loop."""
+        taken = self._take()
+        if not taken:
+            return
+        try:
+            self._write(taken)
+        except Exception:
+            self._requeue(taken)
+            raise
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+
+    async def close(self) -> None:
+        """Stop the flush task and write whatever is still buffered."""
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+_repository: Optional[ChatRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> ChatRepository:
+    """Return the process-wide repository, creating it on first use."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = ChatRepository(DB_FILE)
+        return _repository
+
+
+def close_database() -> None:
+    """Close the process-wide repository (safe to call more than once)."""
+    global _repository
+    with _repository_lock:
+        repo, _repository = _repository, None
+    if repo is not None:
+        repo.close()
+
+
 def initialize_database():
     """Connect to DuckDB and create tables if they don't exist."""
-    con = duckdb.connect(DB_FILE)
-    # Create chat_history table
-    con.execute("""
-    CREATE TABLE IF NOT EXISTS chat_history (
-        id INTEGER PRIMARY KEY, 
-        session_id VARCHAR, 
-        model VARCHAR, 
-        timestamp TIMESTAMP, 
-        role VARCHAR, 
-        content VARCHAR
-    );
-    """)
-    # Create file_summaries table
-    con.execute("""
-    CREATE TABLE IF NOT EXISTS file_summaries (
-        id INTEGER PRIMARY KEY,
-        file_path VARCHAR,
-        model VARCHAR,
-        timestamp TIMESTAMP,
-        summary VARCHAR,
-        UNIQUE(file_path, model)
-    );
-    """)
-    con.close()
-
-def add_chat_message(session_id: str, model: str, role: str, content: str):
-    """Add a new chat message to the database."""
-    con = duckdb.connect(DB_FILE)
-    try:
-        # Generate the next id explicitly to avoid PRIMARY KEY constraint issues
-        next_id = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chat_history").fetchone()[0]
-        con.execute(
-            "INSERT INTO chat_history (id, session_id, model, timestamp, role, content) VALUES (?, ?, ?, ?, ?, ?)",
-            (next_id, session_id, model, datetime.now(), role, content)
-        )
-    finally:
-        con.close()
+    get_repository().initialize()
+
+def add_chat_message(session_id: str, model: str, role: str, content: str) -> int:
+    """Add a new chat message to the database and return its id."""
+    return get_repository().add_chat_message(session_id, model, role, content)
 
 def get_chat_history(session_id: str):
     """Retrieve chat history for a given session."""
-    con = duckdb.connect(DB_FILE)
-    result = con.execute(
-        "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY timestamp ASC",
-        (session_id,)
-    ).fetchall()
-    con.close()
-    return result
+    return get_repository().get_chat_history(session_id)
+
+def get_chat_history_page(session_id: str, before_id: Optional[int] = None, limit: int = 50):
+    """Retrieve one keyset page of chat history (oldest first)."""
+    return get_repository().get_chat_history_page(session_id, before_id, limit)
+
+def get_sessions(limit: int = 200):
+    """Retrieve chat sessions, most recently active first."""
+    return get_repository().get_sessions(limit)
+
+def get_chat_messages(message_ids: list[int]) -> dict[int, str]:
+    """Retrieve message bodies by id."""
+    return get_repository().get_chat_messages(message_ids)
 
 def add_file_summary(file_path: str, model: str, summary: str):
     """Add or update a file summary in the database."""
-    con = duckdb.connect(DB_FILE)
-    try:
-        # Generate next id for insert path
-        next_id = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM file_summaries").fetchone()[0]
-        con.execute(
-            (
-                "INSERT INTO file_summaries (id, file_path, model, timestamp, summary) "
-                "VALUES (?, ?, ?, ?, ?) "
-                "ON CONFLICT(file_path, model) DO UPDATE SET timestamp=excluded.timestamp, summary=excluded.summary"
-            ),
-            (next_id, file_path, model, datetime.now(), summary)
-        )
-    finally:
-        con.close()
+    get_repository().add_file_summary(file_path, model, summary)
 
 def get_file_summary(file_path: str, model: str):
     """Retrieve a file summary from the database."""
-    con = duckdb.connect(DB_FILE)
-    result = con.execute(
-        "SELECT summary FROM file_summaries WHERE file_path = ? AND model = ?",
-        (file_path, model)
-    ).fetchone()
-    con.close()
-    return result[0] if result else None
+    return get_repository().get_file_summary(file_path, model)
+
+
+def get_request_percentiles(model: Optional[str] = None, since: Optional[datetime] = None):
+    """Retrieve p50/p95 request stage timings per model and request kind."""
+    return get_repository().get_request_percentiles(model, since)
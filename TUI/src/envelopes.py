@@ -0,0 +1,138 @@
+"""Request envelopes: everything needed to re-run a generation exactly.
+
+An envelope holds the endpoint, the model and its digest, the options
+(including the sampling seed) and the exact messages that were sent. It
+links to the reply's ``chat_history`` id. Message contents are stored as
+content-addressed segments in the ``blobs`` table. A context block is
+split at its file sections, so a file that is in context for every turn
+of every session is stored once.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from context_builder import FILE_MARKER, ContextEntry
+from database import ChatRepository, WriteBehindQueue
+
+# Segments start at each file section of a context block
+_SEGMENT_BOUNDARY = re.compile(rf"(?m)^(?={re.escape(FILE_MARKER)})")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_segments(text: str) -> list[str]:
+    """Split ``text`` at file sections; joining the pieces gives ``text`` back."""
+    return [piece for piece in _SEGMENT_BOUNDARY.split(text) if piece] or [text]
+
+
+def new_seed() -> int:
+    """A sampling seed for one request (recorded, so a replay samples the same tokens)."""
+    return random.randrange(2**31)
+
+
+@dataclass
+class RequestEnvelope:
+    """One generation request as sent, plus what came back."""
+    session_id: str
+    model: str
+    endpoint: str  # "chat" or "generate"
+    messages: list[dict[str, str]]
+    # Provider options as passed (e.g. {"options": {"num_ctx": 8192, "seed": 42}})
+    options: dict[str, Any] = field(default_factory=dict)
+    model_digest: str = ""
+    # How each context file was included: path, mode and tokens
+    context_files: list[dict[str, Any]] = field(default_factory=list)
+    output: str = ""
+    message_id: Optional[int] = None
+    replay_of: Optional[int] = None
+    timestamp: datetime = field(default_factory=datetime.now)
+    id: Optional[int] = None
+
+    @property
+    def seed(self) -> Optional[int]:
+        return (self.options.get("options") or {}).get("seed")
+
+    @staticmethod
+    def describe_context(entries: Iterable[ContextEntry]) -> list[dict[str, Any]]:
+        return [{"path": str(e.path), "mode": e.mode, "tokens": e.tokens} for e in entries]
+
+
+class EnvelopeRecorder:
+    """Queues envelopes and their not-yet-stored segments on the write-behind queue.
+
+    Segments already written (or queued) by this process are remembered,
+    so an unchanged context block is hashed every turn but never re-sent
+    to the database.
+    """
+
+    def __init__(self, persistence: WriteBehindQueue):
+        self.persistence = persistence
+        self._known: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _store(self, text: str) -> list[str]:
+        """Store ``text`` split at its file sections; returns the segment hashes."""
+        return [self._store_blob(segment) for segment in split_segments(text)]
+
+    def _store_blob(self, text: str) -> str:
+        """Store ``text`` as one blob; returns its hash."""
+        digest = content_hash(text)
+        with self._lock:
+            if digest in self._known:
+                return digest
+            self._known.add(digest)
+        self.persistence.enqueue("blobs", (digest, len(text), text), key=digest)
+        return digest
+
+    def record(self, envelope: RequestEnvelope) -> None:
+        """Queue ``envelope``. Safe to call from worker threads."""
+        messages = [
+            {"role": m["role"], "parts": self._store(m["content"])} for m in envelope.messages
+        ]
+        # A reply is stored whole, even if it quotes file sections
+        output_hash = self._store_blob(envelope.output) if envelope.output else None
+        self.persistence.enqueue("request_envelopes", (
+            envelope.timestamp, envelope.session_id, envelope.message_id, envelope.endpoint,
+            envelope.model, envelope.model_digest, json.dumps(envelope.options), envelope.seed,
+            json.dumps(messages), json.dumps(envelope.context_files), output_hash, envelope.replay_of,
+        ))
+
+
+def load_envelopes(repo: ChatRepository, session_id: str) -> list[RequestEnvelope]:
+    """Envelopes of ``session_id`` in request order, with messages and outputs reassembled. Blocking."""
+    rows = repo.get_envelopes(session_id)
+    decoded = [(row, json.loads(row[9])) for row in rows]
+    wanted = {part for _, messages in decoded for m in messages for part in m["parts"]}
+    wanted.update(row[11] for row in rows if row[11])
+    blobs = repo.get_blobs(list(wanted))
+    envelopes = []
+    for row, messages in decoded:
+        (id_, timestamp, session, message_id, endpoint, model, digest,
+         options, _seed, _, context_files, output_hash, replay_of) = row
+        envelopes.append(RequestEnvelope(
+            session_id=session,
+            model=model,
+            endpoint=endpoint,
+            messages=[
+                {"role": m["role"], "content": "".join(blobs[part] for part in m["parts"])}
+                for m in messages
+            ],
+            options=json.loads(options),
+            model_digest=digest,
+            context_files=json.loads(context_files),
+            output=blobs.get(output_hash, "") if output_hash else "",
+            message_id=message_id,
+            replay_of=replay_of,
+            timestamp=timestamp,
+            id=id_,
+        ))
+    return envelopes
@@ -0,0 +1,520 @@
+"""Background index of the files under a root, with fuzzy search.
+
+The tree is walked in a thread pool (one task per directory), honouring
+``.gitignore`` files at every level. The index can be patched path by path
+or directory by directory, so it never needs a full rescan after start-up.
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+# Directories never walked, whatever the .gitignore files say
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache", ".ruff_cache"}
+
+# Paths considered per query; enough that the best matches are among them
+MAX_CANDIDATES = 3000
+# Paths collected for a query that extends an earlier one, on top of its narrowed matches
+TOP_UP_CANDIDATES = 300
+# Recent queries whose candidates are kept for narrowing (and for going back with backspace)
+RECENT_QUERIES = 32
+# Candidates that get the full score, after a cheap first cut
+PRE_RANKED = 300
+# Seconds one search may spend scanning; the rest of the scan is left for the next call
+SEARCH_BUDGET = 0.03
+# Lines scanned between checks of the budget (~1 ms each)
+SCAN_LINES = 2000
+
+
+class IgnoreRule(NamedTuple):
+    base: str  # directory of the .gitignore, relative to the root ("" for the root)
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _glob_to_regex(glob: str) -> str:
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = glob.find("]", i + 1)
+            if end < 0:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < len(glob):
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse_gitignore(text: str, base: str = "") -> list[IgnoreRule]:
+    """Parse ``.gitignore`` content into rules relative to ``base``."""
+    rules = []
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in line
+        pattern = _glob_to_regex(line.lstrip("/"))
+        if not anchored:
+            pattern = "(?:.*/)?" + pattern
+        rules.append(IgnoreRule(base, re.compile(pattern + r"\Z"), negate, dir_only))
+    return rules
+
+
+def is_ignored(rules: Iterable[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Apply rules in order; the last one that matches decides."""
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base:
+            if not rel_path.startswith(rule.base + "/"):
+                continue
+            target = rel_path[len(rule.base) + 1:]
+        else:
+            target = rel_path
+        if rule.regex.match(target):
+            ignored = not rule.negate
+    return ignored
+
+
+class _Scan(NamedTuple):
+    """One query's candidates so far and where its scans stopped."""
+    found: list[int]
+    cap: int
+    # Lines the basename and full-path scans resume from (None: that scan finished)
+    names_from: Optional[int]
+    paths_from: Optional[int]
+
+    @property
+    def pending(self) -> bool:
+        return len(self.found) < self.cap and (self.names_from is not None or self.paths_from is not None)
+
+
+@dataclass
+class FileMatch:
+    path: Path
+    rel_path: str
+    score: float
+
+
+class FileIndex:
+    """Set of file paths (relative, ``/``-separated) under ``root``.
+
+    ``build()`` blocks; run it through ``asyncio.to_thread``. ``search()``
+    is safe to call while the index is being built or patched; during
+    ``build()`` it sees the files indexed so far. After ``add()`` and
+    ``discard()``, ``refresh()`` brings search up to date.
+    """
+
+    def __init__(self, root: Path, workers: int = 8):
+        self.root = Path(root).resolve()
+        self.workers = workers
+        self.ready = False
+        self._lock = threading.Lock()
+        self._files: set[str] = set()
+        self._dir_rules: dict[str, tuple[IgnoreRule, ...]] = {}
+        self._dirs: set[str] = set()
+        self._version = 0
+        # Search structures, rebuilt lazily after changes
+        self._snapshot_version = -1
+        self._paths: list[str] = []
+        self._starts: list[int] = []
+        self._blob = ""
+        # The basenames alone, one per line in the same order
+        self._name_starts: list[int] = []
+        self._name_blob = ""
+        # Recent queries' candidates, refined while the user keeps typing
+        self._recent: dict[str, _Scan] = {}
+        self._search_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    # --- Walking ---
+    def _rel(self, path: Path) -> Optional[str]:
+        try:
+            rel = Path(path).resolve().relative_to(self.root)
+        except ValueError:
+            return None
+        return rel.as_posix() if rel.parts else ""
+
+    def _rules_for(self, rel_dir: str) -> tuple[IgnoreRule, ...]:
+        """Rules in effect inside ``rel_dir`` (parents first), reading .gitignore files as needed."""
+        with self._lock:
+            known = self._dir_rules.get(rel_dir)
+        if known is not None:
+            return known
+        parent = rel_dir.rpartition("/")[0] if rel_dir else None
+        inherited = self._rules_for(parent) if parent is not None else ()
+        rules = inherited + tuple(self._read_gitignore(rel_dir))
+        with self._lock:
+            self._dir_rules[rel_dir] = rules
+        return rules
+
+    def _read_gitignore(self, rel_dir: str) -> list[IgnoreRule]:
+        try:
+            text = (self.root / rel_dir / ".gitignore").read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return []
+        return parse_gitignore(text, rel_dir)
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Whether ``rel_path`` is excluded, by its own rules or an excluded ancestor."""
+        parts = rel_path.split("/")
+        if any(part in SKIP_DIRS for part in (parts if is_dir else parts[:-1])):
+            return True
+        for depth in range(1, len(parts) + 1):
+            path = "/".join(parts[:depth])
+            parent = "/".join(parts[:depth - 1])
+            if is_ignored(self._rules_for(parent), path, is_dir or depth < len(parts)):
+                return True
+        return False
+
+    def directories(self, under: Optional[Path] = None) -> list[Path]:
+        """Absolute paths of the directories walked (optionally only those below ``under``)."""
+        prefix = None
+        if under is not None:
+            prefix = self._rel(under)
+            if prefix is None:
+                return []
+        with self._lock:
+            dirs = list(self._dirs)
+        if prefix:
+            dirs = [d for d in dirs if d == prefix or d.startswith(prefix + "/")]
+        return [self.root / d for d in dirs]
+
+    def _scan_dir(self, rel_dir: str, inherited: tuple[IgnoreRule, ...]) -> tuple[list[str], list[tuple[str, tuple]]]:
+        rules = inherited + tuple(self._read_gitignore(rel_dir))
+        with self._lock:
+            self._dir_rules[rel_dir] = rules
+            self._dirs.add(rel_dir)
+        files: list[str] = []
+        subdirs: list[tuple[str, tuple]] = []
+        try:
+            with os.scandir(self.root / rel_dir) as entries:
+                for entry in entries:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if entry.name not in SKIP_DIRS and not is_ignored(rules, rel, True):
+                            subdirs.append((rel, rules))
+                    elif not is_ignored(rules, rel, False):
+                        files.append(rel)
+        except OSError:
+            pass
+        return files, subdirs
+
+    def _walk(self, rel_dir: str, on_batch: Callable[[list[str]], None]) -> None:
+        parent = rel_dir.rpartition("/")[0] if rel_dir else None
+        inherited = self._rules_for(parent) if parent is not None else ()
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="file-index") as pool:
+            pending = {pool.submit(self._scan_dir, rel_dir, inherited)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    on_batch(files)
+                    pending.update(pool.submit(self._scan_dir, rel, rules) for rel, rules in subdirs)
+
+    def build(self) -> int:
+        """Index the whole tree; returns the number of files. Blocking."""
+        def add_batch(files: list[str]) -> None:
+            if files:
+                with self._lock:
+                    self._files.update(files)
+                    self._version += 1
+
+        with self._lock:
+            self._files.clear()
+            self._dir_rules.clear()
+            self._dirs.clear()
+            self._version += 1
+        self._walk("", add_batch)
+        self.refresh()
+        self.ready = True
+        return len(self._files)
+
+    def files(self) -> list[str]:
+        """The indexed paths (relative, ``/``-separated), in no particular order."""
+        with self._lock:
+            return list(self._files)
+
+    # --- Incremental updates ---
+    def add(self, path: Path) -> bool:
+        """Index one file if it is not ignored; returns whether it was added."""
+        rel = self._rel(path)
+        if not rel or self.is_ignored(rel, False):
+            return False
+        with self._lock:
+            if rel in self._files:
+                return False
+            self._files.add(rel)
+            self._version += 1
+        return True
+
+    def discard(self, path: Path) -> bool:
+        """Forget one file (or, for a directory, everything under it)."""
+        rel = self._rel(path)
+        if rel is None:
+            return False
+        with self._lock:
+            if rel in self._files:
+                self._files.discard(rel)
+            else:
+                prefix = rel + "/" if rel else ""
+                doomed = [p for p in self._files if p.startswith(prefix)]
+                self._dirs.difference_update([d for d in self._dirs if d == rel or d.startswith(prefix)])
+                if not doomed:
+                    return False
+                self._files.difference_update(doomed)
+            self._version += 1
+        return True
+
+    def rescan(self, directory: Path) -> None:
+        """Re-walk one directory subtree, e.g. after it was created or moved in. Blocking."""
+        rel = self._rel(directory)
+        if rel is None or (rel and self.is_ignored(rel, True)):
+            return
+        prefix = rel + "/" if rel else ""
+        found: list[str] = []
+        with self._lock:
+            for key in [k for k in self._dir_rules if k == rel or k.startswith(prefix)]:
+                del self._dir_rules[key]
+            self._dirs.difference_update([d for d in self._dirs if d == rel or d.startswith(prefix)])
+        self._walk(rel, found.extend)
+        with self._lock:
+            self._files.difference_update([p for p in self._files if p.startswith(prefix)])
+            self._files.update(found)
+            self._version += 1
+        self.refresh()
+
+    # --- Search ---
+    def refresh(self) -> None:
+        """Rebuild the search structures if the file set changed. Blocking (~0.2 s for 200k files).
+
+        ``build()`` and ``rescan()`` call it; call it after ``add()`` and
+        ``discard()``, so that no search has to.
+        """
+        with self._lock:
+            if self._snapshot_version == self._version:
+                return
+            paths = list(self._files)
+            version = self._version
+        blob = ("\n/" + "\n/".join(paths)).lower() if paths else ""
+        starts = list(accumulate((len(p) + 2 for p in paths), initial=0))
+        names = [p.rpartition("/")[2] for p in paths]
+        name_blob = ("\n" + "\n".join(names)).lower() if names else ""
+        name_starts = list(accumulate((len(name) + 1 for name in names), initial=0))
+        with self._search_lock:
+            if version <= self._snapshot_version:
+                return
+            self._paths, self._starts, self._blob = paths, starts, blob
+            self._name_starts, self._name_blob = name_starts, name_blob
+            self._snapshot_version = version
+            self._recent.clear()
+
+    @staticmethod
+    def _pattern(query: str, basename: bool = False) -> re.Pattern:
+        # Each character matches at its first occurrence after the previous one:
+        # no backtracking blow-up, and a line matches iff the query is a subsequence.
+        # No part matches a newline, so a match never spans two lines. For the
+        # basename blob the match is anchored at the line start (the literal
+        # "\n<first char>" prefix keeps the scan fast).
+        parts = ["\\n" + re.escape(query[0]) if basename else re.escape(query[0])]
+        for c in query[1:]:
+            parts.append(f"[^\\n{re.escape(c)}]*{re.escape(c)}")
+        return re.compile("".join(parts))
+
+    @staticmethod
+    def _scan(
+        blob: str, starts: list[int], pattern: re.Pattern, found: dict[int, None], cap: int, line: int,
+        deadline: float,
+    ) -> Optional[int]:
+        """Collect the indexes of ``blob``'s matching lines from ``line`` on into ``found``.
+
+        Returns the line to resume from once ``found`` holds ``cap`` paths
+        or the ``time.perf_counter()`` ``deadline`` has passed, or None if
+        the end of the blob was reached.
+        """
+        last = len(starts) - 1
+        while line < last:
+            if len(found) >= cap or time.perf_counter() >= deadline:
+                return line
+            end = min(line + SCAN_LINES, last)
+            pos, endpos = starts[line], starts[end]
+            line = end
+            while (m := pattern.search(blob, pos, endpos)) is not None:
+                hit = bisect_right(starts, m.start()) - 1
+                found[hit] = None
+                # Resume at the next line, so each path is reported once
+                pos = starts[hit + 1]
+                if len(found) >= cap:
+                    line = hit + 1
+                    break
+        return None
+
+    def _candidates(self, query: str, deadline: float) -> _Scan:
+        recent = self._recent.get(query)
+        if recent is not None and not recent.pending:
+            return recent
+        pattern = self._pattern(query)
+        if recent is not None:
+            # The same query again: carry on where its scans stopped
+            found = dict.fromkeys(recent.found)
+            cap, names_from, paths_from = recent.cap, recent.names_from, recent.paths_from
+        elif (prefix := max((q for q in self._recent if query.startswith(q)), key=len, default=None)) is not None:
+            # The user typed more: every match is a match of the shorter query, so
+            # its matches that still match stand for the lines scanned so far,
+            # and the scans only carry on from where they stopped
+            earlier = self._recent[prefix]
+            # Tested as in the blob, where each path starts with "/"
+            found = dict.fromkeys(i for i in earlier.found if pattern.search("/" + self._paths[i].lower()))
+            cap = max(len(found), min(len(found) + TOP_UP_CANDIDATES, MAX_CANDIDATES))
+            names_from, paths_from = earlier.names_from, earlier.paths_from
+        else:
+            found = {}
+            cap = MAX_CANDIDATES
+            names_from, paths_from = 0, 0
+        # Short queries match most of a big tree; paths whose basename starts
+        # with the query are collected first, and collection stops at the cap
+        if "/" in query:
+            names_from = None
+        if names_from is not None:
+            names_from = self._scan(
+                self._name_blob, self._name_starts, self._pattern(query, basename=True), found, cap, names_from,
+                deadline,
+            )
+        if names_from is None and paths_from is not None:
+            paths_from = self._scan(self._blob, self._starts, pattern, found, cap, paths_from, deadline)
+        self._recent.pop(query, None)
+        if len(self._recent) >= RECENT_QUERIES:
+            del self._recent[next(iter(self._recent))]
+        self._recent[query] = _Scan(list(found), cap, names_from, paths_from)
+        return self._recent[query]
+
+    @staticmethod
+    def _score(query: str, rel_path: str) -> float:
+        lower = rel_path.lower()
+        name = lower.rpartition("/")[2]
+        score = 0.0
+        if name == query or name.rpartition(".")[0] == query:
+            score += 200
+        elif name.startswith(query):
+            score += 120
+        elif query in name:
+            score += 90
+        elif query in lower:
+            score += 50
+        # Consecutive runs and word-boundary hits, matching the tail of the
+        # query inside the basename when it fits there
+        offset = len(lower) - len(name)
+        pos = -1
+        for k, c in enumerate(query):
+            nxt = lower.find(c, pos + 1)
+            if nxt < 0:
+                break
+            within = lower.find(c, max(pos + 1, offset))
+            if within >= 0 and _is_subsequence(query[k + 1:], lower, within + 1):
+                nxt = within
+            if k and nxt == pos + 1:
+                score += 6
+            if nxt == 0 or lower[nxt - 1] in "/_-. ":
+                score += 4
+            if nxt >= offset:
+                score += 2
+            pos = nxt
+        return score - len(rel_path) * 0.2 - lower.count("/")
+
+    def search(self, query: str, limit: int = 20, budget: float = SEARCH_BUDGET) -> list[FileMatch]:
+        """Fuzzy-match ``query`` (a subsequence, case-insensitive) against indexed paths.
+
+        Scanning stops after ``budget`` seconds; then ``pending(query)`` is
+        true, and searching for the same query again carries the scan on
+        and returns the best matches of all the lines scanned so far. A
+        query typed on from a recent one only scans on from where that one
+        stopped. On 200k paths (one core) every call returns within 45 ms.
+        Most queries finish in one or two calls; one whose first letters
+        are common but which matches few paths takes up to a dozen (about
+        0.35 s in all) to scan the whole tree.
+        """
+        deadline = time.perf_counter() + budget
+        query = "".join(query.lower().split())
+        if not query:
+            return []
+        if not self.ready:
+            self.refresh()
+        with self._search_lock:
+            candidates = self._candidates(query, deadline).found
+            paths = self._paths
+            if len(candidates) > PRE_RANKED:
+                # A cheap first cut (substring tests and length) so only a few
+                # hundred paths get the full per-character score
+                def cheap(i: int) -> float:
+                    lower = paths[i].lower()
+                    name = lower[lower.rfind("/") + 1:]
+                    return (query in name) * 4 + name.startswith(query[0]) * 2 + (query in lower) - len(lower) * 0.01
+                candidates = heapq.nlargest(PRE_RANKED, candidates, key=cheap)
+            scored = heapq.nlargest(limit, ((self._score(query, paths[i]), paths[i]) for i in candidates))
+            return [FileMatch(self.root / rel, rel, score) for score, rel in scored]
+
+    def pending(self, query: str) -> bool:
+        """Whether the last search for ``query`` ran out of time before scanning every path."""
+        query = "".join(query.lower().split())
+        with self._search_lock:
+            recent = self._recent.get(query)
+            return recent is not None and recent.pending
+
+
+def _is_subsequence(query: str, text: str, start: int) -> bool:
+    pos = start
+    for c in query:
+        pos = text.find(c, pos) + 1
+        if not pos:
+            return False
+    return True
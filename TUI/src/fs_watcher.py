@@ -0,0 +1,302 @@
+"""Directory change notifications: inotify on Linux, polling everywhere else.
+
+Only the directories passed to ``watch()`` are observed (not their
+subtrees). Events are coalesced and delivered in batches once the
+filesystem has been quiet for ``debounce`` seconds, so an editor's
+write-rename-chmod dance or a ``git checkout`` arrives as one batch.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+# inotify(7) event bits
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+
+_ENTRY_EVENTS = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+_WATCH_MASK = _ENTRY_EVENTS | _IN_MODIFY | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass
+class ChangeBatch:
+    """Changes seen since the last batch."""
+    # Watched directories whose entries changed (created, deleted or renamed)
+    dirs: set[Path] = field(default_factory=set)
+    # Paths created, deleted, renamed or written, files and directories alike
+    paths: set[Path] = field(default_factory=set)
+    # Events were lost (kernel queue overflow); anything shown may be stale
+    overflow: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.dirs or self.paths or self.overflow)
+
+
+class _Inotify:
+    """Thin ctypes wrapper over the inotify syscalls."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path: Path) -> int:
+        wd = self._add(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def remove(self, wd: int) -> None:
+        self._rm(self.fd, wd)
+
+    def read(self) -> list[tuple[int, int, str]]:
+        """Drain pending events as ``(wd, mask, name)``."""
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _listing(directory: Path) -> Optional[dict[str, tuple]]:
+    """Entry name -> (is_dir, size, mtime_ns) for polling; None if the directory is gone."""
+    entries: dict[str, tuple] = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries[entry.name] = (True, 0, 0)
+                    else:
+                        st = entry.stat(follow_symlinks=False)
+                        entries[entry.name] = (False, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return entries
+
+
+class FileWatcher:
+    """Watches a set of directories and reports debounced change batches.
+
+    Uses inotify when available; directories it cannot watch (no inotify,
+    or the watch limit is reached) are polled every ``poll_interval``
+    seconds instead. ``on_changes`` is called from the watcher thread.
+    """
+
+    def __init__(
+        self,
+        on_changes: Callable[[ChangeBatch], None],
+        debounce: float = 0.2,
+        poll_interval: float = 2.0,
+        max_latency: float = 1.0,
+        use_inotify: bool = True,
+    ):
+        self.on_changes = on_changes
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_latency = max_latency
+        self._lock = threading.Lock()
+        self._wds: dict[int, Path] = {}
+        self._by_path: dict[Path, int] = {}
+        self._polled: dict[Path, Optional[dict[str, tuple]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify and os.environ.get("CAI_FS_WATCH", "auto") != "poll":
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                # Not Linux, or no inotify support: poll everything
+                self._inotify = None
+        self._wake_r, self._wake_w = os.pipe()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_path) + len(self._polled)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fs-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        for fd in (self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def watch(self, directory: Path) -> None:
+        """Start watching one directory (not its subdirectories); no-op if already watched."""
+        directory = Path(directory)
+        with self._lock:
+            if directory in self._by_path or directory in self._polled:
+                return
+        if self._inotify is not None:
+            try:
+                wd = self._inotify.add(directory)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    return
+                # ENOSPC: fs.inotify.max_user_watches reached; poll this one
+            else:
+                with self._lock:
+                    self._wds[wd] = directory
+                    self._by_path[directory] = wd
+                return
+        listing = _listing(directory)
+        with self._lock:
+            self._polled[directory] = listing
+
+    def watch_many(self, directories: Iterable[Path]) -> None:
+        for directory in directories:
+            self.watch(directory)
+
+    def unwatch(self, directory: Path) -> None:
+        """Stop watching ``directory`` and every watched directory below it."""
+        directory = Path(directory)
+        with self._lock:
+            doomed = [p for p in [*self._by_path, *self._polled] if p == directory or directory in p.parents]
+            for path in doomed:
+                self._polled.pop(path, None)
+                wd = self._by_path.pop(path, None)
+                if wd is not None:
+                    self._wds.pop(wd, None)
+                    if self._inotify is not None:
+                        self._inotify.remove(wd)
+
+    # --- Event loop (watcher thread) ---
+    def _run(self) -> None:
+        pending = ChangeBatch()
+        first = last = 0.0
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stop.is_set():
+            now = time.monotonic()
+            timeout = next_poll - now
+            if pending:
+                timeout = min(timeout, last + self.debounce - now, first + self.max_latency - now)
+            fds = [self._wake_r] + ([self._inotify.fd] if self._inotify is not None else [])
+            try:
+                ready, _, _ = select.select(fds, [], [], max(timeout, 0))
+            except (OSError, ValueError):
+                return
+            if self._stop.is_set():
+                return
+            had_pending = bool(pending)
+            seen = 0
+            if self._inotify is not None and self._inotify.fd in ready:
+                seen += self._read_inotify(pending)
+            now = time.monotonic()
+            if now >= next_poll:
+                seen += self._poll(pending)
+                next_poll = now + self.poll_interval
+            if seen:
+                # Quiet period restarts on every event, even repeats of a known path
+                last = now
+                if not had_pending:
+                    first = now
+            if pending:
+                if now - last >= self.debounce or now - first >= self.max_latency:
+                    batch, pending = pending, ChangeBatch()
+                    try:
+                        self.on_changes(batch)
+                    except Exception:
+                        # A failing consumer must not kill the watcher
+                        pass
+
+    def _read_inotify(self, pending: ChangeBatch) -> int:
+        events = self._inotify.read()
+        for wd, mask, name in events:
+            if mask & _IN_Q_OVERFLOW:
+                pending.overflow = True
+                continue
+            with self._lock:
+                directory = self._wds.get(wd)
+                if mask & _IN_IGNORED and directory is not None:
+                    # The watch went away (directory deleted or unmounted)
+                    del self._wds[wd]
+                    self._by_path.pop(directory, None)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & _ENTRY_EVENTS:
+                pending.dirs.add(directory)
+                pending.paths.add(path)
+            elif mask & (_IN_MODIFY | _IN_CLOSE_WRITE):
+                pending.paths.add(path)
+        return len(events)
+
+    def _poll(self, pending: ChangeBatch) -> int:
+        with self._lock:
+            polled = list(self._polled.items())
+        seen = 0
+        for directory, before in polled:
+            after = _listing(directory)
+            if after == before:
+                continue
+            with self._lock:
+                if directory not in self._polled:
+                    continue
+                self._polled[directory] = after
+            before, after = before or {}, after or {}
+            for name in before.keys() | after.keys():
+                old, new = before.get(name), after.get(name)
+                if old == new:
+                    continue
+                seen += 1
+                pending.paths.add(directory / name)
+                if old is None or new is None or old[0] != new[0]:
+                    pending.dirs.add(directory)
+        return seen
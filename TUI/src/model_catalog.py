@@ -0,0 +1,72 @@
+"""Model discovery with a DuckDB-backed cache of the model list and metadata."""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import os
+from typing import Optional
+
+from database import ChatRepository
+from providers import ModelInfo, Provider
+
+# Largest context window requested from Ollama (memory grows with num_ctx)
+MAX_NUM_CTX = int(os.environ.get("OLLAMA_CONTEXT_LENGTH", "8192"))
+
+
+class ModelCatalog:
+    """Knows which models a server has and their metadata.
+
+    ``cached()`` answers instantly from the last run's list in DuckDB;
+    ``refresh()`` asks the server (bounded by ``timeout``), fetches
+    ``/api/show`` concurrently for new or changed models only (by digest)
+    and stores the result for next time.
+    """
+
+    def __init__(self, provider: Provider, repo: ChatRepository, host: str, show_concurrency: int = 4):
+        self.provider = provider
+        self.repo = repo
+        self.host = host
+        self.show_concurrency = show_concurrency
+        self._models: dict[str, ModelInfo] = {}
+
+    @property
+    def models(self) -> list[ModelInfo]:
+        return list(self._models.values())
+
+    def get(self, name: Optional[str]) -> Optional[ModelInfo]:
+        return self._models.get(name or "")
+
+    def num_ctx_for(self, name: Optional[str]) -> Optional[int]:
+        """Context window to request for ``name``: its trained length, capped at MAX_NUM_CTX."""
+        info = self.get(name)
+        if info is None or not info.context_length:
+            return None
+        return min(info.context_length, MAX_NUM_CTX)
+
+    def cached(self) -> list[ModelInfo]:
+        """Load the list stored by the last refresh. Blocking."""
+        rows = self.repo.get_models(self.host)
+        self._models = {row[0]: ModelInfo(*row) for row in rows}
+        return self.models
+
+    async def refresh(self, timeout: float = 10.0) -> list[ModelInfo]:
+        """Fetch the current list and metadata from the server; raises on failure or timeout."""
+        listed = await asyncio.wait_for(self.provider.list_model_infos(), timeout=timeout)
+        semaphore = asyncio.Semaphore(self.show_concurrency)
+
+        async def with_details(info: ModelInfo) -> ModelInfo:
+            known = self._models.get(info.name)
+            if known is not None and known.digest == info.digest and known.context_length:
+                return dataclasses.replace(known, size=info.size)
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.provider.show_model(info), timeout=timeout)
+                except Exception:
+                    # Metadata is best effort; the model is still usable without it
+                    return info
+
+        infos = await asyncio.gather(*(with_details(info) for info in listed))
+        self._models = {info.name: info for info in infos}
+        rows = [dataclasses.astuple(info) for info in infos]
+        await asyncio.to_thread(self.repo.replace_models, self.host, rows)
+        return self.models
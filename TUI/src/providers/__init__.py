@@ -0,0 +1,20 @@
+"""Provider adapters: a uniform interface over LLM backends (spec section 9)."""
+
+from providers.base import GenerationChunk, GenerationResult, GenerationStats, ModelInfo, Provider, ProviderError
+from providers.ollama_adapter import DEFAULT_KEEP_ALIVE, DEFAULT_OLLAMA_HOST, OllamaProvider
+from providers.pool import DEFAULT_OLLAMA_HOSTS, ProviderPool, parse_hosts
+
+__all__ = [
+    "DEFAULT_KEEP_ALIVE",
+    "DEFAULT_OLLAMA_HOST",
+    "DEFAULT_OLLAMA_HOSTS",
+    "GenerationChunk",
+    "GenerationResult",
+    "GenerationStats",
+    "ModelInfo",
+    "OllamaProvider",
+    "Provider",
+    "ProviderError",
+    "ProviderPool",
+    "parse_hosts",
+]
@@ -0,0 +1,132 @@
+"""Provider-agnostic adapter interface and result types."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Optional, Union
+
+
+class ProviderError(Exception):
+    """Raised for any backend failure (connection, HTTP status, bad payload)."""
+
+
+@dataclass
+class GenerationChunk:
+    """One streamed piece of a generation."""
+    text: str
+    done: bool = False
+    raw: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class GenerationResult:
+    """A complete generation plus the provider's final statistics."""
+    text: str
+    raw: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class GenerationStats:
+    """Timings Ollama reports on a final chunk, split into prompt eval and generation."""
+    prompt_tokens: int = 0
+    prompt_seconds: float = 0.0
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    load_seconds: float = 0.0
+
+    @classmethod
+    def from_raw(cls, raw: dict[str, Any]) -> "GenerationStats":
+        ns = 1e-9
+        return cls(
+            prompt_tokens=raw.get("prompt_eval_count") or 0,
+            prompt_seconds=(raw.get("prompt_eval_duration") or 0) * ns,
+            eval_tokens=raw.get("eval_count") or 0,
+            eval_seconds=(raw.get("eval_duration") or 0) * ns,
+            load_seconds=(raw.get("load_duration") or 0) * ns,
+        )
+
+    @property
+    def eval_rate(self) -> float:
+        return self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0
+
+    def describe(self) -> str:
+        text = (
+            f"prompt eval {self.prompt_tokens} tok in {self.prompt_seconds:.2f}s, "
+            f"eval {self.eval_tokens} tok in {self.eval_seconds:.2f}s ({self.eval_rate:.1f} tok/s)"
+        )
+        if self.load_seconds >= 0.5:
+            text += f", model load {self.load_seconds:.1f}s"
+        return text
+
+
+@dataclass
+class ModelInfo:
+    """A model available on a backend, with metadata where the backend reports it."""
+    name: str
+    digest: str = ""
+    size: int = 0
+    context_length: Optional[int] = None
+    parameter_size: str = ""
+    quantization: str = ""
+    family: str = ""
+
+    def describe(self) -> str:
+        parts = [p for p in (self.parameter_size, self.quantization) if p]
+        if self.context_length:
+            parts.append(f"ctx {self.context_length:,}")
+        return " · ".join(parts)
+
+
+class Provider(ABC):
+    """Uniform interface for `list_models`, `generate(prompt, ...)` and `chat(messages, ...)`.
+
+    ``generate``/``chat`` with ``stream=True`` return an async iterator of
+    ``GenerationChunk``; with ``stream=False`` they return an awaitable
+    ``GenerationResult``. Implementations raise ``ProviderError`` only.
+
+    Besides backend options, both accept ``timer``: an object whose
+    ``mark("connect")`` is called once a stream's response headers arrive
+    (see ``request_metrics.RequestSpans``). Backends may ignore it.
+    """
+
+    name: str = "provider"
+
+    @abstractmethod
+    async def list_models(self) -> list[str]:
+        """Return the model names available on the backend."""
+
+    async def list_model_infos(self) -> list[ModelInfo]:
+        """Like ``list_models`` but with whatever metadata the listing carries."""
+        return [ModelInfo(name) for name in await self.list_models()]
+
+    async def show_model(self, info: ModelInfo) -> ModelInfo:
+        """Fill in per-model details (e.g. context length) that need an extra request."""
+        return info
+
+    @abstractmethod
+    def generate(
+        self, model: str, prompt: str, stream: bool = False, **options: Any
+    ) -> Union[AsyncIterator[GenerationChunk], Awaitable[GenerationResult]]:
+        """Generate a completion for ``prompt``."""
+
+    def chat(
+        self, model: str, messages: list[dict[str, str]], stream: bool = False, **options: Any
+    ) -> Union[AsyncIterator[GenerationChunk], Awaitable[GenerationResult]]:
+        """Generate the next assistant turn for ``messages`` (role/content dicts).
+
+        Backends without a native chat endpoint get the turns flattened into
+        one ``generate`` prompt.
+        """
+        prompt = "\n\n".join(f"{m['role'].upper()}:\n{m['content']}" for m in messages)
+        return self.generate(model, f"{prompt}\n\nASSISTANT:\n", stream=stream, **options)
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        """One embedding vector per input, in order."""
+        raise ProviderError(f"{self.name} does not support embeddings")
+
+    @abstractmethod
+    async def is_healthy(self) -> bool:
+        """Return whether the backend is reachable (may be cached)."""
+
+    async def aclose(self) -> None:
+        """Release network resources."""
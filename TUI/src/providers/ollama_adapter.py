@@ -0,0 +1,226 @@
+"""Ollama adapter over a single, app-lifetime pooled ``httpx.AsyncClient``."""
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
+
+from providers.base import GenerationChunk, GenerationResult, ModelInfo, Provider, ProviderError
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+if not DEFAULT_OLLAMA_HOST.startswith(("http://", "https://")):
+    DEFAULT_OLLAMA_HOST = f"http://{DEFAULT_OLLAMA_HOST}"
+
+# How long Ollama keeps the model (and its prompt cache) loaded after a request
+DEFAULT_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def _chunk_text(data: dict[str, Any]) -> str:
+    """Text of a /api/generate (``response``) or /api/chat (``message.content``) payload."""
+    if "response" in data:
+        return data.get("response") or ""
+    return (data.get("message") or {}).get("content") or ""
+
+
+class OllamaProvider(Provider):
+    """Talks to Ollama's REST API with one keep-alive connection pool.
+
+    Server health is cached: any successful request marks the server
+    healthy, so ``is_healthy()`` only pings ``/api/tags`` when nothing has
+    succeeded within ``health_ttl`` seconds.
+    """
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        host: str = DEFAULT_OLLAMA_HOST,
+        connect_timeout: float = 10.0,
+        health_ttl: float = 30.0,
+        max_connections: int = 16,
+        keep_alive: Optional[str] = DEFAULT_KEEP_ALIVE,
+    ):
+        self.host = host.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.health_ttl = health_ttl
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.last_error: Optional[str] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._healthy: Optional[bool] = None
+        self._health_checked_at = 0.0
+
+    # --- Connection pool ---
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            # Imported on first use: httpx is a large share of start-up import time
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                # Streams can idle for a long time between tokens: only bound connecting
+                timeout=httpx.Timeout(None, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=300.0,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- Health ---
+    def _mark(self, healthy: bool, error: Optional[str] = None) -> None:
+        self._healthy = healthy
+        self._health_checked_at = time.monotonic()
+        self.last_error = error
+
+    async def is_healthy(self, force: bool = False) -> bool:
+        fresh = time.monotonic() - self._health_checked_at < self.health_ttl
+        if self._healthy is not None and fresh and not force:
+            return self._healthy
+        import httpx
+
+        try:
+            resp = await self.client.get("/api/tags", timeout=self.connect_timeout)
+        except httpx.HTTPError as e:
+            self._mark(False, f"{type(e).__name__}: {e}")
+            return False
+        if resp.status_code != 200:
+            self._mark(False, f"/api/tags returned {resp.status_code}: {resp.text[:200]}")
+            return False
+        self._mark(True)
+        return True
+
+    # --- API ---
+    async def list_models(self) -> list[str]:
+        return [info.name for info in await self.list_model_infos()]
+
+    async def list_model_infos(self) -> list[ModelInfo]:
+        data = await self._request_json("GET", "/api/tags", timeout=self.connect_timeout)
+        infos = []
+        for model in data.get("models", []):
+            name = model.get("model") or model.get("name")
+            if not name:
+                continue
+            details = model.get("details") or {}
+            infos.append(ModelInfo(
+                name=name,
+                digest=model.get("digest") or "",
+                size=model.get("size") or 0,
+                parameter_size=details.get("parameter_size") or "",
+                quantization=details.get("quantization_level") or "",
+                family=details.get("family") or "",
+            ))
+        return infos
+
+    async def show_model(self, info: ModelInfo) -> ModelInfo:
+        data = await self._request_json(
+            "POST", "/api/show", json={"model": info.name}, timeout=self.connect_timeout
+        )
+        details = data.get("details") or {}
+        # model_info keys are prefixed by architecture, e.g. "llama.context_length"
+        context_length = next(
+            (v for k, v in (data.get("model_info") or {}).items() if k.endswith(".context_length")),
+            None,
+        )
+        return ModelInfo(
+            name=info.name,
+            digest=info.digest,
+            size=info.size,
+            context_length=int(context_length) if context_length else None,
+            parameter_size=details.get("parameter_size") or info.parameter_size,
+            quantization=details.get("quantization_level") or info.quantization,
+            family=details.get("family") or info.family,
+        )
+
+    def generate(self, model: str, prompt: str, stream: bool = False, **options: Any):
+        return self._call("/api/generate", {"model": model, "prompt": prompt}, stream, options)
+
+    def chat(self, model: str, messages: list[dict[str, str]], stream: bool = False, **options: Any):
+        return self._call("/api/chat", {"model": model, "messages": messages}, stream, options)
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        payload: dict[str, Any] = {"model": model, "input": inputs}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        data = await self._request_json("POST", "/api/embed", json=payload)
+        embeddings = data.get("embeddings")
+        if not isinstance(embeddings, list) or len(embeddings) != len(inputs):
+            raise ProviderError(f"/api/embed returned {len(embeddings or [])} vectors for {len(inputs)} inputs")
+        return embeddings
+
+    def _call(self, path: str, payload: dict[str, Any], stream: bool, options: dict[str, Any]):
+        timeout = options.pop("timeout", None)
+        timer = options.pop("timer", None)
+        payload["stream"] = stream
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update(options)
+        if stream:
+            return self._stream(path, payload, timer)
+        return self._generate_once(path, payload, timeout)
+
+    async def _generate_once(
+        self, path: str, payload: dict[str, Any], timeout: Optional[float]
+    ) -> GenerationResult:
+        data = await self._request_json("POST", path, json=payload, timeout=timeout)
+        return GenerationResult(text=_chunk_text(data), raw=data)
+
+    async def _request_json(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:
+        import httpx
+
+        timeout = kwargs.pop("timeout", None)
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=self.connect_timeout)
+        try:
+            resp = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self._mark(False, f"{type(e).__name__}: {e}")
+            raise ProviderError(f"Could not reach Ollama at {self.host}: {type(e).__name__}: {e}") from e
+        if resp.status_code != 200:
+            raise ProviderError(f"HTTP {resp.status_code} from {path}: {resp.text[:200]}")
+        self._mark(True)
+        try:
+            return resp.json()
+        except json.JSONDecodeError as e:
+            raise ProviderError(f"Invalid JSON from {path}: {e}") from e
+
+    async def _stream(
+        self, path: str, payload: dict[str, Any], timer: Optional[Any] = None
+    ) -> AsyncIterator[GenerationChunk]:
+        import httpx
+
+        try:
+            async with self.client.stream("POST", path, json=payload) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread())[:200].decode("utf-8", "replace")
+                    raise ProviderError(f"HTTP {resp.status_code} from {path}: {body}")
+                self._mark(True)
+                if timer is not None:
+                    timer.mark("connect")
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if data.get("error"):
+                        raise ProviderError(f"Ollama error: {data['error']}")
+                    done = data.get("done") is True
+                    yield GenerationChunk(text=_chunk_text(data), done=done, raw=data)
+                    if done:
+                        break
+        except httpx.HTTPError as e:
+            self._mark(False, f"{type(e).__name__}: {e}")
+            raise ProviderError(f"Stream from {self.host}{path} failed: {type(e).__name__}: {e}") from e
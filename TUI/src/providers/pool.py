@@ -0,0 +1,258 @@
+"""Several Ollama servers behind one provider: health checks, least-outstanding routing and failover."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from providers.base import GenerationChunk, ModelInfo, Provider, ProviderError
+from providers.ollama_adapter import DEFAULT_OLLAMA_HOST, OllamaProvider
+
+T = TypeVar("T")
+
+# Comma-separated Ollama URLs to spread requests over; OLLAMA_HOST alone when unset
+DEFAULT_OLLAMA_HOSTS = os.environ.get("OLLAMA_HOSTS") or DEFAULT_OLLAMA_HOST
+
+
+def parse_hosts(spec: str) -> list[str]:
+    """URLs from a comma-separated list; a bare ``host:port`` gets ``http://``."""
+    hosts = []
+    for host in spec.split(","):
+        host = host.strip().rstrip("/")
+        if not host:
+            continue
+        if not host.startswith(("http://", "https://")):
+            host = f"http://{host}"
+        if host not in hosts:
+            hosts.append(host)
+    if not hosts:
+        raise ValueError(f"no Ollama hosts in {spec!r}")
+    return hosts
+
+
+@dataclass(eq=False)
+class Backend:
+    """One server of a pool, with what the pool knows about it."""
+    provider: OllamaProvider
+    # Requests sent and not yet finished
+    outstanding: int = 0
+    served: int = 0
+    failures: int = 0
+    # From the last /api/tags; None until it has answered once
+    models: Optional[dict[str, ModelInfo]] = None
+    healthy: Optional[bool] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0
+    _check: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def host(self) -> str:
+        return self.provider.host
+
+    def describe(self) -> str:
+        if self.healthy is False:
+            return f"{self.host} down ({self.error})"
+        models = "?" if self.models is None else str(len(self.models))
+        return f"{self.host} {self.outstanding} running, {self.served} served, {models} models"
+
+
+class ProviderPool(Provider):
+    """Routes each request to one of several Ollama servers.
+
+    Every ``health_ttl`` seconds a server's ``/api/tags`` is fetched (all
+    servers at once, only when a request needs them); it tells the pool
+    whether the server is up and which models it has. A request goes to
+    the server with the fewest requests outstanding among those that are
+    up and have the model; ties go to the one that has served fewer.
+
+    A request that fails is sent to the next server. A stream that breaks
+    part-way is restarted on another server with the same options (and so
+    the same seed); the text already delivered is skipped, and if the new
+    server's reply starts differently a marker separates the two. Each
+    server is tried at most once per request, so a pool of one behaves
+    like a plain ``OllamaProvider``.
+    """
+
+    name = "ollama"
+
+    FAILOVER_MARKER = "\n\n[continued on {host}]\n\n"
+
+    def __init__(self, hosts: str | list[str] = DEFAULT_OLLAMA_HOSTS, health_ttl: float = 30.0, **options: Any):
+        if isinstance(hosts, str):
+            hosts = parse_hosts(hosts)
+        self.health_ttl = health_ttl
+        self.backends = [Backend(OllamaProvider(host, health_ttl=health_ttl, **options)) for host in hosts]
+        self.failovers = 0
+
+    @property
+    def host(self) -> str:
+        """All hosts, comma-separated (the model catalog's cache key)."""
+        return ",".join(backend.host for backend in self.backends)
+
+    @property
+    def last_error(self) -> Optional[str]:
+        errors = [f"{b.host}: {b.error}" for b in self.backends if b.error]
+        return "; ".join(errors) or None
+
+    def describe(self) -> str:
+        up = sum(b.healthy is not False for b in self.backends)
+        return f"{up}/{len(self.backends)} hosts up"
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            if backend._check is not None:
+                backend._check.cancel()
+            await backend.provider.aclose()
+
+    # --- Health ---
+    async def _fetch_tags(self, backend: Backend) -> None:
+        try:
+            infos = await backend.provider.list_model_infos()
+        except ProviderError as e:
+            backend.healthy = False
+            backend.error = str(e)
+        else:
+            backend.models = {info.name: info for info in infos}
+            backend.healthy = True
+            backend.error = None
+        backend.checked_at = time.monotonic()
+
+    async def refresh(self, force: bool = False) -> None:
+        """Re-read ``/api/tags`` from every server whose last check is older than ``health_ttl``."""
+        checks = []
+        for backend in self.backends:
+            stale = time.monotonic() - backend.checked_at >= self.health_ttl
+            if backend._check is None or backend._check.done():
+                if not (stale or force):
+                    continue
+                backend._check = asyncio.ensure_future(self._fetch_tags(backend))
+            checks.append(backend._check)
+        if checks:
+            # Shielded: one caller giving up must not cancel the check for the others
+            await asyncio.gather(*(asyncio.shield(check) for check in checks))
+
+    async def is_healthy(self, force: bool = False) -> bool:
+        """Whether any server is up."""
+        await self.refresh(force)
+        return any(backend.healthy for backend in self.backends)
+
+    # --- Routing ---
+    async def _pick(self, model: str, tried: set[Backend]) -> Optional[Backend]:
+        """The least busy untried server for ``model``, or None when every server was tried."""
+        await self.refresh()
+        untried = [b for b in self.backends if b not in tried]
+        up = [b for b in untried if b.healthy is not False]
+        # Servers known to have the model; then any that is up (its error names the
+        # missing model); then those marked down, which may be back by now
+        for candidates in ([b for b in up if b.models is None or model in b.models], up, untried):
+            if candidates:
+                return min(candidates, key=lambda b: (b.outstanding, b.served))
+        return None
+
+    async def _failed(self, backend: Backend, error: ProviderError) -> None:
+        backend.failures += 1
+        backend.error = str(error)
+        # The provider marks itself unhealthy on connection errors (an HTTP error leaves it up)
+        if not await backend.provider.is_healthy():
+            backend.healthy = False
+            backend.checked_at = time.monotonic()
+
+    async def _route(self, model: str, call: Callable[[OllamaProvider], Awaitable[T]]) -> T:
+        """Await ``call`` on the best server for ``model``, moving to the next one on failure."""
+        tried: set[Backend] = set()
+        error: Optional[ProviderError] = None
+        while (backend := await self._pick(model, tried)) is not None:
+            tried.add(backend)
+            backend.outstanding += 1
+            try:
+                result = await call(backend.provider)
+            except ProviderError as e:
+                await self._failed(backend, e)
+                # An answer from a server that is up (e.g. a missing model) says more than a failed connection
+                if error is None or backend.healthy is not False:
+                    error = e
+                continue
+            finally:
+                backend.outstanding -= 1
+            backend.served += 1
+            if error is not None:
+                self.failovers += 1
+            return result
+        raise error or ProviderError(f"No Ollama host available for {model}")
+
+    # --- API ---
+    async def list_models(self) -> list[str]:
+        return [info.name for info in await self.list_model_infos()]
+
+    async def list_model_infos(self) -> list[ModelInfo]:
+        """Every model on any server that is up (the first server's metadata for shared names)."""
+        await self.refresh(force=True)
+        if not any(backend.healthy for backend in self.backends):
+            raise ProviderError(f"Could not reach Ollama: {self.last_error}")
+        infos: dict[str, ModelInfo] = {}
+        for backend in self.backends:
+            if backend.healthy and backend.models:
+                for name, info in backend.models.items():
+                    infos.setdefault(name, info)
+        return list(infos.values())
+
+    async def show_model(self, info: ModelInfo) -> ModelInfo:
+        return await self._route(info.name, lambda provider: provider.show_model(info))
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        return await self._route(model, lambda provider: provider.embed(model, inputs))
+
+    def generate(self, model: str, prompt: str, stream: bool = False, **options: Any):
+        def call(provider: OllamaProvider, stream: bool):
+            return provider.generate(model, prompt, stream, **options)
+        return self._call(model, call, stream)
+
+    def chat(self, model: str, messages: list[dict[str, str]], stream: bool = False, **options: Any):
+        def call(provider: OllamaProvider, stream: bool):
+            return provider.chat(model, messages, stream, **options)
+        return self._call(model, call, stream)
+
+    def _call(self, model: str, call: Callable[[OllamaProvider, bool], Any], stream: bool):
+        if stream:
+            return self._stream(model, call)
+        return self._route(model, lambda provider: call(provider, False))
+
+    async def _stream(self, model: str, call: Callable[..., Any]) -> AsyncIterator[GenerationChunk]:
+        tried: set[Backend] = set()
+        error: Optional[ProviderError] = None
+        delivered = ""
+        while (backend := await self._pick(model, tried)) is not None:
+            tried.add(backend)
+            if error is not None:
+                self.failovers += 1
+            received = ""
+            # Whether this server's text still repeats what was delivered before the failover
+            replaying = bool(delivered)
+            backend.outstanding += 1
+            try:
+                async with contextlib.aclosing(call(backend.provider, True)) as chunks:
+                    async for chunk in chunks:
+                        received += chunk.text
+                        if replaying:
+                            if delivered.startswith(received) and not chunk.done:
+                                continue
+                            replaying = False
+                            if received.startswith(delivered):
+                                chunk.text = received[len(delivered):]
+                            else:
+                                chunk.text = self.FAILOVER_MARKER.format(host=backend.host) + received
+                        delivered += chunk.text
+                        yield chunk
+                backend.served += 1
+                return
+            except ProviderError as e:
+                await self._failed(backend, e)
+                # An answer from a server that is up (e.g. a missing model) says more than a failed connection
+                if error is None or backend.healthy is not False:
+                    error = e
+            finally:
+                backend.outstanding -= 1
+        raise error or ProviderError(f"No Ollama host available for {model}")
@@ -0,0 +1,302 @@
+"""Re-run recorded sessions from their request envelopes and diff the outputs.
+
+Each envelope is replayed with its own recorded messages, not with the
+replayed replies of earlier turns. The requests of a session are
+therefore independent and run in parallel, and each diff covers exactly
+the prompt that produced the original. The recorded options and seed
+are sent again; ``--model`` sends the same prompts to another model for
+comparison. Replays are recorded as envelopes too (``replay_of`` points
+at the original) under a ``replay-<uuid>`` session.
+
+Usage: python cai.py replay SESSION|latest [--model NAME] [--concurrency N] [--diff]
+       python cai.py replay --list
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import difflib
+import json
+import signal
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TextIO
+
+from batch_summarizer import BatchSummarizer, default_concurrency
+from database import DB_FILE, ChatRepository, WriteBehindQueue
+from envelopes import EnvelopeRecorder, RequestEnvelope, load_envelopes
+from model_catalog import ModelCatalog
+from providers import DEFAULT_OLLAMA_HOSTS, Provider, ProviderError, ProviderPool
+from request_metrics import RequestSpans
+
+
+@dataclass
+class ReplayResult:
+    """The outcome of replaying one envelope."""
+    original: RequestEnvelope
+    model: str
+    output: str = ""
+    error: Optional[str] = None
+    seconds: float = 0.0
+    # Same model name, but the server now has different weights
+    digest_changed: bool = False
+
+    @property
+    def identical(self) -> bool:
+        return self.error is None and self.output == self.original.output
+
+    def similarity(self) -> float:
+        """Word-level similarity of the two outputs, 0.0 to 1.0."""
+        if self.identical:
+            return 1.0
+        return difflib.SequenceMatcher(
+            None, self.original.output.split(), self.output.split(), autojunk=False
+        ).ratio()
+
+    def diff(self, context: int = 3) -> str:
+        """Unified diff from the recorded output to the replayed one."""
+        return "".join(difflib.unified_diff(
+            self.original.output.splitlines(keepends=True),
+            self.output.splitlines(keepends=True),
+            fromfile=f"envelope {self.original.id} ({self.original.model})",
+            tofile=f"replay ({self.model})",
+            n=context,
+        ))
+
+    def as_dict(self, with_diff: bool = False) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "type": "replay",
+            "envelope": self.original.id,
+            "message_id": self.original.message_id,
+            "model": self.model,
+            "original_model": self.original.model,
+            "seed": self.original.seed,
+            "seconds": round(self.seconds, 3),
+        }
+        if self.error is not None:
+            record["error"] = self.error
+            return record
+        record["identical"] = self.identical
+        record["similarity"] = round(self.similarity(), 4)
+        if self.digest_changed:
+            record["digest_changed"] = True
+        if with_diff and not self.identical:
+            record["diff"] = self.diff()
+        return record
+
+
+class ReplayEngine:
+    """Replays envelopes through a provider with at most ``concurrency`` requests in flight."""
+
+    def __init__(
+        self,
+        provider: Provider,
+        persistence: WriteBehindQueue,
+        catalog: Optional[ModelCatalog] = None,
+        concurrency: Optional[int] = None,
+        timeout: float = 180,
+    ):
+        self.provider = provider
+        self.persistence = persistence
+        self.recorder = EnvelopeRecorder(persistence)
+        self.catalog = catalog
+        self.concurrency = concurrency or default_concurrency()
+        self.timeout = timeout
+        self.session_id = f"replay-{uuid.uuid4()}"
+        self.batch: Optional[BatchSummarizer[RequestEnvelope]] = None
+
+    def _digest(self, model: str) -> str:
+        info = self.catalog.get(model) if self.catalog is not None else None
+        return info.digest if info is not None else ""
+
+    async def replay_one(self, envelope: RequestEnvelope, model: Optional[str] = None) -> ReplayResult:
+        """Send ``envelope``'s request again (to ``model`` if given); raises on failure."""
+        model = model or envelope.model
+        result = ReplayResult(envelope, model)
+        digest = self._digest(model)
+        result.digest_changed = bool(
+            model == envelope.model and digest and envelope.model_digest and digest != envelope.model_digest
+        )
+        spans = RequestSpans("replay", model, self.session_id)
+        options = json.loads(json.dumps(envelope.options))
+        if envelope.endpoint == "chat":
+            call = self.provider.chat(model, envelope.messages, stream=False, timer=spans, **options)
+        else:
+            call = self.provider.generate(
+                model, envelope.messages[-1]["content"], stream=False, timer=spans, **options
+            )
+        status = "error"
+        try:
+            generated = await asyncio.wait_for(call, timeout=self.timeout)
+            spans.add_generation(generated.raw)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status = "timeout"
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            spans.finish(status)
+            self.persistence.enqueue("request_metrics", spans.row())
+            result.seconds = spans.total or 0.0
+        result.output = generated.text
+        self.recorder.record(RequestEnvelope(
+            session_id=self.session_id,
+            model=model,
+            endpoint=envelope.endpoint,
+            messages=envelope.messages,
+            options=envelope.options,
+            model_digest=digest,
+            context_files=envelope.context_files,
+            output=generated.text,
+            replay_of=envelope.id,
+        ))
+        return result
+
+    async def replay(
+        self,
+        envelopes: list[RequestEnvelope],
+        model: Optional[str] = None,
+        on_result: Optional[Callable[[ReplayResult], None]] = None,
+    ) -> list[ReplayResult]:
+        """Replay all ``envelopes``; results come back in envelope order, failures included."""
+        results: dict[int, ReplayResult] = {}
+
+        async def run(envelope: RequestEnvelope) -> tuple[str, bool]:
+            result = await self.replay_one(envelope, model)
+            results[id(envelope)] = result
+            if on_result:
+                on_result(result)
+            return result.output, False
+
+        def on_error(envelope: RequestEnvelope, err: Exception) -> None:
+            reason = "timed out" if isinstance(err, asyncio.TimeoutError) else f"{type(err).__name__}: {err}"
+            result = ReplayResult(envelope, model or envelope.model, error=reason)
+            results[id(envelope)] = result
+            if on_result:
+                on_result(result)
+
+        self.batch = BatchSummarizer(run, concurrency=self.concurrency, on_error=on_error)
+        await self.batch.run(envelopes)
+        return [results[id(e)] for e in envelopes if id(e) in results]
+
+    def cancel(self) -> None:
+        if self.batch is not None:
+            self.batch.cancel()
+
+
+def _list_sessions(repo: ChatRepository, out: TextIO) -> int:
+    rows = repo.get_envelope_sessions()
+    if not rows:
+        print("cai replay: no recorded requests", file=sys.stderr)
+        return 2
+    for session_id, requests, models, first, last in rows:
+        out.write(f"{session_id}  {requests:4d} requests  {first:%Y-%m-%d %H:%M} – {last:%H:%M}  {models}\n")
+    return 0
+
+
+async def run_replay(args: argparse.Namespace, out: TextIO) -> int:
+    repo = ChatRepository(args.db)
+    try:
+        if args.list:
+            return await asyncio.to_thread(_list_sessions, repo, out)
+        session_id = args.session
+        if session_id == "latest":
+            latest = await asyncio.to_thread(repo.get_envelope_sessions, 1, False)
+            session_id = latest[0][0] if latest else ""
+        envelopes = await asyncio.to_thread(load_envelopes, repo, session_id)
+        if not envelopes:
+            print(f"cai replay: no recorded requests for session {args.session!r}", file=sys.stderr)
+            return 2
+
+        def emit(record: dict[str, Any]) -> None:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        provider = ProviderPool(args.host, max_connections=max(16, args.concurrency or 0))
+        persistence = WriteBehindQueue(repo)
+        persistence.start()
+        catalog = ModelCatalog(provider, repo, provider.host)
+        concurrency = args.concurrency or default_concurrency() * len(provider.backends)
+        engine = ReplayEngine(provider, persistence, catalog, concurrency, args.timeout)
+        print(
+            f"cai replay: {len(envelopes)} requests of {session_id}, {engine.concurrency} in flight, "
+            f"recorded as {engine.session_id}",
+            file=sys.stderr,
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, engine.cancel)
+            loop.add_signal_handler(signal.SIGTERM, engine.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(catalog.cached)
+            try:
+                # Current digests tell a changed model apart from sampling differences
+                await catalog.refresh(timeout=min(args.timeout, 30))
+            except Exception:
+                pass
+            results = await engine.replay(
+                envelopes, args.model, on_result=lambda r: emit(r.as_dict(with_diff=args.diff))
+            )
+        finally:
+            await persistence.close()
+            await provider.aclose()
+        failed = sum(r.error is not None for r in results)
+        completed = [r for r in results if r.error is None]
+        emit({
+            "type": "summary",
+            "session": session_id,
+            "replay_session": engine.session_id,
+            "requests": len(envelopes),
+            "replayed": len(completed),
+            "identical": sum(r.identical for r in completed),
+            "failed": failed,
+            "mean_similarity": round(sum(r.similarity() for r in completed) / len(completed), 4)
+            if completed else None,
+            "elapsed_s": round(time.monotonic() - started, 3),
+        })
+        if engine.batch.progress.cancelled:
+            return 130
+        return 1 if failed else 0
+    except ProviderError as e:
+        print(f"cai replay: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await asyncio.to_thread(repo.close)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cai replay", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("session", nargs="?", default="latest",
+                        help="session id to replay, or 'latest' (default: the last recorded session)")
+    parser.add_argument("--list", action="store_true", help="list recently recorded sessions and exit")
+    parser.add_argument("--model", help="replay against this model instead of the recorded one")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="requests in flight (default: OLLAMA_NUM_PARALLEL, else 2, per host)")
+    parser.add_argument("--diff", action="store_true", help="include a unified diff for outputs that changed")
+    parser.add_argument("--results", help="append JSONL results here instead of stdout")
+    parser.add_argument("--db", default=DB_FILE, help=f"DuckDB file (default: {DB_FILE})")
+    parser.add_argument("--host", default=DEFAULT_OLLAMA_HOSTS,
+                        help="Ollama URL, or several separated by commas (default: OLLAMA_HOSTS, else OLLAMA_HOST)")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds per request (default: 180)")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as out:
+            return asyncio.run(run_replay(args, out))
+    return asyncio.run(run_replay(args, sys.stdout))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
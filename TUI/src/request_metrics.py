@@ -0,0 +1,140 @@
+"""Per-request stage timings ("spans") and their p50/p95 summaries.
+
+A ``RequestSpans`` follows one model request through its stages:
+building the context, connecting (response headers received), the first
+token, the DB write and the total. Ollama's own counters
+(``eval_count``/``eval_duration`` and friends) are added from each final
+chunk. The finished record is queued for the ``request_metrics`` table,
+which ``get_request_percentiles`` summarizes per model.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from providers import GenerationStats
+
+
+class RequestSpans:
+    """Stage timings of one request on a monotonic clock.
+
+    ``span(stage)`` times a stage the client runs itself (``context``,
+    ``db``); ``mark(stage)`` stamps a point relative to the start
+    (``connect``, ``first_token``). Providers call ``mark("connect")``
+    when passed as the ``timer`` option. A request that calls the model
+    several times (a map-reduce summary) sums the counters of every call
+    and keeps the first connect and first-token marks.
+    """
+
+    def __init__(self, kind: str, model: str, session_id: str = ""):
+        self.kind = kind
+        self.model = model
+        self.session_id = session_id
+        self.started_at = datetime.now()
+        self.status = "ok"
+        self.stats = GenerationStats()
+        self.calls = 0
+        self.total: Optional[float] = None
+        self._start = time.perf_counter()
+        self._marks: dict[str, float] = {}
+        self._durations: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def mark(self, stage: str) -> None:
+        """Stamp the first time ``stage`` is reached."""
+        self._marks.setdefault(stage, self.elapsed())
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the block; repeated spans of one stage add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._durations[stage] = self._durations.get(stage, 0.0) + time.perf_counter() - start
+
+    def add_generation(self, raw: dict[str, Any]) -> None:
+        """Add the counters of one final chunk (or non-stream result)."""
+        if not raw:
+            return
+        stats = GenerationStats.from_raw(raw)
+        self.stats.prompt_tokens += stats.prompt_tokens
+        self.stats.prompt_seconds += stats.prompt_seconds
+        self.stats.eval_tokens += stats.eval_tokens
+        self.stats.eval_seconds += stats.eval_seconds
+        self.stats.load_seconds += stats.load_seconds
+        self.calls += 1
+
+    def finish(self, status: str = "ok") -> None:
+        """Stop the total clock (only the first call counts)."""
+        if self.total is None:
+            self.total = self.elapsed()
+            self.status = status
+
+    def seconds(self, stage: str) -> Optional[float]:
+        """Seconds spent in (span) or until (mark) ``stage``; None if never reached."""
+        if stage == "total":
+            return self.total
+        if stage in self._durations:
+            return self._durations[stage]
+        return self._marks.get(stage)
+
+    def row(self) -> tuple:
+        """The record for ``request_metrics`` (see ``_WRITE_SQL``)."""
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        self.finish()
+        return (
+            self.started_at, self.session_id, self.model, self.kind, self.status,
+            ms(self.seconds("context")), ms(self.seconds("connect")), ms(self.seconds("first_token")),
+            ms(self.total), ms(self.seconds("db")), self.calls,
+            self.stats.prompt_tokens, ms(self.stats.prompt_seconds),
+            self.stats.eval_tokens, ms(self.stats.eval_seconds), ms(self.stats.load_seconds),
+            round(self.stats.eval_rate, 2) if self.stats.eval_seconds else None,
+        )
+
+    def describe(self) -> str:
+        """One-line readout, e.g. ``total 2.31s · TTFT 0.42s · 38.5 tok/s``."""
+        parts = [f"total {self.total if self.total is not None else self.elapsed():.2f}s"]
+        ttft = self.seconds("first_token")
+        if ttft is not None:
+            parts.append(f"TTFT {ttft:.2f}s")
+        if self.stats.eval_seconds:
+            parts.append(f"{self.stats.eval_rate:.1f} tok/s")
+        if self.status != "ok":
+            parts.append(self.status)
+        return " · ".join(parts)
+
+
+@dataclass
+class LatencySummary:
+    """One row of ``get_request_percentiles``: p50/p95 per stage for a model and request kind."""
+    model: str
+    kind: str
+    requests: int
+    errors: int
+    total: Optional[list[float]]
+    ttft: Optional[list[float]]
+    connect: Optional[list[float]]
+    context: Optional[list[float]]
+    db: Optional[list[float]]
+    # [p50, p5]: for throughput the slow tail is the low end
+    tokens_per_s: Optional[list[float]]
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "LatencySummary":
+        return cls(*row)
+
+    def describe(self) -> str:
+        """Status-bar form, e.g. ``p50 1.92s · p95 3.20s (24 req)``."""
+        if not self.total or self.total[0] is None:
+            return f"no successful requests ({self.errors} failed)"
+        p50, p95 = self.total
+        text = f"p50 {p50 / 1000:.2f}s · p95 {p95 / 1000:.2f}s ({self.requests} req"
+        return text + (f", {self.errors} failed)" if self.errors else ")")
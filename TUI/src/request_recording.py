@@ -0,0 +1,100 @@
+"""What the app and ``cai batch`` record around each model request.
+
+Both front ends build a request's options the same way (a fresh seed,
+plus the model's context window when the catalog knows it), queue the
+same replay envelope for each chat reply, and charge the same stage
+timings and status to ``request_metrics``. What differs is only what
+happens to a finished ``RequestSpans``, which the caller passes in.
+"""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from context_builder import BuiltContext
+from envelopes import EnvelopeRecorder, RequestEnvelope, new_seed
+from model_catalog import ModelCatalog
+from request_metrics import RequestSpans
+from request_scheduler import Priority
+from summarizer import FileSummarizer
+
+# Called once with a request's spans and its status: ok, timeout, cancelled or error
+OnFinish = Callable[[RequestSpans, str], None]
+
+
+def chat_options(catalog: ModelCatalog, model: str) -> dict:
+    """Options for one request to ``model``: a fresh sampling seed and, when known, its context window."""
+    options = {"seed": new_seed()}
+    num_ctx = catalog.num_ctx_for(model)
+    if num_ctx:
+        options["num_ctx"] = num_ctx
+    return {"options": options}
+
+
+def record_envelope(
+    recorder: EnvelopeRecorder,
+    catalog: ModelCatalog,
+    session_id: str,
+    model: str,
+    messages: list[dict[str, str]],
+    options: dict,
+    built: BuiltContext,
+    reply: str,
+    reply_id: Optional[int],
+) -> None:
+    """Queue the exact request behind a reply, for ``python cai.py replay``."""
+    info = catalog.get(model)
+    recorder.record(RequestEnvelope(
+        session_id=session_id,
+        model=model,
+        endpoint="chat",
+        messages=messages,
+        options=options,
+        model_digest=info.digest if info is not None else "",
+        context_files=RequestEnvelope.describe_context(built.entries),
+        output=reply,
+        message_id=reply_id,
+    ))
+
+
+async def run_measured(
+    spans: RequestSpans, call: Callable[[], Awaitable[tuple[str, bool]]], on_finish: OnFinish
+) -> tuple[str, bool]:
+    """Await ``call`` (returning ``(text, from_cache)``) and pass ``spans`` with its status to ``on_finish``.
+
+    A cache hit made no request, so it is not reported.
+    """
+    status = "error"
+    cached = False
+    try:
+        text, cached = await call()
+        status = "ok"
+        return text, cached
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        if not cached:
+            on_finish(spans, status)
+
+
+async def summarize_with_metrics(
+    summarizer: FileSummarizer,
+    file_path: Path,
+    model: str,
+    session_id: str,
+    on_finish: OnFinish,
+    on_event: Optional[Callable[[str], None]] = None,
+    priority: Priority = Priority.SUMMARY,
+) -> tuple[str, bool]:
+    """``summarizer.summarize`` with its stage timings charged to ``session_id``."""
+    spans = RequestSpans("summary", model, session_id)
+    return await run_measured(
+        spans,
+        lambda: summarizer.summarize(file_path, model, on_event=on_event, spans=spans, priority=priority),
+        on_finish,
+    )
@@ -0,0 +1,160 @@
+"""One queue for every model request: priorities, per-model limits and preemption."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from batch_summarizer import default_concurrency
+
+T = TypeVar("T")
+
+# Requests in flight across all models; 0 leaves only the per-model limit
+MAX_IN_FLIGHT = int(os.environ.get("CAI_MAX_GENERATIONS", "0"))
+
+
+class Priority(IntEnum):
+    """Lower values run first."""
+    CHAT = 0
+    SUMMARY = 1  # a summary the user asked for (Ctrl+S)
+    BATCH = 2    # one file of a batch (Ctrl+B)
+
+
+@dataclass(eq=False)
+class _Request:
+    model: str
+    priority: Priority
+    seq: int
+    preemptible: bool
+    granted: Optional[asyncio.Future] = None
+    task: Optional[asyncio.Task] = None
+    preempted: bool = False
+
+
+class RequestScheduler:
+    """Runs model requests in priority order within per-model and global limits.
+
+    ``run(model, call, priority)`` waits for a slot, then awaits ``call()``
+    in a task of its own. Chat goes before requested summaries, which go
+    before batch summaries; equal priorities run first come, first served.
+    ``per_model`` defaults to ``OLLAMA_NUM_PARALLEL`` (Ollama queues
+    anything beyond it anyway).
+
+    A request that finds its slots held by lower-priority ``preemptible``
+    work cancels the newest of those requests. The cancel closes that
+    request's HTTP stream, so Ollama stops generating, and the request goes
+    back to the queue to be retried from the start. Cancelling the caller
+    of ``run`` cancels its request in the same way.
+    """
+
+    def __init__(
+        self,
+        per_model: Optional[int] = None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        on_change: Optional[Callable[["RequestScheduler"], None]] = None,
+    ):
+        self.per_model = per_model or default_concurrency()
+        self.max_in_flight = max_in_flight
+        self.on_change = on_change
+        self.preemptions = 0
+        self._waiting: list[_Request] = []
+        self._running: list[_Request] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def describe(self) -> str:
+        return f"{self.running} running, {self.queued} queued"
+
+    def has_capacity(self, model: str) -> bool:
+        """Whether a request for ``model`` would start now (ignoring priorities)."""
+        if self.max_in_flight and len(self._running) >= self.max_in_flight:
+            return False
+        return sum(r.model == model for r in self._running) < self.per_model
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.CHAT,
+        preemptible: bool = False,
+    ) -> T:
+        """Await ``call()`` once a slot is free; a preempted call is retried from the start."""
+        request = _Request(model, priority, next(self._seq), preemptible)
+        while True:
+            await self._acquire(request)
+            try:
+                request.task = asyncio.ensure_future(call())
+                return await request.task
+            except asyncio.CancelledError:
+                if not request.preempted or asyncio.current_task().cancelling():
+                    raise
+                request.preempted = False
+            finally:
+                self._release(request)
+
+    # --- Slots ---
+    async def _acquire(self, request: _Request) -> None:
+        request.granted = asyncio.get_running_loop().create_future()
+        request.task = None
+        self._waiting.append(request)
+        self._dispatch()
+        if not request.granted.done():
+            self._preempt_for(request)
+        self._changed()
+        try:
+            await request.granted
+        except asyncio.CancelledError:
+            if request in self._waiting:
+                self._waiting.remove(request)
+                self._changed()
+            else:
+                # Granted just before the caller was cancelled
+                self._release(request)
+            raise
+
+    def _release(self, request: _Request) -> None:
+        if request in self._running:
+            self._running.remove(request)
+            self._dispatch()
+            self._changed()
+
+    def _dispatch(self) -> None:
+        """Start waiting requests, most urgent first, while their models have slots."""
+        self._waiting.sort(key=lambda r: (r.priority, r.seq))
+        for request in list(self._waiting):
+            if self.has_capacity(request.model):
+                self._waiting.remove(request)
+                self._running.append(request)
+                request.granted.set_result(None)
+
+    def _preempt_for(self, request: _Request) -> None:
+        """Cancel the newest lower-priority preemptible request holding a slot ``request`` needs."""
+        same_model = [r for r in self._running if r.model == request.model]
+        # Blocked by the global limit rather than the model's own: any model's slot will do
+        holders = same_model if len(same_model) >= self.per_model else self._running
+        if any(r.preempted for r in holders):
+            # A slot is already on its way back
+            return
+        victims = [
+            r for r in holders
+            if r.preemptible and r.priority > request.priority and r.task is not None and not r.task.done()
+        ]
+        if victims:
+            victim = max(victims, key=lambda r: (r.priority, r.seq))
+            victim.preempted = True
+            victim.task.cancel()
+            self.preemptions += 1
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change(self)
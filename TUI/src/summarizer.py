@@ -0,0 +1,195 @@
+"""Cache-aware file summarization with map-reduce for files larger than the context."""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Callable, Optional
+
+from chunking import Chunk, split_into_chunks
+from database import WriteBehindQueue
+from providers import Provider, ProviderError
+from request_metrics import RequestSpans
+from request_scheduler import Priority, RequestScheduler
+from summary_cache import SUMMARY_PROMPT_TEMPLATE, SummaryCache
+from tokens import estimate_tokens
+
+CHUNK_PROMPT_TEMPLATE = (
+    "Summarize this part ({label}) of the file {path}. Keep names of functions, "
+    "classes and key facts; it will be merged with summaries of the other parts:\n\n{content}"
+)
+
+MERGE_PROMPT_TEMPLATE = (
+    "These are summaries of consecutive parts of the file {path}. Merge them into "
+    "one concise summary of the whole file:\n\n{content}"
+)
+
+
+class FileSummarizer:
+    """Summarizes files through a provider, reusing cached results.
+
+    Files within ``chunk_tokens`` are summarized with a single prompt. Larger
+    files are split into chunks that are summarized concurrently (map), then
+    the partial summaries are merged in groups until one remains (reduce).
+    Every chunk and merge result is cached by the hash of its input, so an
+    edit to one region of a file only re-runs the affected chunk and the
+    merges above it.
+
+    With a ``scheduler``, every model call waits for a slot at the
+    ``priority`` of its summary; batch calls can be preempted and retried.
+    """
+
+    def __init__(
+        self,
+        provider: Provider,
+        cache: SummaryCache,
+        persistence: WriteBehindQueue,
+        chunk_tokens: int = 3000,
+        map_concurrency: int = 2,
+        timeout: float = 180,
+        scheduler: Optional[RequestScheduler] = None,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.persistence = persistence
+        self.chunk_tokens = chunk_tokens
+        self.map_concurrency = map_concurrency
+        self.timeout = timeout
+        self.scheduler = scheduler
+
+    @property
+    def prompt_identity(self) -> str:
+        """Everything that shapes a whole-file summary besides content and model."""
+        return "\n".join(
+            (SUMMARY_PROMPT_TEMPLATE, CHUNK_PROMPT_TEMPLATE, MERGE_PROMPT_TEMPLATE, str(self.chunk_tokens))
+        )
+
+    def cached_summary(self, file_path: Path, model: str) -> Optional[str]:
+        """The cached summary of the file's current content, if any (no model call). Blocking."""
+        _, summary, _ = self.cache.lookup(file_path, model, self.prompt_identity, count=False)
+        return summary
+
+    async def summarize(
+        self,
+        file_path: Path,
+        model: str,
+        on_event: Optional[Callable[[str], None]] = None,
+        spans: Optional[RequestSpans] = None,
+        priority: Priority = Priority.SUMMARY,
+    ) -> tuple[str, bool]:
+        """Return ``(summary, from_cache)``, calling the model only on a cache miss.
+
+        Both paths record the summary in ``file_summaries``. Raises on failure.
+        ``spans`` (optional) gets the cache lookup and file read as its
+        ``context`` stage, the counters of every model call, and the
+        persistence hand-off as ``db``.
+        """
+        spans = spans or RequestSpans("summary", model)
+        with spans.span("context"):
+            key, summary, content = await asyncio.to_thread(
+                self.cache.lookup, file_path, model, self.prompt_identity
+            )
+            if not summary and content is None:
+                content = await asyncio.to_thread(file_path.read_text, encoding='utf-8')
+        cached = bool(summary)
+        if not cached:
+            if estimate_tokens(content) <= self.chunk_tokens:
+                summary = await self._generate(
+                    model, SUMMARY_PROMPT_TEMPLATE.format(path=file_path, content=content), spans, priority
+                )
+            else:
+                summary = await self._map_reduce(file_path, content, model, on_event, spans, priority)
+        with spans.span("db"):
+            if not cached:
+                self.cache.store(key, summary)
+            self.persistence.add_file_summary(str(file_path), model, summary)
+        return summary, cached
+
+    async def _generate(self, model: str, prompt: str, spans: RequestSpans, priority: Priority) -> str:
+        def call():
+            return asyncio.wait_for(
+                self.provider.generate(model, prompt, stream=False, timer=spans),
+                timeout=self.timeout,
+            )
+
+        if self.scheduler is None:
+            result = await call()
+        else:
+            result = await self.scheduler.run(model, call, priority, preemptible=priority is Priority.BATCH)
+        spans.add_generation(result.raw)
+        if not result.text:
+            raise ProviderError("No summary received from Ollama.")
+        return result.text
+
+    async def _cached_generate(
+        self,
+        model: str,
+        template: str,
+        text: str,
+        cache_label: str,
+        spans: RequestSpans,
+        priority: Priority,
+        **fields: str,
+    ) -> tuple[str, bool]:
+        """Summarize ``text`` with ``template`` unless a summary of identical input is cached."""
+        key, summary = await asyncio.to_thread(self.cache.lookup_text, text, model, template, cache_label)
+        if summary:
+            return summary, True
+        summary = await self._generate(model, template.format(content=text, **fields), spans, priority)
+        self.cache.store(key, summary)
+        return summary, False
+
+    async def _map_reduce(
+        self,
+        file_path: Path,
+        content: str,
+        model: str,
+        on_event: Optional[Callable[[str], None]],
+        spans: RequestSpans,
+        priority: Priority,
+    ) -> str:
+        chunks = split_into_chunks(content, self.chunk_tokens, file_path)
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize_chunk(chunk: Chunk) -> tuple[str, bool]:
+            async with semaphore:
+                return await self._cached_generate(
+                    model, CHUNK_PROMPT_TEMPLATE, chunk.text, f"{file_path}#{chunk.label}", spans, priority,
+                    path=str(file_path), label=chunk.label,
+                )
+
+        results = await asyncio.gather(*(summarize_chunk(c) for c in chunks))
+        if on_event:
+            reused = sum(cached for _, cached in results)
+            on_event(
+                f"'{file_path.name}' is ~{estimate_tokens(content)} tokens: summarized "
+                f"{len(chunks) - reused} of {len(chunks)} chunks ({reused} reused from cache)"
+            )
+        return await self._reduce(file_path, [summary for summary, _ in results], model, spans, priority)
+
+    async def _reduce(
+        self, file_path: Path, partials: list[str], model: str, spans: RequestSpans, priority: Priority
+    ) -> str:
+        """Merge partial summaries in budget-sized groups until one summary remains."""
+        while len(partials) > 1:
+            groups: list[list[str]] = [[]]
+            size = 0
+            for partial in partials:
+                tokens = estimate_tokens(partial)
+                if groups[-1] and size + tokens > self.chunk_tokens:
+                    groups.append([])
+                    size = 0
+                groups[-1].append(partial)
+                size += tokens
+            if len(groups) == len(partials):
+                # Every partial fills the budget alone; pair them up so the tree still shrinks
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            merged = await asyncio.gather(*(
+                self._cached_generate(
+                    model, MERGE_PROMPT_TEMPLATE,
+                    "\n\n".join(f"[Part {i + 1}]\n{p}" for i, p in enumerate(group)),
+                    f"{file_path}#merge", spans, priority, path=str(file_path),
+                )
+                for group in groups
+            ))
+            partials = [summary for summary, _ in merged]
+        return partials[0]
@@ -0,0 +1,127 @@
+"""Content-hash keyed cache of file summaries.
+
+Summaries are stored under ``(content_hash, model, prompt_hash)`` so an
+unchanged file is never sent to the model twice, whatever its path. A
+``(size, mtime_ns)`` fingerprint per path lets unchanged files skip hashing.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from database import ChatRepository, WriteBehindQueue
+
+SUMMARY_PROMPT_TEMPLATE = "Please provide a concise summary of this file:\n\n-- FILE: {path} --\n{content}"
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryKey(NamedTuple):
+    file_path: str
+    content_hash: str
+    model: str
+    prompt_hash: str
+
+
+class SummaryCache:
+    """Looks up and records summaries by content hash.
+
+    Reads go to memory first, then DuckDB; writes go through the app's
+    ``WriteBehindQueue`` and are kept in memory so they are visible before
+    the next flush. Methods block on disk and database I/O, so call them
+    through ``asyncio.to_thread`` from the UI.
+    """
+
+    def __init__(self, repo: ChatRepository, queue: WriteBehindQueue):
+        self.repo = repo
+        self.queue = queue
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._fingerprints: dict[str, tuple[int, int, str]] = {}
+        self._summaries: dict[tuple[str, str, str], str] = {}
+
+    def fingerprint(self, file_path: Path) -> tuple[str, Optional[str]]:
+        """Return ``(content_hash, text)`` for a file.
+
+        ``text`` is the decoded content when the file had to be read, or
+        None when the recorded size/mtime matched and the hash was reused.
+        """
+        path = str(file_path)
+        st = file_path.stat()
+        with self._lock:
+            known = self._fingerprints.get(path)
+        if known is None:
+            known = self.repo.get_file_fingerprint(path)
+        if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            with self._lock:
+                self._fingerprints[path] = tuple(known)
+            return known[2], None
+
+        text = file_path.read_text(encoding="utf-8")
+        content_hash = hash_text(text)
+        with self._lock:
+            self._fingerprints[path] = (st.st_size, st.st_mtime_ns, content_hash)
+        self.queue.enqueue(
+            "file_fingerprints", (path, st.st_size, st.st_mtime_ns, content_hash), key=path
+        )
+        return content_hash, text
+
+    def lookup(
+        self, file_path: Path, model: str, template: str = SUMMARY_PROMPT_TEMPLATE, count: bool = True
+    ) -> tuple[SummaryKey, Optional[str], Optional[str]]:
+        """Return ``(key, cached_summary, text)`` and count a hit or miss.
+
+        ``text`` is the file content if it was read while fingerprinting, so
+        callers on a miss don't read the file again. Pass ``count=False`` to
+        peek without affecting the stats.
+        """
+        content_hash, text = self.fingerprint(file_path)
+        key = SummaryKey(str(file_path), content_hash, model, hash_text(template))
+        summary = self._get(key)
+        if not count:
+            return key, summary, text
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, summary, text
+
+    def lookup_text(
+        self, text: str, model: str, template: str, label: str = ""
+    ) -> tuple[SummaryKey, Optional[str]]:
+        """Look up a summary of an arbitrary text (e.g. one chunk of a file).
+
+        Not counted in the file-level hit/miss stats.
+        """
+        key = SummaryKey(label, hash_text(text), model, hash_text(template))
+        return key, self._get(key)
+
+    def _get(self, key: SummaryKey) -> Optional[str]:
+        cache_key = (key.content_hash, key.model, key.prompt_hash)
+        with self._lock:
+            summary = self._summaries.get(cache_key)
+        if summary is None:
+            summary = self.repo.get_cached_summary(*cache_key)
+            if summary is not None:
+                with self._lock:
+                    self._summaries[cache_key] = summary
+        return summary
+
+    def store(self, key: SummaryKey, summary: str) -> None:
+        """Record a freshly generated summary for ``key``."""
+        cache_key = (key.content_hash, key.model, key.prompt_hash)
+        with self._lock:
+            self._summaries[cache_key] = summary
+        self.queue.enqueue("summary_cache", (*cache_key, datetime.now(), summary), key=cache_key)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({rate:.0f}% hit rate)"
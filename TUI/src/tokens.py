@@ -0,0 +1,12 @@
+"""Token estimation shared by chunking and prompt budgeting."""
+from __future__ import annotations
+
+# Rough average for English prose and source code with BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), never below 1 for non-empty text."""
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
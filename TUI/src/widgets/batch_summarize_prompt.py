@@ -0,0 +1,48 @@
+"""Modal prompt to summarize every file matching a glob under the explorer root."""
+from __future__ import annotations
+
+from textual.app import ComposeResult
+from textual.screen import ModalScreen
+from textual.widgets import Input, Button, Label
+from textual.containers import Vertical, Horizontal
+
+
+class BatchSummarizePrompt(ModalScreen[tuple[str, int] | None]):
+    """Ask for a glob pattern and a concurrency limit.
+
+    Returns ``(pattern, concurrency)`` on submit, or None on cancel.
+    """
+
+    def __init__(self, default_concurrency: int) -> None:
+        super().__init__()
+        self.default_concurrency = default_concurrency
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="batch-summarize-prompt"):
+            yield Label("Summarize files matching (relative to the explorer root):")
+            yield Input(value="**/*.py", placeholder="**/*.py", id="pattern-input")
+            yield Label("Parallel requests (match OLLAMA_NUM_PARALLEL):")
+            yield Input(value=str(self.default_concurrency), id="concurrency-input", type="integer")
+            with Horizontal():
+                yield Button("Cancel", id="btn-cancel")
+                yield Button("Summarize", id="btn-ok", variant="primary")
+
+    def on_mount(self) -> None:
+        self.query_one("#pattern-input", Input).focus()
+
+    def _submit(self) -> None:
+        pattern = self.query_one("#pattern-input", Input).value.strip()
+        try:
+            concurrency = max(1, int(self.query_one("#concurrency-input", Input).value))
+        except ValueError:
+            concurrency = self.default_concurrency
+        self.dismiss((pattern, concurrency) if pattern else None)
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "btn-cancel":
+            self.dismiss(None)
+        elif event.button.id == "btn-ok":
+            self._submit()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        self._submit()
@@ -3,13 +3,15 @@
 import asyncio
 from typing import Optional
 
-from rich.markdown import Markdown
 from textual.app import ComposeResult
 from textual.containers import Vertical
 from textual.message import Message
 from textual.reactive import reactive
 from textual.widget import Widget
-from textual.widgets import Input, LoadingIndicator, RichLog, Static
+from textual.widgets import Input, LoadingIndicator, Static
+
+from widgets.chat_log import ChatLog, LogEntry
+from widgets.streaming_message import StreamingMessage
 
 
 class ChatInterface(Widget):
@@ -51,21 +53,54 @@ class ChatInterface(Widget):
     
     class MessageSubmitted(Message):
         """Message sent when user submits a chat message."""
-        def __init__(self, message: str) -> None:
+        def __init__(self, chat_interface: "ChatInterface", message: str) -> None:
+            self.chat_interface = chat_interface
             self.message = message
             super().__init__()
+
+        @property
+        def control(self) -> "ChatInterface":
+            return self.chat_interface
+    
+    class OlderHistoryRequested(Message):
+        """Message sent when the user scrolls past the oldest loaded message."""
+        def __init__(self, chat_interface: "ChatInterface", before_id: int) -> None:
+            self.chat_interface = chat_interface
+            self.before_id = before_id
+            super().__init__()
+
+        @property
+        def control(self) -> "ChatInterface":
+            return self.chat_interface
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._oldest_id: Optional[int] = None
+        self._history_exhausted = True
+        self._history_pending = False
+        # Timing readout of the last request, shown whenever nothing is generating
+        self._metrics_text = ""
+        self._status_text = ""
+        # Request scheduler load, appended to whatever the status bar shows
+        self._queue_text = ""
+        # The streamed reply in progress: its header line and the blocks frozen into the log
+        self._streaming = False
+        self._stream_key = -1
+        self._stream_blocks: list[str] = []
     
     def compose(self) -> ComposeResult:
         """Create the chat interface layout."""
         with Vertical():
-            yield RichLog(id="chat-log", highlight=True, markup=True)
+            yield ChatLog(id="chat-log")
+            # Live tail of a streamed reply; closed blocks move into the log
+            yield StreamingMessage(id="stream-view")
             # Use a compact status bar instead of a full-screen loading overlay
             yield Static("", id="loading")
             yield Input(placeholder="Type your message...", id="chat-input")
     
     def on_mount(self) -> None:
         """Initialize the chat interface."""
-        self.query_one("#loading", Static).update("")
+        self._show_status("")
     
     def watch_is_loading(self, is_loading: bool) -> None:
         """Watch for changes to the loading state."""
@@ -75,53 +110,137 @@ class ChatInterface(Widget):
         """Handle user input submission."""
         if event.input.id == "chat-input" and event.value.strip():
             message = event.value.strip()
-            self.post_message(self.MessageSubmitted(message))
+            self.post_message(self.MessageSubmitted(self, message))
             event.input.clear()
     
     def update_loading_display(self, is_loading: bool) -> None:
         """Update the loading indicator display."""
-        status = self.query_one("#loading", Static)
-        status.update("Generating…" if is_loading else "")
+        self._show_status("Generating…" if is_loading else self._metrics_text)
+    
+    def set_status(self, text: str) -> None:
+        """Show progress text in the status bar (replaced by the next loading change).
+
+        Empty text brings back the request timing readout.
+        """
+        self._show_status(text or self._metrics_text)
+    
+    def set_metrics(self, text: str) -> None:
+        """Set the request timing readout shown in the status bar while idle."""
+        self._metrics_text = text
+        if not self.is_loading:
+            self._show_status(text)
+    
+    def set_queue_depth(self, text: str) -> None:
+        """Show the request queue's load next to the status text (empty hides it)."""
+        self._queue_text = text
+        self._show_status(self._status_text)
+    
+    def _show_status(self, text: str) -> None:
+        self._status_text = text
+        if self._queue_text:
+            text = f"{text} │ {self._queue_text}" if text else self._queue_text
+        self.query_one("#loading", Static).update(text)
+    
+    @property
+    def chat_log(self) -> ChatLog:
+        return self.query_one("#chat-log", ChatLog)
+    
+    def _write(self, entry: LogEntry) -> LogEntry:
+        """Append an entry, dropping the oldest ones once the log is full.
+        
+        Dropped messages are still in DuckDB, so they become reachable again
+        through history paging.
+        """
+        chat_log = self.chat_log
+        chat_log.append(entry)
+        dropped = chat_log.trim_front()
+        dropped_ids = [e.message_id for e in dropped if e.message_id is not None]
+        if dropped_ids:
+            remaining = [e.message_id for e in chat_log.entries if e.message_id is not None]
+            self._oldest_id = remaining[0] if remaining else max(dropped_ids) + 1
+            self._history_exhausted = False
+        return entry
+    
+    def _line(self, label: str, text: str) -> LogEntry:
+        return self._write(LogEntry(header=label, text=text, size_hint=LogEntry.size_of(text)))
+    
+    def _history_entry(self, message_id: int, role: str, content: str) -> LogEntry:
+        """A DuckDB-backed entry; its body is cached now and re-fetched when evicted."""
+        self.chat_log.cache_body(message_id, content)
+        if role == "user":
+            return LogEntry(header="[bold green]You:[/]", message_id=message_id,
+                            size_hint=LogEntry.size_of(content))
+        return LogEntry(header="[bold cyan]LLM:[/]", message_id=message_id, markdown=True,
+                        inline=False, size_hint=LogEntry.size_of(content))
+    
+    # --- History paging ---
+    def load_history(self, rows: list[tuple[int, str, str]], has_more: bool) -> None:
+        """Show the newest page of a session's history (rows oldest first)."""
+        for message_id, role, content in rows:
+            self._write(self._history_entry(message_id, role, content))
+        self._oldest_id = rows[0][0] if rows else None
+        self._history_exhausted = not has_more or self._oldest_id is None
+    
+    def prepend_history(self, rows: list[tuple[int, str, str]], has_more: bool) -> None:
+        """Insert an older page above what is shown, keeping the scroll position."""
+        self._history_pending = False
+        if rows:
+            self._oldest_id = rows[0][0]
+        self._history_exhausted = not has_more or not rows
+        self.chat_log.prepend([self._history_entry(*row) for row in rows])
+    
+    def on_chat_log_reached_top(self, event: ChatLog.ReachedTop) -> None:
+        """Ask the app for the previous page once the top is reached."""
+        event.stop()
+        if self._history_exhausted or self._history_pending or self._oldest_id is None:
+            return
+        self._history_pending = True
+        self.post_message(self.OlderHistoryRequested(self, self._oldest_id))
     
     def add_system_message(self, message: str) -> None:
         """Add a system message to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold blue]System:[/] {message}")
-    
-    def add_user_message(self, message: str) -> None:
-        """Add a user message to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold green]You:[/] {message}")
-    
-    def add_assistant_message(self, message: str, use_markdown: bool = True) -> None:
-        """Add an assistant message to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold cyan]LLM:[/]")
-        if use_markdown:
-            chat_log.write(Markdown(message))
+        self._line("[bold blue]System:[/]", message)
+    
+    def add_user_message(self, message: str, message_id: Optional[int] = None) -> None:
+        """Add a user message to the chat log (DuckDB-backed when ``message_id`` is given)."""
+        if message_id is not None:
+            self._write(self._history_entry(message_id, "user", message))
         else:
-            chat_log.write(message)
+            self._line("[bold green]You:[/]", message)
+    
+    def add_assistant_message(
+        self, message: str, use_markdown: bool = True, message_id: Optional[int] = None
+    ) -> None:
+        """Add an assistant message to the chat log (DuckDB-backed when ``message_id`` is given)."""
+        if message_id is not None and use_markdown:
+            self._write(self._history_entry(message_id, "assistant", message))
+            return
+        self._write(LogEntry(header="[bold cyan]LLM:[/]", text=message, markdown=use_markdown,
+                             inline=False, size_hint=LogEntry.size_of(message)))
     
     def add_error_message(self, message: str) -> None:
         """Add an error message to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold red]Error:[/] {message}")
+        self._line("[bold red]Error:[/]", message)
     
     def add_info_message(self, message: str) -> None:
         """Add an info message to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold yellow]Info:[/] {message}")
+        self._line("[bold yellow]Info:[/]", message)
     
     def add_file_summary(self, filename: str, summary: str) -> None:
         """Add a file summary to the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold magenta]File Summary ({filename}):[/]")
-        chat_log.write(Markdown(summary))
+        self._write(LogEntry(header=f"[bold magenta]File Summary ({filename}):[/]", text=summary,
+                             markdown=True, inline=False, size_hint=LogEntry.size_of(summary)))
+    
+    def add_search_result(self, source: str, text: str) -> None:
+        """Add a search result (a message or summary from any session) to the chat log."""
+        self._write(LogEntry(header=f"[bold magenta]Search Result ({source}):[/]", text=text,
+                             markdown=True, inline=False, size_hint=LogEntry.size_of(text)))
     
     def clear_chat(self) -> None:
         """Clear the chat log."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.clear()
+        self.chat_log.clear()
+        self._oldest_id = None
+        self._history_exhausted = True
     
     def set_loading(self, loading: bool) -> None:
         """Set the loading state."""
@@ -132,38 +251,44 @@ class ChatInterface(Widget):
         self.query_one("#chat-input", Input).focus()
 
     # --- Streaming helpers ---
-    _stream_buffer: str = ""
-    _streaming: bool = False
+    @property
+    def is_streaming(self) -> bool:
+        """Whether a streamed assistant message is in progress."""
+        return self._streaming
 
     def add_assistant_stream_start(self) -> None:
         """Start a streamed assistant message."""
-        chat_log = self.query_one("#chat-log", RichLog)
-        chat_log.write(f"[bold cyan]LLM:[/]")
-        self._stream_buffer = ""
+        self._stream_key = self._line("[bold cyan]LLM:[/]", "").key
+        self._stream_blocks = []
         self._streaming = True
+        self.query_one("#stream-view", StreamingMessage).start(self._write_stream_block)
+
+    def _write_stream_block(self, block: str) -> None:
+        """Freeze one closed Markdown block of the streamed message into the log."""
+        self._write(LogEntry(text=block, markdown=True, inline=False, gap=bool(self._stream_blocks),
+                             size_hint=LogEntry.size_of(block)))
+        self._stream_blocks.append(block)
 
     def append_assistant_stream_text(self, text: str) -> None:
         """Append text to the streamed assistant message.
 
-        Buffer small tokens and flush in larger chunks to avoid one-word-per-line.
-        Flush when a newline appears or when buffer exceeds ~200 characters.
-        Final buffer is rendered as Markdown in end_assistant_stream().
+        Text is only buffered here; the stream view re-renders at a capped
+        frame rate, so fast token streams don't repaint once per token.
         """
-        if not text:
-            return
-        self._stream_buffer += text
-        if "\n" in text or len(self._stream_buffer) >= 200:
-            chunk = self._stream_buffer
-            self._stream_buffer = ""
-            chat_log = self.query_one("#chat-log", RichLog)
-            chat_log.write(chunk)
+        if text:
+            self.query_one("#stream-view", StreamingMessage).append(text)
+
+    def end_assistant_stream(self, message_id: Optional[int] = None) -> None:
+        """Finish the streamed message, freezing the remaining text into the log.
 
-    def end_assistant_stream(self) -> None:
-        """Finish the streamed message, rendering the final buffer as Markdown."""
+        With a ``message_id`` the per-block entries are folded into one
+        DuckDB-backed entry, so the body can be evicted like any other.
+        """
         if not self._streaming:
             return
-        chat_log = self.query_one("#chat-log", RichLog)
-        if self._stream_buffer:
-            chat_log.write(Markdown(self._stream_buffer))
-            self._stream_buffer = ""
+        self.query_one("#stream-view", StreamingMessage).finish()
         self._streaming = False
+        if message_id is not None and self._stream_blocks:
+            content = "\n\n".join(self._stream_blocks)
+            self.chat_log.replace_from(self._stream_key, self._history_entry(message_id, "assistant", content))
+        self._stream_blocks = []
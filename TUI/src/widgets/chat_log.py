@@ -0,0 +1,314 @@
+"""Virtualized chat transcript: only entries near the viewport are rendered."""
+from __future__ import annotations
+
+import itertools
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Optional
+
+from rich.console import Group, RenderableType
+from rich.highlighter import ReprHighlighter
+from rich.segment import Segment
+from rich.text import Text
+from textual import events
+from textual.cache import LRUCache
+from textual.geometry import Size
+from textual.message import Message
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+_PLACEHOLDER = "…"
+
+
+@dataclass(eq=False)
+class LogEntry:
+    """One item in the transcript.
+
+    Entries backed by DuckDB carry only their ``message_id``; the body is
+    kept in a bounded cache and re-fetched when the entry scrolls back into
+    view. Other entries (info lines, streamed blocks) keep their ``text``.
+    """
+    header: str = ""  # Rich markup shown before the body
+    text: Optional[str] = None
+    message_id: Optional[int] = None
+    markdown: bool = False
+    inline: bool = True  # header and body on one line
+    gap: bool = False  # blank line before the entry
+    size_hint: tuple[int, int] = (0, 0)  # (chars, newlines) of the body, for height estimates
+    key: int = -1
+
+    @staticmethod
+    def size_of(text: str) -> tuple[int, int]:
+        return len(text), text.count("\n")
+
+
+class ChatLog(ScrollView, can_focus=True):
+    """Scrollable transcript that renders only what is on (or near) screen.
+
+    Entry heights start as estimates and are corrected once an entry is
+    rendered. Rendered lines are kept in an LRU of ``render_cache_size``
+    entries and DuckDB-backed bodies in an LRU of ``body_cache_size``, and
+    at most ``max_entries`` entries are held at all, so memory stays flat
+    however long the session runs.
+    """
+
+    DEFAULT_CSS = """
+    ChatLog {
+        overflow-y: scroll;
+        overflow-x: hidden;
+    }
+    """
+
+    class ReachedTop(Message):
+        """Message sent when the log is scrolled up to its first line."""
+        pass
+
+    class BodiesRequested(Message):
+        """Message sent when entries near the viewport need their bodies from DuckDB."""
+        def __init__(self, chat_log: "ChatLog", message_ids: list[int]) -> None:
+            self.chat_log = chat_log
+            self.message_ids = message_ids
+            super().__init__()
+
+        @property
+        def control(self) -> "ChatLog":
+            return self.chat_log
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        render_cache_size: int = 128,
+        body_cache_size: int = 256,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self._entries: list[LogEntry] = []
+        self._heights: list[int] = []
+        self._offsets: list[int] = []
+        self._keys = itertools.count()
+        self._strips: LRUCache[tuple[int, int], list[Strip]] = LRUCache(render_cache_size)
+        self._bodies: LRUCache[int, str] = LRUCache(body_cache_size)
+        self._requested: set[int] = set()
+        self._layout_pending = False
+        # Stick to the bottom until the user scrolls away (survives resizes)
+        self._follow = True
+        self.highlighter = ReprHighlighter()
+
+    # --- Entries ---
+    @property
+    def entries(self) -> list[LogEntry]:
+        return self._entries
+
+    @property
+    def content_width(self) -> int:
+        return self.scrollable_content_region.width
+
+    def append(self, entry: LogEntry) -> None:
+        """Add an entry at the bottom, following it if the log was scrolled to the end."""
+        entry.key = next(self._keys)
+        self._offsets.append(self._offsets[-1] + self._heights[-1] if self._entries else 0)
+        self._entries.append(entry)
+        self._heights.append(self._estimate(entry))
+        self._update_virtual_size()
+        if self._follow:
+            self.scroll_end(animate=False, immediate=True)
+        self._schedule_layout()
+
+    def prepend(self, entries: list[LogEntry]) -> None:
+        """Insert entries above the current ones, keeping the visible content in place."""
+        if not entries:
+            return
+        for entry in entries:
+            entry.key = next(self._keys)
+        added = [self._estimate(entry) for entry in entries]
+        self._entries[:0] = entries
+        self._heights[:0] = added
+        self._reflow(anchor_shift=len(entries), added_height=sum(added))
+
+    def replace_from(self, key: int, entry: LogEntry) -> None:
+        """Replace the entry with ``key`` and everything after it by ``entry``."""
+        index = next((i for i, e in enumerate(self._entries) if e.key == key), None)
+        if index is None:
+            self.append(entry)
+            return
+        del self._entries[index:]
+        del self._heights[index:]
+        entry.key = next(self._keys)
+        self._entries.append(entry)
+        self._heights.append(self._estimate(entry))
+        self._reflow()
+
+    def trim_front(self) -> list[LogEntry]:
+        """Drop the oldest entries beyond ``max_entries`` and return them."""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return []
+        dropped = self._entries[:excess]
+        removed_height = sum(self._heights[:excess])
+        del self._entries[:excess]
+        del self._heights[:excess]
+        self._reflow(anchor_shift=-excess, added_height=-removed_height)
+        return dropped
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._heights.clear()
+        self._offsets.clear()
+        self._strips.clear()
+        self._requested.clear()
+        self._follow = True
+        self._update_virtual_size()
+        self.refresh()
+
+    # --- Bodies ---
+    def cache_body(self, message_id: int, text: str) -> None:
+        """Remember a body that is already at hand (e.g. from a history page)."""
+        self._bodies.set(message_id, text)
+
+    def provide_bodies(self, bodies: dict[int, str]) -> None:
+        """Receive bodies fetched for a ``BodiesRequested`` message."""
+        for message_id, text in bodies.items():
+            self._bodies.set(message_id, text)
+            self._requested.discard(message_id)
+        self._schedule_layout()
+
+    def _body(self, entry: LogEntry) -> Optional[str]:
+        if entry.text is not None:
+            return entry.text
+        return self._bodies.get(entry.message_id)
+
+    # --- Layout ---
+    def _estimate(self, entry: LogEntry) -> int:
+        width = max(self.content_width, 20)
+        chars, newlines = entry.size_hint
+        height = newlines + 1 + chars // width
+        if entry.header and not entry.inline:
+            height += 1
+        return height + int(entry.gap)
+
+    def _update_virtual_size(self) -> None:
+        total = self._offsets[-1] + self._heights[-1] if self._entries else 0
+        self.virtual_size = Size(self.content_width, total)
+
+    def _entry_at(self, y: int) -> int:
+        return bisect_right(self._offsets, y) - 1
+
+    def _reflow(self, anchor_shift: int = 0, added_height: int = 0) -> None:
+        """Recompute offsets after heights changed, keeping the top visible line in place.
+
+        ``anchor_shift`` is how many entries were inserted (or removed, if
+        negative) before the old anchor and ``added_height`` their height.
+        """
+        scroll_y = int(self.scroll_y)
+        at_end = self._follow
+        anchor = self._entry_at(scroll_y) if self._offsets else -1
+        within = scroll_y - self._offsets[anchor] if anchor >= 0 else 0
+        self._offsets = list(itertools.accumulate(self._heights, initial=0))[:-1]
+        self._update_virtual_size()
+        if at_end:
+            self.scroll_end(animate=False, immediate=True)
+        elif anchor >= 0 and 0 <= anchor + anchor_shift < len(self._offsets):
+            self.scroll_to(y=self._offsets[anchor + anchor_shift] + within, animate=False, immediate=True)
+        elif added_height:
+            self.scroll_to(y=max(scroll_y + added_height, 0), animate=False, immediate=True)
+        self.refresh()
+        self._schedule_layout()
+
+    def _schedule_layout(self) -> None:
+        if not self._layout_pending:
+            self._layout_pending = True
+            self.call_later(self._layout)
+
+    def _layout(self) -> None:
+        """Render entries within one screen of the viewport and fix their heights."""
+        self._layout_pending = False
+        width = self.content_width
+        if not width or not self._entries:
+            return
+        margin = self.scrollable_content_region.height
+        top = max(int(self.scroll_y) - margin, 0)
+        bottom = int(self.scroll_y) + 2 * margin
+        changed = False
+        missing: list[int] = []
+        index = max(self._entry_at(top), 0)
+        while index < len(self._entries) and self._offsets[index] <= bottom:
+            entry = self._entries[index]
+            if self._body(entry) is None:
+                missing.append(entry.message_id)
+            else:
+                height = len(self._render_entry(entry, width))
+                if height != self._heights[index]:
+                    self._heights[index] = height
+                    changed = True
+            index += 1
+        missing = [m for m in missing if m not in self._requested]
+        if missing:
+            self._requested.update(missing)
+            self.post_message(self.BodiesRequested(self, missing))
+        if changed:
+            self._reflow()
+        else:
+            self.refresh()
+
+    def on_resize(self, event: events.Resize) -> None:
+        self._heights = [self._estimate(entry) for entry in self._entries]
+        self._reflow()
+
+    # --- Rendering ---
+    def _renderables(self, entry: LogEntry, body: str) -> list[RenderableType]:
+        from rich.markdown import Markdown  # deferred: markdown-it is slow to import
+
+        renderables: list[RenderableType] = [Text("")] if entry.gap else []
+        header = Text.from_markup(entry.header) if entry.header else Text()
+        if entry.inline:
+            if entry.header:
+                header.append(" ")
+            renderables.append(header + self.highlighter(Text(body)))
+        else:
+            if entry.header:
+                renderables.append(header)
+            renderables.append(Markdown(body) if entry.markdown else self.highlighter(Text(body)))
+        return renderables
+
+    def _render_entry(self, entry: LogEntry, width: int) -> list[Strip]:
+        cache_key = (entry.key, width)
+        strips = self._strips.get(cache_key)
+        if strips is not None:
+            return strips
+        body = self._body(entry)
+        console = self.app.console
+        options = console.options.update_width(width)
+        segments = console.render(Group(*self._renderables(entry, body or _PLACEHOLDER)), options)
+        strips = [Strip(line) for line in Segment.split_lines(segments)] or [Strip.blank(width)]
+        if body is not None:
+            self._strips.set(cache_key, strips)
+        return strips
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.content_width
+        line_y = scroll_y + y
+        index = self._entry_at(line_y)
+        if index < 0 or index >= len(self._entries):
+            return Strip.blank(width, self.rich_style)
+        strips = self._render_entry(self._entries[index], width)
+        if len(strips) != self._heights[index]:
+            self._schedule_layout()
+        row = line_y - self._offsets[index]
+        if row >= len(strips):
+            return Strip.blank(width, self.rich_style)
+        return strips[row].crop_extend(0, width, self.rich_style).apply_style(self.rich_style)
+
+    # --- Scrolling ---
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        self._follow = new_value >= self.max_scroll_y
+        self._schedule_layout()
+        if new_value <= 0 < old_value:
+            self.post_message(self.ReachedTop())
+
+    def on_mouse_scroll_up(self, event: events.MouseScrollUp) -> None:
+        # Scrolling up while already at the top (e.g. a short first page) still asks for more
+        if self.scroll_y <= 0:
+            self.post_message(self.ReachedTop())
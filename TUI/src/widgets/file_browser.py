@@ -1,7 +1,8 @@
 """Enhanced file browser widget with context management."""
 
+import asyncio
 from pathlib import Path
-from typing import List, Set
+from typing import Iterable, List, Optional, Set
 
 from textual.app import ComposeResult
 from textual.containers import Vertical, Horizontal
@@ -9,6 +10,88 @@ from textual.message import Message
 from textual.reactive import reactive
 from textual.widget import Widget
 from textual.widgets import DirectoryTree, Static, Button
+from textual.widgets.directory_tree import DirEntry
+from textual.widgets.tree import TreeNode, UnknownNodeID
+
+from fs_watcher import ChangeBatch, FileWatcher
+
+
+class FileTree(DirectoryTree):
+    """DirectoryTree that can be patched in place from filesystem events.
+
+    Each listed directory is announced with ``DirectoryLoaded`` so it can
+    be watched; ``patch_directories`` re-lists only the directories that
+    changed and adds or removes the affected nodes, keeping expansion and
+    the cursor where they are.
+    """
+
+    class DirectoryLoaded(Message):
+        """Posted when a directory's entries have been listed into the tree."""
+        def __init__(self, path: Path) -> None:
+            self.path = path
+            super().__init__()
+
+    @staticmethod
+    def node_path(node: TreeNode[DirEntry]) -> Path:
+        # Children are listed from resolved directories; only the root may be relative
+        path = node.data.path
+        return path if path.is_absolute() else path.resolve()
+
+    def _populate_node(self, node: TreeNode[DirEntry], content: Iterable[Path]) -> None:
+        super()._populate_node(node, content)
+        if node.data is not None:
+            self.post_message(self.DirectoryLoaded(self.node_path(node)))
+
+    def _loaded_nodes(self) -> dict[Path, TreeNode[DirEntry]]:
+        nodes = {}
+        to_visit = [self.root]
+        while to_visit:
+            node = to_visit.pop()
+            if node.data is not None and node.data.loaded:
+                nodes[self.node_path(node)] = node
+                to_visit.extend(node.children)
+        return nodes
+
+    def _listing(self, directory: Path) -> Optional[list[Path]]:
+        try:
+            entries = list(self.filter_paths(directory.iterdir()))
+        except OSError:
+            return None
+        return sorted(entries, key=lambda path: (not self._safe_is_dir(path), path.name.lower()))
+
+    async def patch_directories(self, directories: Iterable[Path]) -> None:
+        """Bring the nodes of ``directories`` in line with the disk, touching nothing else."""
+        nodes = self._loaded_nodes()
+        for directory in directories:
+            node = nodes.get(directory)
+            if node is None:
+                # Not listed yet (or no longer in the tree): it is read when expanded
+                continue
+            if not node.is_expanded and not node.is_root:
+                # Listed but collapsed: forget the children, re-list on the next expand
+                self.clear_node(node)
+                node.data.loaded = False
+                continue
+            listing = await asyncio.to_thread(self._listing, directory)
+            if listing is None:
+                # The directory itself is gone; its parent's patch removes the node
+                continue
+            async with self.lock:
+                cursor_node = self.cursor_node
+                existing = {child.data.path: child for child in node.children if child.data is not None}
+                wanted = set(listing)
+                for path, child in existing.items():
+                    if path not in wanted:
+                        child.remove()
+                for index, path in enumerate(listing):
+                    if path not in existing:
+                        before = index if index < len(node.children) else None
+                        node.add(path.name, data=DirEntry(path), allow_expand=self._safe_is_dir(path), before=before)
+                if cursor_node is not None:
+                    try:
+                        self.move_cursor(self.get_node_by_id(cursor_node.id), animate=False)
+                    except UnknownNodeID:
+                        pass
 
 
 class FileBrowser(Widget):
@@ -68,31 +151,64 @@ class FileBrowser(Widget):
         """Message sent when user requests a refresh of the file explorer."""
         pass
     
+    class FilesChanged(Message):
+        """Message sent (after the tree is patched) when watched files or directories change."""
+        def __init__(self, batch: ChangeBatch) -> None:
+            self.batch = batch
+            super().__init__()
+    
     def __init__(self, root_path: str = "./", **kwargs):
         super().__init__(**kwargs)
         self.root_path = root_path
         self.selected_file: Path | None = None
+        # Insertion order of context files (later = higher priority when trimming)
+        self._context_order: dict[Path, None] = {}
+        self._context_tokens: tuple[int, int] | None = None
+        self.watcher = FileWatcher(self.post_message_from_watcher)
     
     def compose(self) -> ComposeResult:
         """Create the file browser layout."""
         with Vertical():
             yield Static("📁 File Explorer", id="file-browser-title")
-            yield DirectoryTree(self.root_path, id="file-tree")
+            yield FileTree(self.root_path, id="file-tree")
             yield Static("Context: 0 files", id="context-status")
     
     def on_mount(self) -> None:
         """Initialize the file browser."""
-        pass
+        self.watcher.start()
+
+    def on_unmount(self) -> None:
+        self.watcher.stop()
+
+    def post_message_from_watcher(self, batch: ChangeBatch) -> None:
+        """Called on the watcher thread; hands the batch to the UI thread."""
+        self.post_message(self.FilesChanged(batch))
+
+    def on_file_tree_directory_loaded(self, event: FileTree.DirectoryLoaded) -> None:
+        event.stop()
+        self.watcher.watch(event.path)
+
+    async def on_file_browser_files_changed(self, event: "FileBrowser.FilesChanged") -> None:
+        """Patch the tree nodes affected by a change batch; the message then bubbles on to the app."""
+        batch = event.batch
+        tree = self.query_one("#file-tree", FileTree)
+        for path in batch.paths:
+            if not path.exists():
+                # Deleted or moved away: drop any watches on it or below it
+                self.watcher.unwatch(path)
+        if batch.overflow:
+            await tree.reload()
+        else:
+            await tree.patch_directories(batch.dirs)
 
     def refresh_tree(self) -> None:
-        """Rebuild the DirectoryTree widget to reflect filesystem changes."""
+        """Re-list the whole tree, keeping expanded directories open.
+
+        Changes are normally patched in as they happen; this is the manual
+        fallback (e.g. for network filesystems that do not report changes).
+        """
         try:
-            old = self.query_one("#file-tree", DirectoryTree)
-            parent = old.parent
-            # Remove old tree and mount a new instance
-            old.remove()
-            if parent is not None:
-                parent.mount(DirectoryTree(self.root_path, id="file-tree"))
+            self.query_one("#file-tree", FileTree).reload()
         except Exception:
             # Best-effort: if anything goes wrong, emit a refresh message for the app
             self.post_message(self.RefreshRequested())
@@ -107,12 +223,20 @@ class FileBrowser(Widget):
         self.selected_file = Path(event.path)
         self.post_message(self.FileSelected(self.selected_file))
     
+    def select_file(self, file_path: Path) -> None:
+        """Select a file found outside the tree (e.g. by file search)."""
+        self.selected_file = file_path
+        self.post_message(self.FileSelected(file_path))
+    
     def add_to_context(self, file_path: Path) -> bool:
         """Add a file to the context."""
         if file_path.is_file() and file_path not in self.context_files:
             new_context = self.context_files.copy()
             new_context.add(file_path)
+            self._context_order[file_path] = None
             self.context_files = new_context
+            # Edits to context files must invalidate their cached contents
+            self.watcher.watch(file_path.parent)
             self.post_message(self.FileAddedToContext(file_path))
             return True
         return False
@@ -122,6 +246,7 @@ class FileBrowser(Widget):
         if file_path in self.context_files:
             new_context = self.context_files.copy()
             new_context.remove(file_path)
+            self._context_order.pop(file_path, None)
             self.context_files = new_context
             self.post_message(self.FileRemovedFromContext(file_path))
             return True
@@ -129,17 +254,30 @@ class FileBrowser(Widget):
     
     def clear_context(self) -> None:
         """Clear all files from context."""
+        self._context_order.clear()
+        self._context_tokens = None
         self.context_files = set()
     
     def get_context_files(self) -> List[Path]:
-        """Get list of files in context."""
-        return list(self.context_files)
+        """Get list of files in context, in the order they were added."""
+        return [p for p in self._context_order if p in self.context_files]
+    
+    def set_context_tokens(self, tokens: int, budget: int) -> None:
+        """Show the estimated token total of the context against the model budget."""
+        self._context_tokens = (tokens, budget)
+        self.update_context_display(self.context_files)
     
     def update_context_display(self, context_files: Set[Path]) -> None:
         """Update the context status display."""
         status = self.query_one("#context-status", Static)
         count = len(context_files)
         
+        tokens_text = ""
+        if self._context_tokens is not None and count:
+            tokens, budget = self._context_tokens
+            over = " ⚠ over budget" if tokens > budget else ""
+            tokens_text = f"\n~{tokens:,}/{budget:,} tokens{over}"
+        
         if count == 0:
             status.update("Context: 0 files")
         else:
@@ -152,7 +290,7 @@ class FileBrowser(Widget):
             else:
                 files_text = ", ".join(display_names)
             
-            status.update(f"Context: {count} files - {files_text}")
+            status.update(f"Context: {count} files - {files_text}{tokens_text}")
     
     def get_selected_file(self) -> Path | None:
         """Get the currently selected file."""
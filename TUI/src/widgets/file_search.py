@@ -0,0 +1,44 @@
+"""Command palette provider for fuzzy file search over the background file index."""
+import asyncio
+from functools import partial
+
+from textual.command import Hit, Hits, Provider
+
+
+class FileSearchProvider(Provider):
+    """Finds files by fuzzy path match; choosing one selects it and adds it to context.
+
+    Queries run against the app's ``file_index`` in a worker thread, so a
+    large tree never stalls typing. Until the index is built, results cover
+    the files walked so far. Each search of the index is time-bounded; while
+    part of the tree is left to scan, it is searched again and the better
+    matches it turns up are added to the list.
+    """
+
+    limit = 20
+
+    async def search(self, query: str) -> Hits:
+        index = getattr(self.app, "file_index", None)
+        if index is None or not query.strip():
+            return
+        matcher = self.matcher(query)
+        shown: set[str] = set()
+
+        def step() -> tuple[list, bool]:
+            return index.search(query, self.limit), index.pending(query)
+
+        pending = True
+        while pending:
+            matches, pending = await asyncio.to_thread(step)
+            for match in matches:
+                if match.rel_path in shown:
+                    continue
+                shown.add(match.rel_path)
+                yield Hit(
+                    # Keep the index's ranking (its scores are unbounded); the palette sorts hits by score
+                    0.5 + match.score / (2 * (abs(match.score) + 100)),
+                    matcher.highlight(match.rel_path),
+                    partial(self.app.open_indexed_file, match.rel_path),
+                    text=match.rel_path,
+                    help="Select file and add to context",
+                )
@@ -0,0 +1,74 @@
+"""Modal table of per-model request latency percentiles from ``request_metrics``."""
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Optional
+
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import DataTable, Label
+
+from request_metrics import LatencySummary
+
+
+def _pair(values: Optional[list[float]], scale: float = 1000, unit: str = "s") -> str:
+    if not values or values[0] is None:
+        return "–"
+    low, high = (value / scale for value in values)
+    return f"{low:.2f} / {high:.2f}{unit}"
+
+
+class MetricsScreen(ModalScreen):
+    """p50/p95 of every request stage per model and request kind.
+
+    ``load`` returns the summaries (it is awaited, so it can flush pending
+    writes first); ``r`` reloads, ``escape`` closes.
+    """
+
+    BINDINGS = [
+        ("escape", "dismiss", "Close"),
+        ("r", "reload", "Reload"),
+    ]
+
+    COLUMNS = (
+        "Model", "Kind", "Requests", "Failed", "Total p50/p95", "TTFT p50/p95",
+        "Connect p50/p95", "Context p50/p95", "DB p50/p95", "tok/s p50/p5",
+    )
+
+    def __init__(self, load: Callable[[], Awaitable[list[LatencySummary]]]):
+        super().__init__()
+        self.load = load
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="metrics-container"):
+            yield Label("Request metrics (all sessions)", id="metrics-title")
+            yield DataTable(id="metrics-table", cursor_type="row", zebra_stripes=True)
+            yield Label("", id="metrics-status")
+
+    def on_mount(self) -> None:
+        self.query_one("#metrics-table", DataTable).add_columns(*self.COLUMNS)
+        self.action_reload()
+
+    def action_reload(self) -> None:
+        self.run_worker(self.populate(), exclusive=True)
+
+    async def populate(self) -> None:
+        status = self.query_one("#metrics-status", Label)
+        status.update("Loading…")
+        try:
+            summaries = await self.load()
+        except Exception as e:
+            status.update(f"Could not read request_metrics: {type(e).__name__}: {e}")
+            return
+        table = self.query_one("#metrics-table", DataTable)
+        table.clear()
+        for s in summaries:
+            table.add_row(
+                s.model, s.kind, str(s.requests), str(s.errors),
+                _pair(s.total), _pair(s.ttft), _pair(s.connect), _pair(s.context), _pair(s.db),
+                _pair(s.tokens_per_s, scale=1, unit=""),
+            )
+        status.update(
+            "Times in seconds; slowest median first. r: reload · esc: close"
+            if summaries else "No requests recorded yet."
+        )
@@ -1,52 +1,82 @@
-import ollama
-from ollama import Client
+import asyncio
+from typing import Optional
+
 from textual.app import ComposeResult
 from textual.screen import ModalScreen
 from textual.widgets import ListView, ListItem, Label
 from textual.containers import Vertical
 
+from model_catalog import ModelCatalog
+from providers import ModelInfo
+
+
 class ModelSelectionScreen(ModalScreen):
-    """A modal screen to select an Ollama model."""
-    
-    def __init__(self):
+    """A modal screen to select an Ollama model.
+
+    The list from the last run is shown immediately; the server is queried
+    in the background and the list is replaced when it answers.
+    """
+
+    def __init__(self, catalog: ModelCatalog, timeout: float = 10.0):
         super().__init__()
-        self.models = []
+        self.catalog = catalog
+        self.timeout = timeout
+        self.models: list[str] = []
 
     def compose(self) -> ComposeResult:
         with Vertical(id="model-selection-container"):
             yield Label("Select an Ollama Model", id="model-selection-title")
             yield ListView(id="model-list")
+            yield Label("", id="model-selection-status")
 
     def on_mount(self) -> None:
-        """Fetch models and populate the list."""
+        """Show cached models, then refresh from the server without blocking the UI."""
+        self.run_worker(self.discover_models(), exclusive=True)
+
+    def _populate(self, infos: list[ModelInfo]) -> None:
         list_view = self.query_one("#model-list", ListView)
+        selected: Optional[str] = None
+        if list_view.index is not None and 0 <= list_view.index < len(self.models):
+            selected = self.models[list_view.index]
         list_view.clear()
+        self.models = [info.name for info in infos]
+        for info in infos:
+            details = info.describe()
+            text = f"{info.name}  [dim]{details}[/]" if details else info.name
+            list_view.append(ListItem(Label(text)))
+        if selected in self.models:
+            list_view.index = self.models.index(selected)
+
+    def _set_status(self, text: str) -> None:
+        self.query_one("#model-selection-status", Label).update(text)
+
+    async def discover_models(self) -> None:
+        cached: list[ModelInfo] = []
         try:
-            # Explicitly create a client to ensure we connect to the default host.
-            client = Client(host='http://localhost:11434')
-            models = client.list().get("models", [])
-            if not models:
-                self.dismiss("Error: No Ollama models found. Make sure models are pulled.")
-                return
-
-            self.models = []
-            for model in models:
-                # Handle both dict and Pydantic object entries
-                if hasattr(model, "model"):
-                    model_name = getattr(model, "model")
-                elif isinstance(model, dict):
-                    model_name = model.get("model") or model.get("name")
-                else:
-                    model_name = None
-
-                model_name = model_name or str(model)
-                self.models.append(model_name)
-                list_view.append(ListItem(Label(model_name)))
-
-        except ollama.RequestError:
-            self.dismiss("Error: Could not connect to Ollama. Is it running?")
+            cached = await asyncio.to_thread(self.catalog.cached)
+        except Exception:
+            pass
+        if cached:
+            self._populate(cached)
+            self._set_status("Refreshing model list…")
+        else:
+            self._set_status("Contacting Ollama…")
+
+        try:
+            fresh = await self.catalog.refresh(self.timeout)
         except Exception as e:
-            self.dismiss(f"Error: An unexpected error occurred: {e}")
+            if cached:
+                self._set_status(f"Ollama unreachable; showing models from the last run ({type(e).__name__})")
+            elif isinstance(e, asyncio.TimeoutError):
+                self.dismiss("Error: Timed out waiting for Ollama. Is it running?")
+            else:
+                self.dismiss(f"Error: Could not connect to Ollama. Is it running? ({e})")
+            return
+        if not fresh:
+            self.dismiss("Error: No Ollama models found. Make sure models are pulled.")
+            return
+        self._populate(fresh)
+        self._set_status("")
 
     def on_list_view_selected(self, event: ListView.Selected) -> None:
         """Dismiss the screen and return the selected model name."""
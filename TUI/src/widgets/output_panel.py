@@ -2,8 +2,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from textual.app import ComposeResult
 from textual.containers import Vertical, Horizontal
@@ -12,16 +11,30 @@ from textual.reactive import reactive
 from textual.widget import Widget
 from textual.widgets import Button, Label, ListItem, ListView, Static, Rule
 
+import artifacts
+from artifacts import ArtifactRecord, ArtifactStore, ArtifactWriter
+
+if TYPE_CHECKING:
+    from database import WriteBehindQueue
+
 
 class OutputPanel(Widget):
     """A side panel that previews the latest artifact and manages saving.
 
     - Shows current output root (default: CWD/out; created on first save)
     - Buttons: Change Root, Save
-    - Recents list of saved artifacts (most recent first)
+    - Recents list of saved artifacts (most recent first), seeded from the
+      DuckDB manifest so it survives restarts
     - Markdown preview of the current artifact
+
+    Saves go through a content-addressed ``ArtifactStore`` for the current
+    root, so saving unchanged content again reuses the existing file. They
+    run on an ``ArtifactWriter`` thread, so a large artifact never blocks
+    input.
     """
 
+    RECENTS_LIMIT = 50
+
     DEFAULT_CSS = """
     OutputPanel {
         background: #1e1e1e;
@@ -64,14 +77,34 @@ class OutputPanel(Widget):
     }
     """
 
-    output_root: reactive[Path] = reactive(Path.cwd() / "out")
+    output_root: reactive[Path] = reactive(artifacts.default_output_root())
     _current_title: Optional[str] = None
     _current_markdown: Optional[str] = None
+    _current_kind: str = "summary"
+    _current_message_id: Optional[int] = None
 
     class ChangeRootRequested(Message):
         """Request to change the output root (handled by the App)."""
         pass
 
+    class Saved(Message):
+        """The current artifact was saved (or found unchanged) from the Save button."""
+        def __init__(self, record: ArtifactRecord) -> None:
+            self.record = record
+            super().__init__()
+
+    class SaveFailed(Message):
+        """Saving from the Save button failed."""
+        def __init__(self, error: Exception) -> None:
+            self.error = error
+            super().__init__()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.persistence: Optional[WriteBehindQueue] = None
+        self.store = ArtifactStore(self.output_root)
+        self.writer = ArtifactWriter()
+
     def compose(self) -> ComposeResult:
         with Vertical():
             yield Static("📤 Output", id="output-title")
@@ -91,22 +124,42 @@ class OutputPanel(Widget):
         status.update(f"Root: {self.output_root}")
 
     # --- Public API ---
+    def set_persistence(self, persistence: WriteBehindQueue) -> None:
+        """Record saves in the DuckDB ``artifacts`` manifest from now on."""
+        self.persistence = persistence
+        self.store = ArtifactStore(self.output_root, persistence)
+
     def set_output_root(self, path: Path) -> None:
         self.output_root = path
+        self.store = ArtifactStore(path, self.persistence)
         self._update_root_status()
 
     def get_output_root(self) -> Path:
         return self.output_root
 
-    def display_artifact(self, title: str, markdown: str) -> None:
-        """Record the current artifact metadata (no preview content)."""
+    def display_artifact(
+        self, title: str, markdown: str, kind: str = "summary", message_id: Optional[int] = None
+    ) -> None:
+        """Record the current artifact metadata (no preview content).
+
+        ``message_id`` links the artifact to the chat message it was shown as.
+        """
         self._current_title = title
         self._current_markdown = markdown
+        self._current_kind = kind
+        self._current_message_id = message_id
+
+    async def show_recents(self, records: list[ArtifactRecord]) -> None:
+        """Replace the recents list with ``records`` (newest first), e.g. from the manifest."""
+        recents = self.query_one("#recents", ListView)
+        await recents.clear()
+        await recents.extend(ListItem(Label(str(record.path))) for record in records[:self.RECENTS_LIMIT])
 
     def add_recent(self, path: Path) -> None:
         recents = self.query_one("#recents", ListView)
-        # Append to the end; session-only list does not require strict ordering
-        recents.append(ListItem(Label(str(path))))
+        recents.insert(0, [ListItem(Label(str(path)))])
+        if len(recents) > self.RECENTS_LIMIT:
+            recents.pop()
 
     # --- Button handlers ---
     def on_button_pressed(self, event: Button.Pressed) -> None:
@@ -115,19 +168,32 @@ class OutputPanel(Widget):
         elif event.button.id == "btn-save":
             # Save current artifact if any
             if self._current_title and self._current_markdown:
-                self.save_current_artifact()
+                self.run_worker(self._save_from_button(), group="artifact-save")
 
     # --- Saving ---
-    def save_current_artifact(self) -> Optional[Path]:
+    @staticmethod
+    def artifact_filename(title: str, ts: str) -> str:
+        """``<slug>.summary.<ts>.md``; a relative path in ``title`` is flattened into the slug."""
+        return artifacts.artifact_filename(title, ts)
+
+    async def save_current_artifact(self) -> Optional[ArtifactRecord]:
+        """Save the current artifact off the UI thread; raises on failure."""
         if not (self._current_title and self._current_markdown):
             return None
-        out_dir = self.output_root
-        out_dir.mkdir(parents=True, exist_ok=True)
-        # Timestamped filename
-        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-        slug = Path(self._current_title).stem.replace(" ", "_")
-        filename = f"{slug}.summary.{ts}.md"
-        out_path = out_dir / filename
-        out_path.write_text(self._current_markdown, encoding="utf-8")
-        self.add_recent(out_path)
-        return out_path
+        # Taken now: the current artifact may change while the write runs
+        item = (self._current_title, self._current_markdown)
+        kind, message_id = self._current_kind, self._current_message_id
+        # Timestamped name; unchanged content returns the earlier save
+        (record,) = await self.writer.save_many(self.store, [item], kind, message_id)
+        if record.new:
+            self.add_recent(record.path)
+        return record
+
+    async def _save_from_button(self) -> None:
+        try:
+            record = await self.save_current_artifact()
+        except Exception as e:
+            self.post_message(self.SaveFailed(e))
+            return
+        if record is not None:
+            self.post_message(self.Saved(record))
@@ -0,0 +1,99 @@
+"""Modal search over chat messages and file summaries of all sessions."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from textual.app import ComposeResult
+from textual.containers import Horizontal, Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Checkbox, DataTable, Input, Label
+
+from search_index import SearchHit
+
+
+class SearchScreen(ModalScreen):
+    """Search as you type; ``enter`` on a result dismisses with that ``SearchHit``.
+
+    ``search(query, semantic)`` returns the ranked hits; it is awaited in
+    a worker, and each keystroke replaces the query still running.
+    ``semantic_available`` shows the checkbox that blends in embedding
+    similarity.
+    """
+
+    BINDINGS = [
+        ("escape", "dismiss", "Close"),
+    ]
+
+    COLUMNS = ("Source", "Where", "When", "Score", "Match")
+    # Wait for a pause in typing before querying
+    DEBOUNCE = 0.15
+
+    def __init__(
+        self, search: Callable[[str, bool], Awaitable[list[SearchHit]]], semantic_available: bool = False
+    ):
+        super().__init__()
+        self.search = search
+        self.semantic_available = semantic_available
+        self.hits: list[SearchHit] = []
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="search-container"):
+            yield Label("Search chat history and file summaries (all sessions)", id="search-title")
+            with Horizontal(id="search-bar"):
+                yield Input(placeholder="Words to find…", id="search-input")
+                if self.semantic_available:
+                    yield Checkbox("Semantic", id="search-semantic")
+            yield DataTable(id="search-table", cursor_type="row", zebra_stripes=True)
+            yield Label("", id="search-status")
+
+    def on_mount(self) -> None:
+        self.query_one("#search-table", DataTable).add_columns(*self.COLUMNS)
+        self.query_one("#search-input", Input).focus()
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_available and self.query_one("#search-semantic", Checkbox).value
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        self.run_worker(self.populate(event.value, debounce=True), exclusive=True)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        table = self.query_one("#search-table", DataTable)
+        if self.hits:
+            table.focus()
+
+    def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
+        self.run_worker(self.populate(self.query_one("#search-input", Input).value), exclusive=True)
+
+    def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        self.dismiss(self.hits[int(event.row_key.value)])
+
+    async def populate(self, query: str, debounce: bool = False) -> None:
+        if debounce:
+            await asyncio.sleep(self.DEBOUNCE)
+        status = self.query_one("#search-status", Label)
+        table = self.query_one("#search-table", DataTable)
+        if not query.strip():
+            self.hits = []
+            table.clear()
+            status.update("")
+            return
+        started = time.perf_counter()
+        try:
+            hits = await self.search(query, self.semantic)
+        except Exception as e:
+            status.update(f"Search failed: {type(e).__name__}: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self.hits = hits
+        table.clear()
+        for i, hit in enumerate(hits):
+            where = f"{hit.role} · {hit.where[:8]}" if hit.source == "chat" else hit.where
+            when = f"{hit.timestamp:%Y-%m-%d %H:%M}" if hit.timestamp else ""
+            table.add_row(hit.source, where, when, f"{hit.score:.3f}", hit.snippet(query), key=str(i))
+        status.update(
+            f"{len(hits)} results in {elapsed:.0f} ms · enter: show · esc: close"
+            if hits else f"No matches ({elapsed:.0f} ms)"
+        )
@@ -0,0 +1,72 @@
+"""Modal list of past chat sessions from ``chat_history``."""
+from __future__ import annotations
+
+from typing import Awaitable, Callable
+
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import DataTable, Label
+
+
+class SessionBrowser(ModalScreen):
+    """Sessions, most recently active first; ``enter`` dismisses with the session id.
+
+    ``load`` returns ``ChatRepository.get_sessions`` rows (it is awaited,
+    so it can flush pending writes first). Sessions open in a tab are
+    marked; ``r`` reloads, ``escape`` closes.
+    """
+
+    BINDINGS = [
+        ("escape", "dismiss", "Close"),
+        ("r", "reload", "Reload"),
+    ]
+
+    COLUMNS = ("", "Last active", "Messages", "Model", "First message")
+
+    def __init__(self, load: Callable[[], Awaitable[list[tuple]]], open_sessions: set[str]):
+        super().__init__()
+        self.load = load
+        self.open_sessions = open_sessions
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="sessions-container"):
+            yield Label("Chat sessions (● open in a tab)", id="sessions-title")
+            yield DataTable(id="sessions-table", cursor_type="row", zebra_stripes=True)
+            yield Label("", id="sessions-status")
+
+    def on_mount(self) -> None:
+        table = self.query_one("#sessions-table", DataTable)
+        table.add_columns(*self.COLUMNS)
+        table.focus()
+        self.action_reload()
+
+    def action_reload(self) -> None:
+        self.run_worker(self.populate(), exclusive=True)
+
+    def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        self.dismiss(event.row_key.value)
+
+    async def populate(self) -> None:
+        status = self.query_one("#sessions-status", Label)
+        status.update("Loading…")
+        try:
+            sessions = await self.load()
+        except Exception as e:
+            status.update(f"Could not read chat_history: {type(e).__name__}: {e}")
+            return
+        table = self.query_one("#sessions-table", DataTable)
+        table.clear()
+        for session_id, messages, _started, last_active, model, first_message in sessions:
+            table.add_row(
+                "●" if session_id in self.open_sessions else "",
+                f"{last_active:%Y-%m-%d %H:%M}" if last_active else "",
+                str(messages),
+                model or "",
+                " ".join((first_message or "").split()),
+                key=session_id,
+            )
+        status.update(
+            f"{len(sessions)} sessions · enter: open · r: reload · esc: close"
+            if sessions else "No saved sessions yet."
+        )
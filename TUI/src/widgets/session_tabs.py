@@ -0,0 +1,71 @@
+"""Chat session tabs: one conversation, and its own chat interface, per tab."""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Optional
+
+from textual.dom import DOMNode
+from textual.widgets import TabPane
+
+from widgets.chat_interface import ChatInterface
+
+
+class SessionPane(TabPane):
+    """A tab holding one chat session.
+
+    The pane owns the session's state: its id, the turns sent as history,
+    the task generating its reply and every other request started from the
+    tab (``track``), which ``cancel`` stops. Its ``ChatInterface`` has its own stream view, so replies
+    streaming in several tabs are buffered and rendered independently.
+    """
+
+    TITLE_LENGTH = 24
+
+    def __init__(self, title: str, session_id: Optional[str] = None):
+        self.session_id = session_id or str(uuid.uuid4())
+        super().__init__(title, ChatInterface(classes="chat-interface"), id=f"session-{self.session_id}")
+        self.title = title
+        # Prior turns sent to /api/chat, oldest first: {"role": ..., "content": ...}
+        self.chat_turns: list[dict[str, str]] = []
+        self.reply_task: Optional[asyncio.Task] = None
+        self.tasks: set[asyncio.Task] = set()
+        # Named after its first message once it has one
+        self.named = False
+
+    @classmethod
+    def of(cls, node: DOMNode) -> Optional["SessionPane"]:
+        """The pane ``node`` is in, if any."""
+        for ancestor in node.ancestors_with_self:
+            if isinstance(ancestor, cls):
+                return ancestor
+        return None
+
+    @staticmethod
+    def title_for(message: str) -> str:
+        """A tab title from a session's first message."""
+        text = " ".join(message.split())
+        limit = SessionPane.TITLE_LENGTH
+        return text if len(text) <= limit else text[:limit - 1] + "…"
+
+    @property
+    def chat(self) -> ChatInterface:
+        return self.query_one(ChatInterface)
+
+    @property
+    def busy(self) -> bool:
+        """Whether a reply is being generated (or waiting for a slot)."""
+        return self.reply_task is not None and not self.reply_task.done()
+
+    def track(self, task: asyncio.Task) -> asyncio.Task:
+        """Make ``task`` one of this tab's requests, cancelled by ``cancel``."""
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel(self) -> int:
+        """Cancel the tab's requests in progress; returns how many there were."""
+        running = [task for task in self.tasks if not task.done()]
+        for task in running:
+            task.cancel()
+        return len(running)
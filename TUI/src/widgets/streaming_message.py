@@ -0,0 +1,170 @@
+"""Live view of a streamed assistant reply, re-rendered at a capped frame rate."""
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional
+
+from textual.app import ComposeResult
+from textual.containers import VerticalScroll
+from textual.widgets import Static
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING_RE = re.compile(r"^ {0,3}#{1,6}(\s|$)")
+_LIST_RE = re.compile(r"^ {0,3}([-*+]|\d+[.)])\s")
+
+
+class MarkdownBlockSplitter:
+    """Incrementally splits streamed Markdown into closed blocks and an open tail.
+
+    Only complete lines are examined, and each is examined once. A block
+    closes at a blank line followed by an unindented line (list items keep
+    their list together), after a closing code fence, or after a heading.
+    Closed blocks never change, so callers can render them once and keep
+    re-parsing only the tail.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._start = 0  # start of the open block
+        self._scan = 0  # start of the first unexamined line
+        self._boundary: Optional[int] = None  # blank line that may end the open block
+        self._fence: Optional[str] = None
+        self._is_list = False
+
+    @property
+    def tail(self) -> str:
+        """The open block, including any partial last line."""
+        return self._text[self._start:].strip("\n")
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text and return the blocks it closed."""
+        self._text += text
+        closed: list[str] = []
+        while True:
+            end = self._text.find("\n", self._scan)
+            if end < 0:
+                return closed
+            line_start, self._scan = self._scan, end + 1
+            self._examine(self._text[line_start:end], line_start, self._scan, closed)
+
+    def finish(self) -> list[str]:
+        """Close whatever is left (the stream ended)."""
+        block = self._text[self._start:].strip("\n")
+        self.__init__()
+        return [block] if block else []
+
+    def _close(self, end: int, closed: list[str]) -> None:
+        block = self._text[self._start:end].strip("\n")
+        if block:
+            closed.append(block)
+        self._start = end
+        self._boundary = None
+
+    def _examine(self, line: str, line_start: int, line_end: int, closed: list[str]) -> None:
+        if self._fence is not None:
+            if line.strip().startswith(self._fence) and not line.strip().strip(self._fence[0]):
+                self._fence = None
+                self._close(line_end, closed)
+            return
+        if not line.strip():
+            if self._text[self._start:line_start].strip():
+                if self._boundary is None:
+                    self._boundary = line_start
+            else:
+                # Blank lines between blocks belong to no block
+                self._start = line_end
+            return
+        if self._boundary is not None:
+            continues = line[:1] in (" ", "\t") or (self._is_list and _LIST_RE.match(line))
+            if continues:
+                self._boundary = None
+            else:
+                self._close(self._boundary, closed)
+                self._start = line_start
+        at_block_start = not self._text[self._start:line_start].strip()
+        fence = _FENCE_RE.match(line)
+        if fence:
+            if not at_block_start:
+                self._close(line_start, closed)
+            self._fence = fence.group(1)
+            return
+        if at_block_start:
+            self._is_list = bool(_LIST_RE.match(line))
+            if _HEADING_RE.match(line):
+                self._close(line_end, closed)
+
+
+class StreamingMessage(VerticalScroll):
+    """Shows the open tail of a streamed reply below the chat log.
+
+    Tokens are only buffered on arrival; a timer re-renders at most
+    ``max_fps`` times a second. Blocks that close are handed to
+    ``on_block`` (the chat log) once and never re-parsed; only the open
+    tail is parsed again on each frame.
+    """
+
+    DEFAULT_CSS = """
+    StreamingMessage {
+        height: auto;
+        max-height: 50%;
+        background: #1e1e1e;
+        color: #cccccc;
+        display: none;
+    }
+    """
+
+    def __init__(self, max_fps: float = 25.0, **kwargs):
+        super().__init__(**kwargs)
+        self.max_fps = max_fps
+        self.on_block: Optional[Callable[[str], None]] = None
+        self._splitter = MarkdownBlockSplitter()
+        self._pending: list[str] = []
+        self._dirty = False
+
+    def compose(self) -> ComposeResult:
+        yield Static("", id="stream-tail")
+
+    def on_mount(self) -> None:
+        self._timer = self.set_interval(1 / self.max_fps, self._render_frame, pause=True)
+
+    def start(self, on_block: Callable[[str], None]) -> None:
+        """Begin a new streamed message; closed blocks go to ``on_block``."""
+        self.on_block = on_block
+        self._splitter = MarkdownBlockSplitter()
+        self._pending.clear()
+        self._dirty = False
+        self.query_one("#stream-tail", Static).update("")
+        self.display = True
+        self._timer.resume()
+
+    def append(self, text: str) -> None:
+        """Buffer streamed text; it is rendered on the next frame."""
+        self._pending.append(text)
+        self._dirty = True
+
+    def finish(self) -> None:
+        """Render everything still buffered as closed blocks and hide the view."""
+        self._timer.pause()
+        blocks = self._splitter.feed("".join(self._pending)) + self._splitter.finish()
+        self._pending.clear()
+        self._dirty = False
+        self._emit(blocks)
+        self.query_one("#stream-tail", Static).update("")
+        self.display = False
+
+    def _emit(self, blocks: list[str]) -> None:
+        if self.on_block:
+            for block in blocks:
+                self.on_block(block)
+
+    def _render_frame(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._emit(self._splitter.feed(text))
+        tail = self._splitter.tail
+        from rich.markdown import Markdown  # deferred: markdown-it is slow to import
+        self.query_one("#stream-tail", Static).update(Markdown(tail) if tail else "")
+        self.scroll_end(animate=False)